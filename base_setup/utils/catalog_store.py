@@ -0,0 +1,184 @@
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import tableauserverclient as TSC
+
+logger = logging.getLogger('tableau_automation')
+
+DEFAULT_CATALOG_DB_PATH = "catalog/site_catalog.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    site_id TEXT PRIMARY KEY,
+    content_url TEXT,
+    watermark TEXT,
+    full_synced_at REAL,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    site_id TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    name_key TEXT,
+    project_id TEXT,
+    project_name TEXT,
+    owner_id TEXT,
+    parent_id TEXT,
+    workbook_id TEXT,
+    site_role TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (site_id, content_type, id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_name ON items (site_id, content_type, name_key);
+CREATE INDEX IF NOT EXISTS idx_items_project ON items (site_id, project_id);
+CREATE INDEX IF NOT EXISTS idx_items_owner ON items (site_id, owner_id);
+"""
+
+ITEM_COLUMNS = ("site_id", "content_type", "id", "name", "name_key", "project_id", "project_name",
+                "owner_id", "parent_id", "workbook_id", "site_role", "updated_at")
+
+
+def item_to_row(site_id: str, content_type: str, item) -> tuple:
+    updated_at = getattr(item, "updated_at", None)
+    return (
+        site_id,
+        content_type,
+        item.id,
+        item.name,
+        (item.name or "").strip().lower(),
+        getattr(item, "project_id", None),
+        getattr(item, "project_name", None),
+        getattr(item, "owner_id", None),
+        getattr(item, "parent_id", None),
+        getattr(item, "workbook_id", None),
+        getattr(item, "site_role", None),
+        updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at,
+    )
+
+
+def row_to_item(row: sqlite3.Row):
+    """Rebuild the TSC item a catalog lookup would have returned from a stored row."""
+    content_type = row["content_type"]
+    updated_at = datetime.fromisoformat(row["updated_at"]) if row["updated_at"] else None
+    if content_type == "project":
+        item = TSC.ProjectItem(name=row["name"], parent_id=row["parent_id"], id=row["id"])
+        item._owner_id = row["owner_id"]
+        return item
+    if content_type in ("workbook", "datasource"):
+        item_class = TSC.WorkbookItem if content_type == "workbook" else TSC.DatasourceItem
+        item = item_class(project_id=row["project_id"], name=row["name"])
+        item._project_name = row["project_name"]
+        item.owner_id = row["owner_id"]
+    elif content_type == "view":
+        item = TSC.ViewItem()
+        item._name = row["name"]
+        item._project_id = row["project_id"]
+        item._workbook_id = row["workbook_id"]
+        item._owner_id = row["owner_id"]
+    elif content_type == "user":
+        item = TSC.UserItem(name=row["name"], site_role=row["site_role"])
+    else:
+        item = TSC.GroupItem(name=row["name"])
+    item._id = row["id"]
+    if hasattr(item, "_updated_at"):
+        item._updated_at = updated_at
+    return item
+
+
+class CatalogStore:
+    """
+    SQLite snapshot of site inventories, used to warm the in-memory catalog at startup
+    and to answer inventory queries without calling Tableau.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CATALOG_DB_PATH):
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ----------- Writes ----------- #
+    def replace_site(self, site_id: str, items_by_type: dict):
+        """Replace every stored item of a site after a full listing."""
+        rows = [item_to_row(site_id, content_type, item)
+                for content_type, items in items_by_type.items() for item in items]
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM items WHERE site_id = ?", (site_id,))
+            conn.executemany(f"INSERT INTO items ({', '.join(ITEM_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(ITEM_COLUMNS))})", rows)
+
+    def upsert_items(self, site_id: str, content_type: str, items: Iterable):
+        rows = [item_to_row(site_id, content_type, item) for item in items]
+        if not rows:
+            return
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(f"INSERT OR REPLACE INTO items ({', '.join(ITEM_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(ITEM_COLUMNS))})", rows)
+
+    def delete_items(self, site_id: str, content_type: str, item_ids: Iterable[str]):
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany("DELETE FROM items WHERE site_id = ? AND content_type = ? AND id = ?",
+                             [(site_id, content_type, item_id) for item_id in item_ids])
+
+    def save_site_state(self, site_id: str, content_url: Optional[str], watermark: Optional[datetime],
+                        full_synced_at: float, synced_at: float):
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sites (site_id, content_url, watermark, full_synced_at, synced_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (site_id, content_url, watermark.isoformat() if watermark else None, full_synced_at, synced_at)
+            )
+
+    # ----------- Reads ----------- #
+    def sites(self) -> List[dict]:
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM sites")]
+
+    def load_items(self, site_id: str) -> dict:
+        """Return stored items of a site as TSC objects grouped by content type."""
+        items_by_type = {}
+        with closing(self._connect()) as conn:
+            for row in conn.execute("SELECT * FROM items WHERE site_id = ?", (site_id,)):
+                items_by_type.setdefault(row["content_type"], []).append(row_to_item(row))
+        return items_by_type
+
+    def query(self, content_type: str, site: Optional[str] = None, name: Optional[str] = None,
+              project_id: Optional[str] = None, project_name: Optional[str] = None,
+              owner_id: Optional[str] = None) -> List[dict]:
+        """
+        Query the stored inventory without touching the server.
+
+        `site` matches either the site LUID or its content URL. Name matching is case-insensitive.
+        """
+        clauses, params = ["i.content_type = ?"], [content_type]
+        if site is not None:
+            clauses.append("(s.site_id = ? OR s.content_url = ?)")
+            params += [site, site]
+        if name is not None:
+            clauses.append("i.name_key = ?")
+            params.append(name.strip().lower())
+        if project_id is not None:
+            clauses.append("i.project_id = ?")
+            params.append(project_id)
+        if project_name is not None:
+            clauses.append("lower(i.project_name) = ?")
+            params.append(project_name.strip().lower())
+        if owner_id is not None:
+            clauses.append("i.owner_id = ?")
+            params.append(owner_id)
+        sql = (f"SELECT i.*, s.content_url FROM items i JOIN sites s ON s.site_id = i.site_id "
+               f"WHERE {' AND '.join(clauses)} ORDER BY i.name_key")
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
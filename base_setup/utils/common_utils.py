@@ -1,9 +1,11 @@
 import os
+import re
 
 import yaml
 import logging
 import logging.config
 from pathlib import Path
+from typing import Optional
 from tableauserverclient import Server, PersonalAccessTokenAuth
 
 
@@ -35,6 +37,31 @@ def ensure_directory_exists(directory: str):
     Path(directory).mkdir(parents=True, exist_ok=True)
 
 
+# Device names Windows reserves regardless of extension
+WINDOWS_RESERVED_NAMES = {"CON", "PRN", "AUX", "NUL", *(f"COM{i}" for i in range(1, 10)),
+                          *(f"LPT{i}" for i in range(1, 10))}
+
+
+def safe_filename(name: str) -> str:
+    """File-system safe version of a Tableau name, usable as a single path component."""
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).strip(" .") or "_"
+    return f"_{name}" if name.split(".")[0].upper() in WINDOWS_RESERVED_NAMES else name
+
+
+def resolve_under(base: str, path: Optional[str] = None) -> str:
+    """
+    Resolve `path` (relative paths are taken from `base`) and make sure it stays inside `base`.
+
+    Returns the resolved path, `base` itself when `path` is empty. Raises ValueError when
+    the path escapes `base`, e.g. through `..` or an absolute path elsewhere.
+    """
+    root = Path(base).resolve()
+    resolved = (root / path).resolve() if path else root
+    if resolved != root and root not in resolved.parents:
+        raise ValueError(f"Path '{path}' is outside of '{base}'.")
+    return str(resolved)
+
+
 def get_tableau_server_and_auth(config: dict) -> tuple[Server, PersonalAccessTokenAuth]:
     """
     Initialize and return a Tableau Server instance and PersonalAccessTokenAuth object.
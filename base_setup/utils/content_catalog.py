@@ -0,0 +1,350 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import tableauserverclient as TSC
+
+from base_setup.utils.catalog_store import CatalogStore, DEFAULT_CATALOG_DB_PATH
+from base_setup.utils.common_utils import load_config
+from base_setup.utils.paging import concurrent_pager, paging_options
+from base_setup.utils.session_pool import TableauSessionPool, get_session_pool, is_auth_error, pool_for
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_CATALOG_TTL_SECONDS = 60
+DEFAULT_CATALOG_FULL_REFRESH_MINUTES = 60
+# Delta windows overlap by this much so items saved while a sync was running are not missed.
+CLOCK_SKEW_SECONDS = 300
+
+# content type -> (server endpoint, projected fields). Users and groups carry no updatedAt
+# and are only reloaded on full refreshes; lookup misses still fall through to the server.
+CATALOG_TYPES = {
+    "project": ("projects", ("id", "name", "parentProjectId", "updatedAt")),
+    "workbook": ("workbooks", ("id", "name", "project.id", "project.name", "owner.id", "updatedAt")),
+    "datasource": ("datasources", ("id", "name", "project.id", "project.name", "owner.id", "updatedAt")),
+    "view": ("views", ("id", "name", "workbook.id", "project.id", "updatedAt")),
+    "user": ("users", ("id", "name", "siteRole")),
+    "group": ("groups", ("id", "name")),
+}
+DELTA_TYPES = ("project", "workbook", "datasource", "view")
+
+logger = logging.getLogger('tableau_automation')
+
+
+def _name_key(name: Optional[str]) -> str:
+    return (name or "").strip().lower()
+
+
+def _format_timestamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ContentCatalog:
+    """
+    In-process index of a site's projects, workbooks, datasources, views, users and groups.
+
+    Items are keyed by id and by lowercased name so name lookups are O(1). The first
+    use lists everything once; afterwards the catalog is refreshed every `ttl_seconds`
+    with `updatedAt:gte` delta queries, and fully reloaded every `full_refresh_seconds`
+    to drop content deleted outside this process. Once loaded, refreshes run on a
+    background thread with their own pooled session while lookups keep serving the
+    current data. When a store is attached every change is written through to it so
+    the next process start can resume from the snapshot.
+    """
+
+    def __init__(self, site_id: str, ttl_seconds: float = DEFAULT_CATALOG_TTL_SECONDS,
+                 full_refresh_seconds: float = DEFAULT_CATALOG_FULL_REFRESH_MINUTES * 60,
+                 store: Optional[CatalogStore] = None, content_url: Optional[str] = None):
+        self.site_id = site_id
+        self.content_url = content_url
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self.watermark: Optional[datetime] = None
+        self._by_id: Dict[str, Dict[str, object]] = {t: {} for t in CATALOG_TYPES}
+        self._by_name: Dict[str, Dict[str, set]] = {t: defaultdict(set) for t in CATALOG_TYPES}
+        self._refreshed_at = 0.0
+        self._full_refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot(cls, store: CatalogStore, site_state: dict, **settings) -> "ContentCatalog":
+        """Rebuild a catalog from its stored snapshot; the next refresh resumes from its watermark."""
+        catalog = cls(site_state["site_id"], store=store, content_url=site_state["content_url"], **settings)
+        with catalog._lock:
+            for content_type, items in store.load_items(catalog.site_id).items():
+                for item in items:
+                    catalog._index(content_type, item)
+            if site_state["watermark"]:
+                catalog.watermark = datetime.fromisoformat(site_state["watermark"])
+            catalog._full_refreshed_at = site_state["full_synced_at"] or 0.0
+            catalog._refreshed_at = site_state["synced_at"] or 0.0
+        return catalog
+
+    def _save_state(self):
+        if self.store is not None:
+            self.store.save_site_state(self.site_id, self.content_url, self.watermark,
+                                       self._full_refreshed_at, self._refreshed_at)
+
+    # ----------- Sync ----------- #
+    def _list(self, server: TSC.Server, content_type: str, since: Optional[datetime] = None) -> List[object]:
+        endpoint_name, fields = CATALOG_TYPES[content_type]
+        options = TSC.RequestOptions()
+        options.fields.update(fields)
+        if since is not None:
+            options.filter.add(TSC.Filter(TSC.RequestOptions.Field.UpdatedAt,
+                                          TSC.RequestOptions.Operator.GreaterThanOrEqual,
+                                          _format_timestamp(since)))
+        return list(concurrent_pager(getattr(server, endpoint_name), options, **paging_options(_catalog_settings())))
+
+    def load_all(self, server: TSC.Server):
+        """List every catalogued content type and replace the current index."""
+        started = datetime.now(timezone.utc)
+        listed = {content_type: self._list(server, content_type) for content_type in CATALOG_TYPES}
+        with self._lock:
+            for content_type, items in listed.items():
+                self._by_id[content_type] = {}
+                self._by_name[content_type] = defaultdict(set)
+                for item in items:
+                    self._index(content_type, item)
+            self.watermark = started - timedelta(seconds=CLOCK_SKEW_SECONDS)
+            self._refreshed_at = self._full_refreshed_at = time.time()
+        if self.store is not None:
+            self.store.replace_site(self.site_id, listed)
+            self._save_state()
+        logger.info(f"Catalog loaded for site '{self.site_id}': "
+                    + ", ".join(f"{len(items)} {t}s" for t, items in listed.items()))
+
+    def refresh(self, server: TSC.Server):
+        """Fetch only items updated since the last sync and merge them in."""
+        started = datetime.now(timezone.utc)
+        changed = 0
+        for content_type in DELTA_TYPES:
+            items = self._list(server, content_type, since=self.watermark)
+            for item in items:
+                self.upsert(content_type, item)
+            changed += len(items)
+        with self._lock:
+            self.watermark = started - timedelta(seconds=CLOCK_SKEW_SECONDS)
+            self._refreshed_at = time.time()
+        self._save_state()
+        logger.debug(f"Catalog delta refresh for site '{self.site_id}': {changed} item(s) updated")
+
+    def _sync(self, server: TSC.Server):
+        """Run the due load or delta refresh. Failures keep the current data."""
+        now = time.time()
+        if now - self._refreshed_at < self.ttl_seconds:
+            return
+        try:
+            if self.watermark is None or now - self._full_refreshed_at >= self.full_refresh_seconds:
+                self.load_all(server)
+            else:
+                self.refresh(server)
+        except Exception as e:
+            if is_auth_error(e):
+                raise
+            # Back off for one TTL instead of retrying on every lookup.
+            self._refreshed_at = now
+            logger.warning(f"Catalog refresh failed for site '{self.site_id}': {e}")
+
+    def _background_sync(self, pool: TableauSessionPool):
+        try:
+            with pool.acquire() as server:
+                self._sync(server)
+        except Exception as e:
+            self._refreshed_at = time.time()
+            logger.warning(f"Background catalog refresh failed for site '{self.site_id}': {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def ensure_fresh(self, server: TSC.Server):
+        """
+        Load the catalog, or start a refresh if its TTL has passed.
+
+        Only the first load blocks the caller. Later refreshes run in the background while
+        lookups are answered from the current data; one refresh runs at a time.
+        """
+        if time.time() - self._refreshed_at < self.ttl_seconds:
+            return
+        if not self.loaded:
+            with self._refresh_lock:
+                if not self.loaded:
+                    self._sync(server)
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # a refresh is already running
+        pool = pool_for(server)
+        if pool is None:
+            # A server created outside the pools cannot be shared with another thread
+            try:
+                self._sync(server)
+            finally:
+                self._refresh_lock.release()
+            return
+        threading.Thread(target=self._background_sync, args=(pool,), name=f"catalog-refresh-{self.site_id}",
+                         daemon=True).start()
+
+    @property
+    def loaded(self) -> bool:
+        return self.watermark is not None
+
+    # ----------- Index ----------- #
+    def _index(self, content_type: str, item):
+        previous = self._by_id[content_type].get(item.id)
+        if previous is not None:
+            self._by_name[content_type][_name_key(previous.name)].discard(item.id)
+        self._by_id[content_type][item.id] = item
+        self._by_name[content_type][_name_key(item.name)].add(item.id)
+
+    def upsert(self, content_type: str, item):
+        with self._lock:
+            self._index(content_type, item)
+        if self.store is not None:
+            self.store.upsert_items(self.site_id, content_type, [item])
+
+    def remove(self, content_type: str, item_id: str):
+        with self._lock:
+            item = self._by_id[content_type].pop(item_id, None)
+            if item is not None:
+                self._by_name[content_type][_name_key(item.name)].discard(item_id)
+            children = []
+            if content_type == "project":
+                # Deleting a project deletes its content too.
+                children = [(child_type, child.id) for child_type in ("workbook", "datasource", "view")
+                            for child in self._by_id[child_type].values() if child.project_id == item_id]
+        if self.store is not None:
+            self.store.delete_items(self.site_id, content_type, [item_id])
+        for child_type, child_id in children:
+            self.remove(child_type, child_id)
+
+    def get(self, content_type: str, item_id: str):
+        with self._lock:
+            return self._by_id[content_type].get(item_id)
+
+    def items(self, content_type: str) -> list:
+        with self._lock:
+            return list(self._by_id[content_type].values())
+
+    def lookup(self, content_type: str, name: str, project_id: Optional[str] = None,
+               project_name: Optional[str] = None) -> list:
+        """Return catalogued items with this name (case-insensitive), optionally within a project."""
+        with self._lock:
+            ids = self._by_name[content_type].get(_name_key(name), ())
+            matches = [self._by_id[content_type][item_id] for item_id in ids]
+        if project_id:
+            matches = [item for item in matches if item.project_id == project_id]
+        elif project_name:
+            matches = [item for item in matches
+                       if _name_key(getattr(item, "project_name", None)) == _name_key(project_name)]
+        return matches
+
+
+_catalogs: Dict[str, ContentCatalog] = {}
+_catalogs_lock = threading.Lock()
+_catalog_config: Optional[dict] = None
+_store: Optional[CatalogStore] = None
+_sync_stop = threading.Event()
+
+
+def _catalog_settings() -> dict:
+    global _catalog_config
+    if _catalog_config is None:
+        _catalog_config = load_config(str(CONFIG_PATH)).get('tableau', {})
+    return _catalog_config
+
+
+def _catalog_options(settings: dict) -> dict:
+    return {
+        "ttl_seconds": settings.get('catalog_ttl_seconds', DEFAULT_CATALOG_TTL_SECONDS),
+        "full_refresh_seconds": 60 * settings.get('catalog_full_refresh_minutes',
+                                                  DEFAULT_CATALOG_FULL_REFRESH_MINUTES),
+    }
+
+
+def get_catalog_store() -> Optional[CatalogStore]:
+    """Return the SQLite snapshot store, or None when `catalog_db_path` is set to an empty value."""
+    global _store
+    if _store is None:
+        db_path = _catalog_settings().get('catalog_db_path', DEFAULT_CATALOG_DB_PATH)
+        if db_path:
+            _store = CatalogStore(db_path)
+    return _store
+
+
+def catalog_for(server: TSC.Server) -> Optional[ContentCatalog]:
+    """
+    Return the fresh catalog for the server's site, or None when the catalog is disabled
+    via `catalog_enabled: false` in config.yaml.
+    """
+    settings = _catalog_settings()
+    if not settings.get('catalog_enabled', True):
+        return None
+    site_id = server.site_id
+    with _catalogs_lock:
+        catalog = _catalogs.get(site_id)
+        if catalog is None:
+            catalog = ContentCatalog(site_id, store=get_catalog_store(), content_url=server.site_url,
+                                     **_catalog_options(settings))
+            _catalogs[site_id] = catalog
+    catalog.ensure_fresh(server)
+    return catalog
+
+
+def load_catalog_snapshots() -> int:
+    """Warm the in-memory catalogs from the SQLite snapshot. Returns the number of sites loaded."""
+    settings = _catalog_settings()
+    store = get_catalog_store()
+    if store is None or not settings.get('catalog_enabled', True):
+        return 0
+    loaded = 0
+    for site_state in store.sites():
+        catalog = ContentCatalog.from_snapshot(store, site_state, **_catalog_options(settings))
+        with _catalogs_lock:
+            _catalogs.setdefault(catalog.site_id, catalog)
+        loaded += 1
+    logger.info(f"Loaded catalog snapshots for {loaded} site(s) from {store.db_path}")
+    return loaded
+
+
+def _sync_loop(site_id: Optional[str]):
+    interval = _catalog_settings().get('catalog_ttl_seconds', DEFAULT_CATALOG_TTL_SECONDS)
+    while not _sync_stop.is_set():
+        try:
+            with get_session_pool(site_id).acquire() as server:
+                catalog_for(server)
+        except Exception as e:
+            logger.warning(f"Background catalog sync failed: {e}")
+        _sync_stop.wait(interval)
+
+
+def start_catalog_sync(site_id: Optional[str] = None) -> Optional[threading.Thread]:
+    """Keep the catalog of a site delta-synced from a daemon thread (None means the configured site)."""
+    if not _catalog_settings().get('catalog_enabled', True):
+        return None
+    _sync_stop.clear()
+    thread = threading.Thread(target=_sync_loop, args=(site_id,), name="catalog-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_catalog_sync():
+    _sync_stop.set()
+
+
+def record_change(server: TSC.Server, content_type: str, item):
+    """Reflect an item created or updated by this process in the site catalog, if one exists."""
+    catalog = _catalogs.get(server.site_id)
+    if catalog is not None and item is not None:
+        catalog.upsert(content_type, item)
+
+
+def record_removal(server: TSC.Server, content_type: str, item_id: str):
+    """Drop an item deleted by this process from the site catalog, if one exists."""
+    catalog = _catalogs.get(server.site_id)
+    if catalog is not None:
+        catalog.remove(content_type, item_id)
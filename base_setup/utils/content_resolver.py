@@ -0,0 +1,189 @@
+import logging
+from typing import Iterable, List, Optional
+
+import tableauserverclient as TSC
+from tableauserverclient.server.endpoint.exceptions import ServerResponseError
+
+from base_setup.utils.content_catalog import ContentCatalog, catalog_for, record_change
+from base_setup.utils.paging import concurrent_pager
+
+logger = logging.getLogger('tableau_automation')
+
+# One page is enough for a name lookup; anything beyond it is ambiguous anyway.
+LOOKUP_PAGE_SIZE = 100
+
+CONTENT_ENDPOINTS = {
+    "project": "projects",
+    "workbook": "workbooks",
+    "datasource": "datasources",
+    "view": "views",
+    "user": "users",
+}
+
+# Attributes returned by lookups. Items that are sent back through `update`
+# should be fetched with fields=None so no attribute is silently reset.
+LOOKUP_FIELDS = {
+    "project": ("id", "name", "parentProjectId"),
+    "workbook": ("id", "name", "project.id", "project.name", "owner.id", "updatedAt"),
+    "datasource": ("id", "name", "project.id", "project.name", "owner.id", "updatedAt"),
+    "view": ("id", "name", "workbook.id", "project.id", "updatedAt"),
+    "user": ("id", "name", "siteRole"),
+}
+
+_DEFAULT = object()
+
+
+def _same_name(left: Optional[str], right: str) -> bool:
+    return (left or "").strip().lower() == right.strip().lower()
+
+
+def _filterable(value: str) -> bool:
+    # Commas separate filter expressions in the REST API and cannot be escaped.
+    return "," not in value
+
+
+def _drop_deleted(endpoint, catalog: ContentCatalog, content_type: str, matches: list) -> list:
+    """
+    Re-check catalog hits against the server and forget the ones that no longer exist.
+
+    Delta refreshes cannot see deletions made outside this process, so an item deleted and
+    republished under the same name shows up twice until the next full reload.
+    """
+    current = []
+    for item in matches:
+        try:
+            endpoint.get_by_id(item.id)
+        except ServerResponseError as e:
+            if not str(e.code).startswith("404"):
+                raise
+            logger.info(f"Dropping deleted {content_type} '{item.name}' ({item.id}) from the catalog")
+            catalog.remove(content_type, item.id)
+            continue
+        current.append(item)
+    return current
+
+
+def _request_options(filters: List[tuple], fields: Optional[Iterable[str]]) -> TSC.RequestOptions:
+    options = TSC.RequestOptions(pagesize=LOOKUP_PAGE_SIZE)
+    for field, value in filters:
+        options.filter.add(TSC.Filter(field, TSC.RequestOptions.Operator.Equals, value))
+    if fields:
+        options.fields.update(fields)
+    return options
+
+
+def find_items(
+        server: TSC.Server,
+        content_type: str,
+        name: str,
+        project_name: Optional[str] = None,
+        project_id: Optional[str] = None,
+        fields=_DEFAULT
+) -> list:
+    """
+    Return every item of `content_type` named `name` (case-insensitive), optionally within a project.
+
+    Default lookups are answered from the site's in-memory catalog when it knows the name;
+    when the catalog holds several items with that name each is confirmed on the server
+    first, so items deleted outside this process do not make the lookup ambiguous. Otherwise the name (and project name, for workbooks, datasources and views) is filtered
+    on the server so a lookup costs one small page instead of a full listing. Names containing
+    a comma cannot be expressed as a REST filter and fall back to a paged scan.
+    """
+    content_type = content_type.strip().lower()
+    endpoint = getattr(server, CONTENT_ENDPOINTS[content_type])
+    use_catalog = fields is _DEFAULT
+    if use_catalog:
+        fields = LOOKUP_FIELDS[content_type]
+        catalog = catalog_for(server)
+        if catalog is not None and catalog.loaded:
+            matches = catalog.lookup(content_type, name, project_id, project_name)
+            if len(matches) > 1:
+                matches = _drop_deleted(endpoint, catalog, content_type, matches)
+            if matches:
+                return matches
+    name = name.strip()
+
+    filters = []
+    if _filterable(name):
+        filters.append((TSC.RequestOptions.Field.Name, name))
+    if project_name and content_type in ("workbook", "datasource", "view") and _filterable(project_name):
+        filters.append((TSC.RequestOptions.Field.ProjectName, project_name.strip()))
+
+    options = _request_options(filters, fields)
+    if _filterable(name):
+        items, _ = endpoint.get(options)
+    else:
+        logger.debug(f"Name '{name}' cannot be filtered server-side, scanning {content_type}s")
+        items = concurrent_pager(endpoint, options)
+
+    matches = [item for item in items if _same_name(item.name, name)]
+    if project_id:
+        matches = [item for item in matches if item.project_id == project_id]
+    elif project_name and content_type != "project":
+        matches = [item for item in matches if _same_name(getattr(item, "project_name", None), project_name)]
+    if use_catalog:
+        for item in matches:
+            record_change(server, content_type, item)
+    return matches
+
+
+def list_project_items(server: TSC.Server, content_type: str, project: TSC.ProjectItem,
+                       fields: Optional[Iterable[str]] = None) -> list:
+    """Return every workbook or datasource directly inside `project` (not its child projects)."""
+    filters = [(TSC.RequestOptions.Field.ProjectName, project.name)] if _filterable(project.name) else []
+    endpoint = getattr(server, CONTENT_ENDPOINTS[content_type])
+    return [item for item in concurrent_pager(endpoint, _request_options(filters, fields))
+            if item.project_id == project.id]
+
+
+def find_one(
+        server: TSC.Server,
+        content_type: str,
+        name: str,
+        project_name: Optional[str] = None,
+        project_id: Optional[str] = None,
+        fields=_DEFAULT
+):
+    """Return the single matching item, or None when nothing or more than one item matches."""
+    matches = find_items(server, content_type, name, project_name, project_id, fields)
+    if len(matches) == 1:
+        logger.debug(f"Found {content_type}: {matches[0].name} with ID: {matches[0].id}")
+        return matches[0]
+    if matches:
+        logger.warning(f"Multiple {content_type}s found with name '{name}'. Please be more specific.")
+    else:
+        logger.warning(f"No {content_type} found with name '{name}'"
+                       + (f" in project '{project_name or project_id}'" if project_name or project_id else ""))
+    return None
+
+
+def find_project(server: TSC.Server, project_name: str, fields=_DEFAULT) -> Optional[TSC.ProjectItem]:
+    """Find a project by name (case-insensitive)."""
+    matches = find_items(server, "project", project_name, fields=fields)
+    return matches[0] if matches else None
+
+
+def find_workbook(server: TSC.Server, workbook_name: str, project_id: Optional[str] = None,
+                  project_name: Optional[str] = None, fields=_DEFAULT) -> Optional[TSC.WorkbookItem]:
+    return find_one(server, "workbook", workbook_name, project_name, project_id, fields)
+
+
+def find_datasource(server: TSC.Server, datasource_name: str, project_id: Optional[str] = None,
+                    project_name: Optional[str] = None, fields=_DEFAULT) -> Optional[TSC.DatasourceItem]:
+    return find_one(server, "datasource", datasource_name, project_name, project_id, fields)
+
+
+def find_view(server: TSC.Server, view_name: str, fields=_DEFAULT) -> Optional[TSC.ViewItem]:
+    matches = find_items(server, "view", view_name, fields=fields)
+    return matches[0] if matches else None
+
+
+def find_user_by_email(server: TSC.Server, email: str, fields=_DEFAULT) -> Optional[TSC.UserItem]:
+    """Find a user by username, which is the email address on Tableau Cloud."""
+    logger.debug(f"Searching user by email: {email}")
+    matches = find_items(server, "user", email, fields=fields)
+    if not matches:
+        logger.warning(f"User not found: {email}")
+        return None
+    logger.debug(f"Found user: {matches[0].name} with ID: {matches[0].id}")
+    return matches[0]
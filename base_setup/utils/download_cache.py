@@ -0,0 +1,227 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import tableauserverclient as TSC
+
+from base_setup.utils.common_utils import load_config
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.transfer import PARTIAL_SUFFIX, PUBLISHABLE, resumable_download
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_CACHE_MAX_MB = 2048
+IN_USE_GRACE_SECONDS = 60  # recently used files are not evicted while callers may still read them
+PARTIAL_MAX_AGE_SECONDS = 24 * 3600  # abandoned partial downloads are removed after this
+
+logger = logging.getLogger('tableau_automation')
+
+
+def updated_token(updated_at) -> Optional[str]:
+    if isinstance(updated_at, datetime):
+        return updated_at.strftime("%Y%m%dT%H%M%S")
+    return str(updated_at).replace(":", "").replace("-", "") if updated_at else None
+
+
+class KeyLocks:
+    """
+    A lock per key that exists only while the key is in use.
+
+    Callers of the same key wait for each other, while other keys never wait, however long a
+    download runs. The entry is dropped when its last holder or waiter leaves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_use: Dict[str, list] = {}  # key -> [lock, holders and waiters]
+
+    @contextmanager
+    def __call__(self, key: str) -> Iterator[None]:
+        with self._lock:
+            entry = self._in_use.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._in_use[key]
+
+
+class DownloadCache:
+    """
+    On-disk cache of downloaded workbooks and datasources.
+
+    Files are keyed by content type, item id, `updated_at` and whether the extract was
+    included, so a changed item is a new key and is downloaded again. Older versions of an
+    item are dropped when a new one arrives, and the least recently used files are evicted
+    once the directory grows past `max_bytes`. Concurrent requests for the same key wait for
+    a single download, and an interrupted download resumes from its partial file.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._key_lock = KeyLocks()
+
+    @staticmethod
+    def _prefix(content_type: str, item_id: str) -> str:
+        return f"{content_type}-{item_id}-"
+
+    def key(self, content_type: str, item, include_extract: bool) -> Optional[str]:
+        updated = updated_token(getattr(item, "updated_at", None))
+        if not updated:
+            return None
+        return f"{self._prefix(content_type, item.id)}{updated}-{'extract' if include_extract else 'noextract'}"
+
+    def _find(self, key: str) -> Optional[Path]:
+        for path in self.root.glob(f"{key}.*"):
+            if not path.name.endswith(PARTIAL_SUFFIX):
+                return path
+        return None
+
+    def get(self, content_type: str, item, include_extract: bool = True) -> Optional[str]:
+        """Return the cached file for this exact version of the item, marking it recently used."""
+        key = self.key(content_type, item, include_extract)
+        path = self._find(key) if key else None
+        if path is None:
+            return None
+        os.utime(path)
+        return str(path)
+
+    def fetch(self, server: TSC.Server, content_type: str, item, include_extract: bool = True,
+              verify: bool = True) -> Tuple[str, bool]:
+        """
+        Return `(path, from_cache)` for the item, downloading it on a miss.
+
+        With `verify`, the item's current `updated_at` is read from the server first (one small
+        request) so an item listed from a cached lookup cannot be served in an outdated version.
+        """
+        if verify:
+            item = getattr(server, PUBLISHABLE[content_type][0]).get_by_id(item.id)
+        key = self.key(content_type, item, include_extract)
+        if key is None:
+            raise ValueError(f"{content_type} {item.id} has no updated_at to key the download cache on")
+
+        with self._key_lock(key):
+            cached = self.get(content_type, item, include_extract)
+            if cached:
+                logger.info(f"Serving {content_type} '{item.name}' from download cache")
+                report_progress("Served from download cache")
+                return cached, True
+
+            download = resumable_download(server, content_type, item.id, str(self.root / key), include_extract)
+            path = Path(download["path"])
+            logger.info(f"Cached {content_type} '{item.name}' ({download['bytes']} bytes, "
+                        f"sha256 {download['sha256'][:12]}, {download['bytes_per_second'] or 0} bytes/sec)")
+
+        self._drop_other_versions(content_type, item.id, keep=path)
+        self.evict(keep=path)
+        return str(path), False
+
+    def fetch_revision(self, server: TSC.Server, content_type: str, item, revision: str,
+                       include_extract: bool = True) -> Tuple[str, bool]:
+        """
+        Return `(path, from_cache)` for a numbered revision of the item, downloading it on a miss.
+
+        Revisions never change, so they are kept alongside the current version until evicted.
+        """
+        key = f"{content_type}_revision-{item.id}-{revision}-{'extract' if include_extract else 'noextract'}"
+        with self._key_lock(key):
+            cached = self._find(key)
+            if cached:
+                os.utime(cached)
+                logger.info(f"Serving revision {revision} of {content_type} '{item.name}' from download cache")
+                return str(cached), True
+
+            download = resumable_download(server, content_type, item.id, str(self.root / key), include_extract,
+                                          revision=revision)
+            path = Path(download["path"])
+            logger.info(f"Cached revision {revision} of {content_type} '{item.name}' ({download['bytes']} bytes)")
+
+        self.evict(keep=path)
+        return str(path), False
+
+    def _drop_other_versions(self, content_type: str, item_id: str, keep: Path):
+        """Remove outdated versions of the item with the same extract setting."""
+        extract_flag = keep.stem.rsplit("-", 1)[-1]
+        for path in self.root.glob(f"{self._prefix(content_type, item_id)}*"):
+            if path == keep or path.name.endswith(PARTIAL_SUFFIX):
+                continue
+            if path.stem.rsplit("-", 1)[-1] == extract_flag:
+                path.unlink(missing_ok=True)
+
+    def evict(self, keep: Optional[Path] = None):
+        """Delete least recently used files until the cache fits in `max_bytes`."""
+        evict_lru(self.root, self.max_bytes, keep)
+
+
+def evict_lru(root: Path, max_bytes: int, keep: Optional[Path] = None):
+    """
+    Delete the least recently used files in `root` until it fits in `max_bytes`.
+
+    Files used within `IN_USE_GRACE_SECONDS` are kept, and abandoned partial downloads are
+    removed once they are older than `PARTIAL_MAX_AGE_SECONDS`.
+    """
+    entries = []
+    now = time.time()
+    for path in root.iterdir():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.name.endswith(PARTIAL_SUFFIX):
+            if now - stat.st_mtime > PARTIAL_MAX_AGE_SECONDS:
+                path.unlink(missing_ok=True)
+            continue
+        if path.is_file():
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    cutoff = now - IN_USE_GRACE_SECONDS
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep or mtime > cutoff:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        logger.debug(f"Evicted {path.name} from {root}")
+
+
+def link_or_copy(source: str, destination: str):
+    """Place a cached file at `destination`, hard-linking when the filesystem allows it."""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+_download_cache: Optional[DownloadCache] = None
+_download_cache_lock = threading.Lock()
+
+
+def get_download_cache() -> DownloadCache:
+    """
+    Return the shared cache in `<download_path>/.cache` (or `download_cache_path`), capped at
+    `download_cache_max_mb` (0 keeps only the files in use).
+    """
+    global _download_cache
+    with _download_cache_lock:
+        if _download_cache is None:
+            tableau_cfg = load_config(str(CONFIG_PATH)).get('tableau', {})
+            root = tableau_cfg.get('download_cache_path') or \
+                os.path.join(tableau_cfg.get('download_path', 'downloads'), '.cache')
+            max_mb = tableau_cfg.get('download_cache_max_mb', DEFAULT_CACHE_MAX_MB)
+            _download_cache = DownloadCache(root, int(max_mb * 1024 * 1024))
+        return _download_cache
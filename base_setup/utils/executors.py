@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from base_setup.utils.common_utils import load_config
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+# Operation class -> (worker threads, requests allowed to wait for a worker)
+OPERATION_LIMITS = {
+    "lookup": (8, 32),     # name lookups, revision history, access checks
+    "mutation": (4, 16),   # create, copy, move, delete, ownership changes
+    "download": (2, 4),    # workbook/datasource/view downloads and workbook scans
+    "audit": (2, 4),       # site-wide audits and scans
+}
+
+logger = logging.getLogger('tableau_automation')
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when an operation class already has as much work running and queued as it accepts."""
+
+
+class BoundedExecutor:
+    """
+    Thread pool for one class of blocking Tableau operations.
+
+    At most `max_workers` calls run at once and at most `max_queue` more wait for a thread;
+    anything beyond that is rejected immediately with `ExecutorBusyError` instead of queuing
+    without bound, so callers can shed load (HTTP 503) rather than time out.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"tableau-{name}")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Calls currently running or waiting for a worker."""
+        return self._pending
+
+    def _release(self, _future: Optional[Future] = None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusyError(f"Too many {self.name} operations in progress, try again shortly.")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a blocking call on this executor and await its result from the event loop."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(operation: str) -> BoundedExecutor:
+    """
+    Return the shared executor of an operation class.
+
+    Sizes come from `tableau.executors.<operation>.max_workers` / `max_queue` in config.yaml,
+    falling back to `OPERATION_LIMITS`.
+    """
+    with _executors_lock:
+        executor = _executors.get(operation)
+        if executor is None:
+            max_workers, max_queue = OPERATION_LIMITS[operation]
+            overrides = (load_config(str(CONFIG_PATH)).get('tableau', {}).get('executors') or {}).get(operation) or {}
+            executor = BoundedExecutor(operation,
+                                       max_workers=overrides.get('max_workers', max_workers),
+                                       max_queue=overrides.get('max_queue', max_queue))
+            _executors[operation] = executor
+        return executor
+
+
+async def run_operation(operation: str, func: Callable, *args, **kwargs):
+    """Run `func(*args, **kwargs)` on the executor of `operation`; raises `ExecutorBusyError` when full."""
+    return await get_executor(operation).run(func, *args, **kwargs)
+
+
+def shutdown_executors():
+    """Stop accepting work and cancel queued calls, e.g. on application shutdown."""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown()
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from tableauserverclient import Server
+
+from base_setup.utils.common_utils import load_config
+from base_setup.utils.session_pool import mark_session_stale
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 10
+DEFAULT_TIMEOUT_SECONDS = 60
+
+logger = logging.getLogger('tableau_automation')
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def tableau_headers(server: Optional[Server] = None, json_body: bool = False) -> dict:
+    """Headers for a Tableau REST/GraphQL call, with the session token when a server is given."""
+    headers = {"Accept": "application/json"}
+    if json_body:
+        headers["Content-Type"] = "application/json"
+    if server is not None:
+        headers["X-Tableau-Auth"] = server.auth_token
+    return headers
+
+
+def site_api_url(server: Server, path: str, api_version: Optional[str] = None) -> str:
+    """Build `<server>/api/<version>/sites/<site-luid>/<path>` for the signed-in site."""
+    return f"{server.server_address}/api/{api_version or server.version}/sites/{server.site_id}/{path}"
+
+
+class TableauHttpClient:
+    """
+    Shared HTTP client for direct REST and GraphQL calls.
+
+    Connections are kept alive and pooled, HTTP/2 is negotiated when the `h2` package is
+    installed, and concurrent requests per host are capped. Passing `server=` injects the
+    session token, and a 401 marks that pooled session for re-authentication.
+    Async clients are bound to an event loop, so one is kept per running loop.
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+                 max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                 timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+                 http2: Optional[bool] = None):
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+        self.timeout = httpx.Timeout(timeout_seconds)
+        self.http2 = _http2_available() if http2 is None else http2
+        self.max_connections_per_host = max_connections_per_host
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_host_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    # ----------- Clients ----------- #
+    def _client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2)
+            return self._sync_client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+                self._async_clients[loop] = client
+            return client
+
+    def _host_limit(self, url: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if loop is None:
+                limits, make = self._host_limits, threading.BoundedSemaphore
+            else:
+                limits, make = self._async_host_limits.setdefault(loop, {}), asyncio.Semaphore
+            if host not in limits:
+                limits[host] = make(self.max_connections_per_host)
+            return limits[host]
+
+    @staticmethod
+    def _check_auth(response: httpx.Response, server: Optional[Server]):
+        if server is not None and response.status_code == 401:
+            mark_session_stale(server)
+
+    # ----------- Requests ----------- #
+    def request(self, method: str, url: str, server: Optional[Server] = None,
+                headers: Optional[dict] = None, **kwargs) -> httpx.Response:
+        merged = {**tableau_headers(server, json_body="json" in kwargs), **(headers or {})}
+        with self._host_limit(url):
+            response = self._client().request(method, url, headers=merged, **kwargs)
+        self._check_auth(response, server)
+        return response
+
+    async def arequest(self, method: str, url: str, server: Optional[Server] = None,
+                       headers: Optional[dict] = None, **kwargs) -> httpx.Response:
+        merged = {**tableau_headers(server, json_body="json" in kwargs), **(headers or {})}
+        async with self._host_limit(url, asyncio.get_running_loop()):
+            response = await self._async_client().request(method, url, headers=merged, **kwargs)
+        self._check_auth(response, server)
+        return response
+
+    @asynccontextmanager
+    async def astream(self, method: str, url: str, server: Optional[Server] = None,
+                      headers: Optional[dict] = None, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Send a request and yield the response before its body is read.
+
+        The per-host slot is held until the block exits, so long-running streams count
+        against `http_max_connections_per_host`.
+        """
+        merged = {**tableau_headers(server, json_body="json" in kwargs), **(headers or {})}
+        async with self._host_limit(url, asyncio.get_running_loop()):
+            async with self._async_client().stream(method, url, headers=merged, **kwargs) as response:
+                self._check_auth(response, server)
+                yield response
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    async def aclose(self):
+        """Close the async client of the running loop and the sync client."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+            self._async_host_limits.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+        self.close()
+
+    def close(self):
+        with self._lock:
+            client, self._sync_client = self._sync_client, None
+        if client is not None:
+            client.close()
+
+
+_http_client: Optional[TableauHttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> TableauHttpClient:
+    """Return the process-wide HTTP client configured from the `tableau` section of config.yaml."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            tableau_cfg = load_config(str(CONFIG_PATH)).get('tableau', {})
+            _http_client = TableauHttpClient(
+                max_connections=tableau_cfg.get('http_max_connections', DEFAULT_MAX_CONNECTIONS),
+                max_connections_per_host=tableau_cfg.get('http_max_connections_per_host',
+                                                         DEFAULT_MAX_CONNECTIONS_PER_HOST),
+                timeout_seconds=tableau_cfg.get('http_timeout_seconds', DEFAULT_TIMEOUT_SECONDS),
+                http2=tableau_cfg.get('http2'),
+            )
+        return _http_client
+
+
+async def close_http_client():
+    if _http_client is not None:
+        await _http_client.aclose()
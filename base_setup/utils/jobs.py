@@ -0,0 +1,298 @@
+import contextvars
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from base_setup.utils.common_utils import load_config
+from base_setup.utils.executors import get_executor
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_JOB_DB_PATH = "jobs/jobs.db"
+DEFAULT_JOB_RETENTION_HOURS = 24
+PROGRESS_WRITE_INTERVAL_SECONDS = 0.5  # throttle progress writes from chunked transfers
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# Identifies this process in the `worker` column as host:pid:boot, so a recycled pid is not
+# mistaken for the process that queued a job
+BOOT_ID = uuid.uuid4().hex[:12]
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{BOOT_ID}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT,
+    status TEXT NOT NULL,
+    message TEXT,
+    bytes_transferred INTEGER NOT NULL DEFAULT 0,
+    bytes_total INTEGER,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+"""
+
+logger = logging.getLogger('tableau_automation')
+
+
+class JobStore:
+    """
+    SQLite record of background jobs, shared by every API worker on the host so a job
+    can be polled from any of them.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_JOB_DB_PATH):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, job_id: str, kind: str, params: dict):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, worker, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params, default=str), QUEUED, WORKER_ID, now, now)
+            )
+
+    def update(self, job_id: str, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def delete(self, job_id: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished jobs created before the cutoff and return how many were removed."""
+        cutoff = time.time() - older_than_seconds
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM jobs WHERE created_at < ? AND status IN (?, ?)",
+                                (cutoff, SUCCEEDED, FAILED)).rowcount
+
+    def fail_interrupted(self) -> int:
+        """
+        Mark queued and running jobs of processes on this host that no longer exist as failed.
+
+        Jobs of live workers sharing the store, and of other hosts, are left alone. Returns how
+        many jobs were marked.
+        """
+        host = socket.gethostname()
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT id, worker FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        interrupted = [row["id"] for row in rows if _worker_gone(row["worker"], host)]
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? "
+                             "WHERE id = ? AND status IN (?, ?)",
+                             [(FAILED, "Interrupted by restart", now, now, job_id, QUEUED, RUNNING)
+                              for job_id in interrupted])
+        return len(interrupted)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_view(row) if row else None
+
+    def recent(self, limit: int = 50) -> List[dict]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_job_view(row) for row in rows]
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x00100000, False, pid)  # SYNCHRONIZE
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == 0x102  # WAIT_TIMEOUT: still running
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_gone(worker: Optional[str], host: str) -> bool:
+    """True when `worker` ran on this host and its process has ended."""
+    parts = (worker or "").split(":")
+    if len(parts) < 2 or parts[0] != host or not parts[1].isdigit():
+        return False
+    pid = int(parts[1])
+    if pid == os.getpid():
+        # Same pid: it is this process only if the boot id matches (records without one predate it)
+        return len(parts) < 3 or parts[2] != BOOT_ID
+    return not _process_alive(pid)
+
+
+def _job_view(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"]) if job["params"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    if job["started_at"]:
+        elapsed = (job["finished_at"] or job["updated_at"]) - job["started_at"]
+        job["elapsed_seconds"] = round(elapsed, 3)
+        job["bytes_per_second"] = round(job["bytes_transferred"] / elapsed) if elapsed > 0 else None
+    return job
+
+
+class _JobContext:
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.bytes_transferred = 0
+        self.bytes_total = None
+        self.message = None
+        self.last_write = 0.0
+        self.lock = threading.Lock()
+
+    def flush(self):
+        self.last_write = time.monotonic()
+        self.store.update(self.job_id, bytes_transferred=self.bytes_transferred,
+                          bytes_total=self.bytes_total, message=self.message)
+
+
+_current_job: contextvars.ContextVar[Optional[_JobContext]] = contextvars.ContextVar("current_job", default=None)
+
+
+def report_progress(message: Optional[str] = None, add_bytes: int = 0, bytes_total: Optional[int] = None,
+                    force: bool = False):
+    """
+    Record progress of the background job running in this thread; a no-op outside a job.
+
+    Script functions call this with a step description and/or the number of bytes moved since
+    the last call. Writes are throttled so per-chunk calls stay cheap; a new message or
+    `force=True` is written immediately. Helper threads of a job report to it when they are
+    started with `contextvars.copy_context().run`.
+    """
+    job = _current_job.get()
+    if job is None:
+        return
+    with job.lock:
+        job.bytes_transferred += add_bytes
+        if bytes_total is not None:
+            job.bytes_total = bytes_total
+        if message is not None and message != job.message:
+            job.message = message
+            force = True
+        if force or time.monotonic() - job.last_write >= PROGRESS_WRITE_INTERVAL_SECONDS:
+            job.flush()
+
+
+def _job_outcome(result) -> tuple:
+    if result is None:
+        return FAILED, "Operation returned no result."
+    if isinstance(result, dict) and result.get("success") is False:
+        return FAILED, result.get("message")
+    return SUCCEEDED, None
+
+
+def _run_job(store: JobStore, job_id: str, func: Callable, args: tuple, kwargs: dict):
+    job = _JobContext(store, job_id)
+    token = _current_job.set(job)
+    store.update(job_id, status=RUNNING, started_at=time.time())
+    try:
+        result = func(*args, **kwargs)
+        status, error = _job_outcome(result)
+        store.update(job_id, status=status, error=error, result=result, finished_at=time.time(),
+                     bytes_transferred=job.bytes_transferred, bytes_total=job.bytes_total, message=job.message)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        store.update(job_id, status=FAILED, error=str(e), finished_at=time.time(),
+                     bytes_transferred=job.bytes_transferred, bytes_total=job.bytes_total, message=job.message)
+    finally:
+        _current_job.reset(token)
+
+
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Return the job store at `tableau.job_db_path` (default jobs/jobs.db)."""
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            tableau_cfg = load_config(str(CONFIG_PATH)).get('tableau', {})
+            _job_store = JobStore(tableau_cfg.get('job_db_path', DEFAULT_JOB_DB_PATH))
+        return _job_store
+
+
+def submit_job(kind: str, operation: str, func: Callable, *args, params: Optional[dict] = None, **kwargs) -> dict:
+    """
+    Queue `func(*args, **kwargs)` on the executor of `operation` and return the new job record.
+
+    Raises `ExecutorBusyError` when that operation class is already at capacity; the job is
+    then not recorded.
+    """
+    store = get_job_store()
+    job_id = uuid.uuid4().hex
+    store.create(job_id, kind, params or {})
+    try:
+        future: Future = get_executor(operation).submit(_run_job, store, job_id, func, args, kwargs)
+    except Exception:
+        store.delete(job_id)
+        raise
+    logger.info(f"Queued {kind} job {job_id}")
+
+    def _mark_cancelled(done: Future):
+        # Queued work is cancelled when the executors shut down
+        if done.cancelled():
+            store.update(job_id, status=FAILED, error="Cancelled before it started", finished_at=time.time())
+
+    future.add_done_callback(_mark_cancelled)
+    return store.get(job_id)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return get_job_store().get(job_id)
+
+
+def fail_interrupted_jobs():
+    """Fail jobs left queued or running by a previous process, e.g. at application startup."""
+    failed = get_job_store().fail_interrupted()
+    if failed:
+        logger.warning(f"Marked {failed} job(s) interrupted by a restart as failed")
+
+
+def purge_jobs():
+    """Drop finished jobs older than `tableau.job_retention_hours` (default 24)."""
+    tableau_cfg = load_config(str(CONFIG_PATH)).get('tableau', {})
+    hours = tableau_cfg.get('job_retention_hours', DEFAULT_JOB_RETENTION_HOURS)
+    removed = get_job_store().purge(hours * 3600)
+    if removed:
+        logger.info(f"Purged {removed} finished job(s)")
@@ -0,0 +1,163 @@
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from base_setup.utils.common_utils import load_config
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_SCAN_DB_PATH = "catalog/extension_scans.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extension_scans (
+    site_id TEXT NOT NULL,
+    content_url TEXT,
+    workbook_id TEXT NOT NULL,
+    workbook TEXT,
+    name_key TEXT,
+    project_id TEXT,
+    project TEXT,
+    owner_id TEXT,
+    updated_at TEXT,
+    tabpy INTEGER NOT NULL,
+    einstein INTEGER NOT NULL,
+    viz_ext INTEGER NOT NULL,
+    scanner_version INTEGER NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (site_id, workbook_id)
+);
+CREATE INDEX IF NOT EXISTS idx_extension_scans_project ON extension_scans (site_id, project);
+"""
+
+SCAN_COLUMNS = ("site_id", "content_url", "workbook_id", "workbook", "name_key", "project_id", "project",
+                "owner_id", "updated_at", "tabpy", "einstein", "viz_ext", "scanner_version", "scanned_at")
+USAGE_KINDS = ("tabpy", "einstein", "viz_ext")
+
+logger = logging.getLogger('tableau_automation')
+
+
+def isoformat(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _scan_view(row: sqlite3.Row) -> dict:
+    result = dict(row)
+    for kind in USAGE_KINDS:
+        result[kind] = bool(result[kind])
+    return result
+
+
+class ExtensionScanStore:
+    """
+    SQLite record of extension scan results, one row per workbook version.
+
+    A stored result is valid while the workbook's `updated_at` and the scanner version are
+    unchanged, so repeated scans only download and parse workbooks that changed.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_SCAN_DB_PATH):
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ----------- Writes ----------- #
+    def save(self, site_id: str, content_url: Optional[str], workbook, usage: dict, scanner_version: int):
+        self.save_many(site_id, content_url, [(workbook, usage)], scanner_version)
+
+    def save_many(self, site_id: str, content_url: Optional[str], results: Iterable[tuple], scanner_version: int):
+        """Store `(workbook, usage)` pairs, replacing earlier results for the same workbooks."""
+        now = time.time()
+        rows = [(site_id, content_url, workbook.id, workbook.name, (workbook.name or "").strip().lower(),
+                 workbook.project_id, workbook.project_name, workbook.owner_id, isoformat(workbook.updated_at),
+                 *(int(bool(usage.get(kind))) for kind in USAGE_KINDS), scanner_version, now)
+                for workbook, usage in results]
+        if not rows:
+            return
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(f"INSERT OR REPLACE INTO extension_scans ({', '.join(SCAN_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(SCAN_COLUMNS))})", rows)
+
+    def prune(self, site_id: str, keep_ids: Iterable[str]) -> int:
+        """Drop results of workbooks that are no longer on the site; returns how many were removed."""
+        keep = set(keep_ids)
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            stored = [row["workbook_id"] for row in
+                      conn.execute("SELECT workbook_id FROM extension_scans WHERE site_id = ?", (site_id,))]
+            removed = [(site_id, workbook_id) for workbook_id in stored if workbook_id not in keep]
+            conn.executemany("DELETE FROM extension_scans WHERE site_id = ? AND workbook_id = ?", removed)
+        return len(removed)
+
+    # ----------- Reads ----------- #
+    def results(self, site_id: str) -> Dict[str, dict]:
+        """Stored results of a site keyed by workbook id."""
+        with closing(self._connect()) as conn:
+            return {row["workbook_id"]: _scan_view(row) for row in
+                    conn.execute("SELECT * FROM extension_scans WHERE site_id = ?", (site_id,))}
+
+    @staticmethod
+    def is_current(stored: Optional[dict], workbook, scanner_version: int) -> bool:
+        """True when `stored` is the result for this exact workbook version and scanner."""
+        return bool(stored) and stored["updated_at"] == isoformat(workbook.updated_at) \
+            and stored["scanner_version"] == scanner_version
+
+    def current(self, site_id: str, workbook, scanner_version: int) -> Optional[dict]:
+        """The stored result for this exact workbook version, if any."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM extension_scans WHERE site_id = ? AND workbook_id = ?",
+                               (site_id, workbook.id)).fetchone()
+        stored = _scan_view(row) if row else None
+        return stored if self.is_current(stored, workbook, scanner_version) else None
+
+    def query(self, site: Optional[str] = None, name: Optional[str] = None, project_name: Optional[str] = None,
+              tabpy: Optional[bool] = None, einstein: Optional[bool] = None,
+              viz_ext: Optional[bool] = None) -> List[dict]:
+        """
+        Query stored results without touching the server.
+
+        `site` matches either the site LUID or its content URL; usage flags filter on
+        whether each kind was found.
+        """
+        clauses, params = [], []
+        if site is not None:
+            clauses.append("(site_id = ? OR content_url = ?)")
+            params += [site, site]
+        if name is not None:
+            clauses.append("name_key = ?")
+            params.append(name.strip().lower())
+        if project_name is not None:
+            clauses.append("lower(project) = ?")
+            params.append(project_name.strip().lower())
+        for kind, wanted in zip(USAGE_KINDS, (tabpy, einstein, viz_ext)):
+            if wanted is not None:
+                clauses.append(f"{kind} = ?")
+                params.append(int(wanted))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn:
+            return [_scan_view(row) for row in
+                    conn.execute(f"SELECT * FROM extension_scans {where} ORDER BY lower(project), name_key", params)]
+
+
+_scan_store: Optional[ExtensionScanStore] = None
+_scan_store_lock = threading.Lock()
+
+
+def get_scan_store() -> ExtensionScanStore:
+    """Return the scan result store at `tableau.extension_scan_db_path` (default catalog/extension_scans.db)."""
+    global _scan_store
+    with _scan_store_lock:
+        if _scan_store is None:
+            tableau_cfg = load_config(str(CONFIG_PATH)).get('tableau', {})
+            _scan_store = ExtensionScanStore(tableau_cfg.get('extension_scan_db_path', DEFAULT_SCAN_DB_PATH))
+        return _scan_store
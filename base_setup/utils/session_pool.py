@@ -0,0 +1,353 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from tableauserverclient import Server, PersonalAccessTokenAuth
+from tableauserverclient.server.endpoint.exceptions import NotSignedInError, ServerResponseError
+
+from base_setup.utils.common_utils import load_config, get_tableau_server_and_auth
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_SESSION_TTL_MINUTES = 100  # Tableau Cloud tokens expire after 120 minutes
+DEFAULT_CHECKOUT_TIMEOUT_SECONDS = 30
+
+logger = logging.getLogger('tableau_automation')
+
+
+def is_auth_error(error: Exception) -> bool:
+    """Return True when an exception means the session token is missing, expired or revoked."""
+    if isinstance(error, NotSignedInError):
+        return True
+    if isinstance(error, ServerResponseError):
+        return str(error.code).startswith("401")
+    # HTTP errors raised by requests/httpx carry the response
+    return getattr(getattr(error, "response", None), "status_code", None) == 401
+
+
+class SessionPoolTimeoutError(RuntimeError):
+    """Raised when no pooled session is released within the checkout timeout."""
+
+
+class TableauSession:
+    """A signed-in Server owned by a pool, with the bookkeeping needed to refresh it."""
+
+    def __init__(self, server: Server, auth: PersonalAccessTokenAuth):
+        self.server = server
+        self.auth = auth
+        self.signed_in_at = 0.0
+        self.stale = True
+
+    def sign_in(self):
+        if self.server.is_signed_in():
+            try:
+                self.server.auth.sign_out()
+            except Exception as e:
+                logger.debug(f"Ignoring sign-out failure before re-authentication: {e}")
+        self.server.auth.sign_in(self.auth)
+        self.signed_in_at = time.monotonic()
+        self.stale = False
+        logger.debug(f"Signed in pooled session for site '{self.auth.site_id}'")
+
+    def sign_out(self):
+        if self.server.is_signed_in():
+            try:
+                self.server.auth.sign_out()
+            except Exception as e:
+                logger.debug(f"Ignoring sign-out failure: {e}")
+
+    def expired(self, ttl_seconds: float) -> bool:
+        return self.stale or time.monotonic() - self.signed_in_at >= ttl_seconds
+
+
+class TableauSessionPool:
+    """
+    Keeps authenticated TSC.Server objects alive across calls for one site.
+
+    Sessions are handed out exclusively, re-authenticated before the token TTL
+    runs out and after any 401 seen while they were in use. The server version
+    is probed once for the first session and reused for the rest. A caller that
+    cannot get a session within `checkout_timeout` seconds gets
+    `SessionPoolTimeoutError` instead of waiting indefinitely behind long leases
+    such as streamed responses.
+    """
+
+    def __init__(self, config: dict, site_id: Optional[str] = None,
+                 max_size: Optional[int] = None, ttl_minutes: Optional[float] = None,
+                 checkout_timeout: Optional[float] = None):
+        tableau_cfg = config['tableau']
+        self.config = config
+        self.site_id = tableau_cfg['site_id'] if site_id is None else site_id
+        self.max_size = max_size or tableau_cfg.get('session_pool_size', DEFAULT_POOL_SIZE)
+        self.ttl_seconds = 60 * (ttl_minutes or tableau_cfg.get('session_ttl_minutes', DEFAULT_SESSION_TTL_MINUTES))
+        self.checkout_timeout = checkout_timeout or tableau_cfg.get('session_checkout_timeout_seconds',
+                                                                    DEFAULT_CHECKOUT_TIMEOUT_SECONDS)
+        self._idle: List[TableauSession] = []
+        self._leased: Dict[int, TableauSession] = {}
+        self._created = 0
+        self._version: Optional[str] = None
+        self._cond = threading.Condition()
+
+    def _new_session(self) -> TableauSession:
+        tableau_cfg = self.config['tableau']
+        if self._version is None:
+            server, _ = get_tableau_server_and_auth(self.config)
+            self._version = server.version
+        else:
+            server = Server(tableau_cfg['server_url'])
+            server.version = self._version
+        auth = PersonalAccessTokenAuth(
+            tableau_cfg['token_name'],
+            tableau_cfg['personal_access_token'],
+            site_id=self.site_id
+        )
+        return TableauSession(server, auth)
+
+    def _checkout(self, timeout: Optional[float] = None) -> TableauSession:
+        deadline = time.monotonic() + (self.checkout_timeout if timeout is None else timeout)
+        with self._cond:
+            while not self._idle and self._created >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SessionPoolTimeoutError(f"All {self.max_size} Tableau sessions for site "
+                                                  f"'{self.site_id}' are in use, try again shortly.")
+                self._cond.wait(remaining)
+            if self._idle:
+                session = self._idle.pop()
+            else:
+                self._created += 1
+                session = None
+        if session is None:
+            try:
+                session = self._new_session()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+        try:
+            if session.expired(self.ttl_seconds):
+                session.sign_in()
+        except Exception:
+            self._checkin(session)
+            raise
+        with self._cond:
+            self._leased[id(session.server)] = session
+        return session
+
+    def _checkin(self, session: TableauSession):
+        with self._cond:
+            self._leased.pop(id(session.server), None)
+            self._idle.append(session)
+            self._cond.notify()
+
+    def owns(self, server: Server) -> bool:
+        with self._cond:
+            return id(server) in self._leased
+
+    def invalidate(self, server: Server):
+        """Force the session behind `server` to sign in again on its next checkout."""
+        with self._cond:
+            session = self._leased.get(id(server))
+        if session:
+            session.stale = True
+            logger.info(f"Tableau session for site '{self.site_id}' marked for re-authentication")
+
+    def is_stale(self, server: Server) -> bool:
+        with self._cond:
+            session = self._leased.get(id(server))
+        return bool(session and session.stale)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[Server]:
+        """
+        Lease a signed-in server for the block, waiting at most `timeout` seconds (default
+        `checkout_timeout`, 0 to not wait) for a free session.
+        """
+        session = self._checkout(timeout)
+        try:
+            yield session.server
+        except Exception as e:
+            if is_auth_error(e):
+                session.stale = True
+            raise
+        finally:
+            self._checkin(session)
+
+    @asynccontextmanager
+    async def acquire_async(self, timeout: Optional[float] = None) -> AsyncIterator[Server]:
+        """Async counterpart of `acquire`; waiting and sign-in run in a worker thread."""
+        session = await asyncio.to_thread(self._checkout, timeout)
+        try:
+            yield session.server
+        except Exception as e:
+            if is_auth_error(e):
+                session.stale = True
+            raise
+        finally:
+            self._checkin(session)
+
+    def run(self, func: Callable, *args, **kwargs):
+        """
+        Call a script function with a pooled server passed as `server=`.
+
+        Script functions report failures as result dicts, so a 401 seen inside
+        the call is detected through the session's stale flag and the call is
+        retried once on a freshly signed-in session.
+        """
+        for attempt in range(2):
+            session = self._checkout()
+            try:
+                result = func(*args, server=session.server, **kwargs)
+                retry = session.stale
+            except Exception as e:
+                if attempt or not is_auth_error(e):
+                    raise
+                session.stale = True
+                retry = True
+            finally:
+                self._checkin(session)
+            if not retry or attempt:
+                return result
+            logger.info(f"Retrying {func.__name__} after Tableau session expired")
+
+    def close(self):
+        with self._cond:
+            sessions, self._idle = self._idle, []
+            self._created -= len(sessions)
+        for session in sessions:
+            session.sign_out()
+
+
+_pools: Dict[Optional[str], TableauSessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(site_id: Optional[str] = None) -> TableauSessionPool:
+    """Return the shared pool for a site, creating it on first use (None means the configured site)."""
+    with _pools_lock:
+        pool = _pools.get(site_id)
+        if pool is None:
+            pool = TableauSessionPool(load_config(str(CONFIG_PATH)), site_id=site_id)
+            _pools[site_id] = pool
+        return pool
+
+
+def close_session_pools():
+    """Sign out every pooled session, e.g. on application shutdown."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+@contextmanager
+def tableau_session(server: Optional[Server] = None, site_id: Optional[str] = None) -> Iterator[Server]:
+    """
+    Yield a signed-in server for a script function.
+
+    A server handed in by the caller (normally a router through `TableauSessionPool.run`)
+    is used as-is; otherwise one is borrowed from the shared pool for `site_id`.
+    Auth errors raised inside the block mark the pooled session for re-authentication.
+    """
+    if server is None:
+        with get_session_pool(site_id).acquire() as pooled_server:
+            yield pooled_server
+        return
+
+    try:
+        yield server
+    except Exception as e:
+        if is_auth_error(e):
+            mark_session_stale(server)
+        raise
+
+
+@asynccontextmanager
+async def async_tableau_session(server: Optional[Server] = None,
+                                site_id: Optional[str] = None) -> AsyncIterator[Server]:
+    """Async counterpart of `tableau_session`; pooled sign-in runs in a worker thread."""
+    if server is None:
+        async with get_session_pool(site_id).acquire_async() as pooled_server:
+            yield pooled_server
+        return
+
+    try:
+        yield server
+    except Exception as e:
+        if is_auth_error(e):
+            mark_session_stale(server)
+        raise
+
+
+def pool_for(server: Server) -> Optional[TableauSessionPool]:
+    """Return the pool that leased `server`, or None for a server created outside the pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return next((pool for pool in pools if pool.owns(server)), None)
+
+
+class WorkerSessions:
+    """Pooled sessions lent to the worker threads of one call; see `worker_sessions`."""
+
+    def __init__(self, server: Server, pool: Optional[TableauSessionPool], lent: List[Server]):
+        self.count = len(lent)
+        self._server = server
+        self._pool = pool
+        self._free: "queue.Queue[Server]" = queue.Queue()
+        for lent_server in lent:
+            self._free.put(lent_server)
+
+    @contextmanager
+    def session(self) -> Iterator[Server]:
+        """
+        Take a free lent server for the block. With nothing lent this is the caller's own
+        server, which must then be used from one thread at a time.
+        """
+        if not self.count:
+            yield self._server
+            return
+        server = self._free.get()
+        try:
+            yield server
+        except Exception as e:
+            if is_auth_error(e):
+                self._pool.invalidate(server)
+            raise
+        finally:
+            self._free.put(server)
+
+
+@contextmanager
+def worker_sessions(server: Server, wanted: int) -> Iterator[WorkerSessions]:
+    """
+    Lend up to `wanted` more sessions of the pool that leased `server` to a call's worker threads.
+
+    A TSC server is not safe to use from several threads at once, so each concurrent worker needs
+    its own session. Only sessions that are free right now are lent; callers size their thread
+    pools to `count` and fall back to sequential work on their own server when it is too small.
+    A server created outside the pools lends none.
+    """
+    pool = pool_for(server)
+    with ExitStack() as stack:
+        lent = []
+        while pool is not None and len(lent) < wanted:
+            try:
+                lent.append(stack.enter_context(pool.acquire(timeout=0)))
+            except SessionPoolTimeoutError:
+                break
+        yield WorkerSessions(server, pool, lent)
+
+
+def mark_session_stale(server: Server):
+    """Make the pool that leased `server` sign it in again before its next use."""
+    pool = pool_for(server)
+    if pool is not None:
+        pool.invalidate(server)
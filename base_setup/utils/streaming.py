@@ -0,0 +1,88 @@
+import logging
+import sys
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Callable, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+from tableauserverclient import Server
+
+from base_setup.utils.executors import run_operation
+from base_setup.utils.http_client import get_http_client, site_api_url
+from base_setup.utils.session_pool import async_tableau_session
+from base_setup.utils.transfer import transfer_settings
+
+# Headers of the Tableau response that are passed on to the API client
+FORWARDED_HEADERS = ("content-type", "content-length", "content-disposition", "last-modified", "etag")
+
+logger = logging.getLogger('tableau_automation')
+
+# A resolver maps a signed-in server to (site-relative REST path, query params, download file name)
+StreamResolver = Callable[[Server], Tuple[str, Optional[dict], Optional[str]]]
+
+
+class TableauStream:
+    """
+    An open streamed response from Tableau.
+
+    The pooled session and HTTP connection stay leased until the body has been read or
+    `aclose` is called, so callers must do one of the two.
+    """
+
+    def __init__(self, response: httpx.Response, stack: AsyncExitStack, filename: Optional[str],
+                 chunk_bytes: int):
+        self.response = response
+        self.filename = filename
+        self.chunk_bytes = chunk_bytes
+        self._stack = stack
+
+    @property
+    def headers(self) -> dict:
+        headers = {name: self.response.headers[name] for name in FORWARDED_HEADERS if name in self.response.headers}
+        if self.filename:
+            fallback = self.filename.encode("ascii", "replace").decode().replace('"', "_")
+            headers["content-disposition"] = \
+                f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(self.filename)}'
+        return headers
+
+    @property
+    def media_type(self) -> str:
+        return self.response.headers.get("content-type", "application/octet-stream")
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self.response.aiter_raw(self.chunk_bytes):
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        await self._stack.aclose()
+
+
+async def open_tableau_stream(resolve: StreamResolver, site_id: Optional[str] = None) -> TableauStream:
+    """
+    Look up what to download with `resolve` and open a streamed GET for it.
+
+    `resolve` runs on the "lookup" executor and raises `LookupError` when the content does
+    not exist or `ValueError` for invalid arguments. The response is requested without
+    content encoding so `Content-Length` is the number of bytes the client receives; error
+    statuses from Tableau raise `httpx.HTTPStatusError`.
+    """
+    stack = AsyncExitStack()
+    try:
+        server = await stack.enter_async_context(async_tableau_session(site_id=site_id))
+        path, params, filename = await run_operation("lookup", resolve, server)
+        response = await stack.enter_async_context(get_http_client().astream(
+            "GET", site_api_url(server, path), server=server, params=params,
+            headers={"Accept": "*/*", "Accept-Encoding": "identity"}
+        ))
+        if response.is_error:
+            await response.aread()
+            response.raise_for_status()
+        logger.info(f"Streaming {path} ({response.headers.get('content-length', 'unknown')} bytes)")
+        return TableauStream(response, stack, filename, transfer_settings()["download_chunk_bytes"])
+    except BaseException:
+        # Unwind with the exception so a 401 marks the pooled session for re-authentication
+        await stack.__aexit__(*sys.exc_info())
+        raise
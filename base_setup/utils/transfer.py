@@ -0,0 +1,338 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+import zipfile
+from email.message import Message
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Tuple
+
+import requests
+import tableauserverclient as TSC
+from tableauserverclient.server import RequestFactory
+from tableauserverclient.server.endpoint.exceptions import InternalServerError, NonXMLResponseError, ServerResponseError
+
+from base_setup.utils.common_utils import load_config
+from base_setup.utils.jobs import report_progress
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_SPOOL_MAX_MEMORY_MB = 32  # files up to this size stay in memory, larger ones spill to disk
+DEFAULT_UPLOAD_CHUNK_MB = 16
+DEFAULT_DOWNLOAD_CHUNK_KB = 1024
+DEFAULT_DOWNLOAD_RETRIES = 5
+PARTIAL_SUFFIX = ".part"
+ZIP_EXTENSIONS = (".twbx", ".tdsx")
+
+# content type -> (server endpoint attribute, request factory, item class, REST type parameter)
+PUBLISHABLE = {
+    "workbook": ("workbooks", RequestFactory.Workbook, TSC.WorkbookItem, "workbookType"),
+    "datasource": ("datasources", RequestFactory.Datasource, TSC.DatasourceItem, "datasourceType"),
+}
+
+logger = logging.getLogger('tableau_automation')
+
+
+class DownloadIncompleteError(IOError):
+    """Raised when a download cannot be completed or verified within the retry budget."""
+
+
+class TransferStats:
+    """Bytes moved by one transfer and how fast."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    def add(self, size: int):
+        self.bytes += size
+        report_progress(add_bytes=size)
+
+    def finish(self) -> "TransferStats":
+        self.finished = time.monotonic()
+        return self
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def bytes_per_second(self) -> Optional[int]:
+        return round(self.bytes / self.seconds) if self.seconds > 0 else None
+
+
+def transfer_settings() -> dict:
+    """
+    Read transfer tuning from the `tableau` config section: `spool_max_memory_mb`, `spool_dir`,
+    `upload_chunk_mb`, `download_chunk_kb`, `download_retries` and `verify_downloads`.
+    """
+    tableau_cfg = load_config(str(CONFIG_PATH)).get('tableau', {})
+    return {
+        "spool_max_bytes": int(tableau_cfg.get('spool_max_memory_mb', DEFAULT_SPOOL_MAX_MEMORY_MB) * 1024 * 1024),
+        "spool_dir": tableau_cfg.get('spool_dir') or None,
+        "upload_chunk_bytes": int(tableau_cfg.get('upload_chunk_mb', DEFAULT_UPLOAD_CHUNK_MB) * 1024 * 1024),
+        "download_chunk_bytes": int(tableau_cfg.get('download_chunk_kb', DEFAULT_DOWNLOAD_CHUNK_KB) * 1024),
+        "download_retries": tableau_cfg.get('download_retries', DEFAULT_DOWNLOAD_RETRIES),
+        "verify_downloads": tableau_cfg.get('verify_downloads', True),
+    }
+
+
+def _spooled_size(spool) -> int:
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    spool.seek(0)
+    return size
+
+
+def _content_url(endpoint, item_id: str, include_extract: bool, revision: Optional[str] = None) -> str:
+    url = f"{endpoint.baseurl}/{item_id}/revisions/{revision}/content" if revision else \
+        f"{endpoint.baseurl}/{item_id}/content"
+    return url if include_extract else url + "?includeExtract=False"
+
+
+def _response_filename(response) -> str:
+    disposition = Message()
+    disposition["Content-Disposition"] = response.headers.get("Content-Disposition", "")
+    return disposition.get_filename(failobj="")
+
+
+def _expected_size(response, offset: int) -> Optional[int]:
+    content_range = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+    if content_range:
+        return int(content_range.group(1))
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length and length.isdigit() else None
+
+
+def stream_download(server: TSC.Server, content_type: str, item_id: str, file_obj,
+                    include_extract: bool = True, settings: Optional[dict] = None) -> Tuple[str, TransferStats]:
+    """
+    Stream a workbook or datasource into `file_obj` in `download_chunk_bytes` reads.
+
+    Returns the file name Tableau sent and the transfer stats.
+    """
+    settings = settings or transfer_settings()
+    endpoint = getattr(server, PUBLISHABLE[content_type][0])
+    stats = TransferStats()
+    response = endpoint.get_request(_content_url(endpoint, item_id, include_extract), parameters={"stream": True})
+    try:
+        filename = _response_filename(response)
+        for chunk in response.iter_content(settings["download_chunk_bytes"]):
+            file_obj.write(chunk)
+            stats.add(len(chunk))
+    finally:
+        response.close()
+    return filename, stats.finish()
+
+
+def file_sha256(path: str, chunk_bytes: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(chunk_bytes), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _verify_file(path: str, filename: str, expected_size: Optional[int]) -> Optional[str]:
+    """Return why a downloaded file is unusable, or None when it checks out."""
+    size = os.path.getsize(path)
+    if expected_size is not None and size != expected_size:
+        return f"size {size} does not match the expected {expected_size} bytes"
+    if filename.lower().endswith(ZIP_EXTENSIONS):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                bad_member = archive.testzip()
+        except zipfile.BadZipFile as e:
+            return f"not a valid archive ({e})"
+        if bad_member:
+            return f"CRC check failed for '{bad_member}'"
+    return None
+
+
+def resumable_download(
+        server: TSC.Server,
+        content_type: str,
+        item_id: str,
+        destination_stem: str,
+        include_extract: bool = True,
+        settings: Optional[dict] = None,
+        revision: Optional[str] = None
+) -> dict:
+    """
+    Download a workbook or datasource to `<destination_stem><extension>` so it survives dropped connections.
+
+    With `revision`, that earlier revision of the item is downloaded instead of the current one.
+
+    Bytes go to `<destination_stem>.part`. After a connection error the transfer resumes from
+    the partial file's size with an HTTP Range request, and a partial file left by an earlier
+    call is resumed the same way; a server that ignores the range restarts from zero. 5xx
+    responses are retried as well, and a 416 (or a non-XML error from a proxy in front of
+    the server) on a resumed request discards the partial file and starts over. The finished
+    file is checked against the announced size and, for packaged files, every zip member's
+    CRC before it is atomically renamed into place. Returns the final path, Tableau's file
+    name, the size, its SHA-256 and how many bytes this call transferred.
+    """
+    settings = settings or transfer_settings()
+    endpoint = getattr(server, PUBLISHABLE[content_type][0])
+    url = _content_url(endpoint, item_id, include_extract, revision)
+    partial = destination_stem + PARTIAL_SUFFIX
+    stats = TransferStats()
+    retries = settings["download_retries"]
+    last_error = None
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(min(2 ** attempt, 30))
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        parameters = {"stream": True}
+        if offset:
+            parameters["headers"] = {"Range": f"bytes={offset}-"}
+        try:
+            response = endpoint.get_request(url, parameters=parameters)
+        except ServerResponseError as e:
+            if offset and str(e.code).startswith("416"):
+                os.remove(partial)  # partial no longer matches the content, start over
+                last_error = e
+                continue
+            raise
+        except NonXMLResponseError as e:
+            # Error bodies that are not Tableau XML come from a proxy or gateway in front of the server;
+            # on a range request that is most likely its 416, so the partial file is dropped as well
+            if offset:
+                os.remove(partial)
+            last_error = e
+            logger.warning(f"Download of {content_type} {item_id} was refused by an intermediary ({e}), retrying")
+            continue
+        except (InternalServerError, requests.RequestException) as e:
+            last_error = e
+            logger.warning(f"Download of {content_type} {item_id} failed to start ({e}), retrying")
+            continue
+
+        try:
+            filename = _response_filename(response)
+            if offset and response.status_code != 206:
+                logger.info(f"Server ignored the range request for {item_id}, restarting download")
+                offset = 0
+            elif offset:
+                logger.info(f"Resuming {content_type} {item_id} at byte {offset}")
+            expected = _expected_size(response, offset)
+            with open(partial, "ab" if offset else "wb") as file_obj:
+                for chunk in response.iter_content(settings["download_chunk_bytes"]):
+                    file_obj.write(chunk)
+                    stats.add(len(chunk))
+        except requests.RequestException as e:
+            last_error = e
+            logger.warning(f"Download of {content_type} {item_id} interrupted at "
+                           f"{os.path.getsize(partial) if os.path.exists(partial) else 0} bytes ({e}), resuming")
+            continue
+        finally:
+            response.close()
+
+        if expected is not None and os.path.getsize(partial) < expected:
+            last_error = DownloadIncompleteError(f"connection closed after {os.path.getsize(partial)} "
+                                                 f"of {expected} bytes")
+            continue
+        problem = _verify_file(partial, filename, expected) if settings["verify_downloads"] else None
+        if problem:
+            os.remove(partial)
+            last_error = DownloadIncompleteError(f"verification failed: {problem}")
+            logger.warning(f"Discarding download of {content_type} {item_id}: {problem}")
+            continue
+
+        extension = os.path.splitext(filename)[1] or (".twbx" if content_type == "workbook" else ".tdsx")
+        path = destination_stem + extension
+        os.replace(partial, path)
+        stats.finish()
+        return {
+            "path": path,
+            "filename": filename,
+            "bytes": os.path.getsize(path),
+            "sha256": file_sha256(path),
+            "transferred_bytes": stats.bytes,
+            "seconds": round(stats.seconds, 3),
+            "bytes_per_second": stats.bytes_per_second,
+        }
+
+    raise DownloadIncompleteError(f"Download of {content_type} {item_id} failed after {retries + 1} attempts: "
+                                  f"{last_error}")
+
+
+def spooled_download(
+        server: TSC.Server,
+        content_type: str,
+        item_id: str,
+        include_extract: bool = True,
+        settings: Optional[dict] = None
+) -> Tuple[tempfile.SpooledTemporaryFile, str, TransferStats]:
+    """
+    Stream a workbook or datasource into a spooled temporary file.
+
+    Content stays in memory up to `spool_max_bytes` and rolls over to a temp file on disk
+    beyond that, so peak memory per transfer is bounded regardless of the file size.
+    Returns the spool (rewound), the file name Tableau sent and the transfer stats;
+    the caller closes the spool, which deletes any disk copy.
+    """
+    settings = settings or transfer_settings()
+    spool = tempfile.SpooledTemporaryFile(max_size=settings["spool_max_bytes"], dir=settings["spool_dir"])
+    try:
+        filename, stats = stream_download(server, content_type, item_id, spool, include_extract, settings)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    logger.info(f"Downloaded {content_type} {item_id}: {stats.bytes} bytes in {stats.seconds:.1f}s "
+                f"({stats.bytes_per_second or 0} bytes/sec, "
+                f"{'spilled to disk' if stats.bytes > settings['spool_max_bytes'] else 'in memory'})")
+    return spool, filename, stats
+
+
+def publish_spooled(
+        server: TSC.Server,
+        content_type: str,
+        item,
+        spool,
+        filename: str,
+        mode: str = TSC.Server.PublishMode.CreateNew,
+        settings: Optional[dict] = None
+):
+    """
+    Publish a spooled (or on-disk) workbook or datasource without reading it fully into memory.
+
+    Small files go up in a single request. Larger ones are sent through a file upload
+    session in `upload_chunk_bytes` pieces and then committed, which is what TSC does above
+    64 MB, but starting at the spool threshold so only one chunk is ever held in memory.
+    """
+    settings = settings or transfer_settings()
+    endpoint_name, request_factory, item_class, type_parameter = PUBLISHABLE[content_type]
+    endpoint = getattr(server, endpoint_name)
+    size = _spooled_size(spool)
+
+    if size < settings["spool_max_bytes"]:
+        published = endpoint.publish(item, BytesIO(spool.read()), mode=mode)
+        report_progress(add_bytes=size)
+        return published
+
+    stats = TransferStats()
+    upload_id = server.fileuploads.initiate()
+    while True:
+        chunk = spool.read(settings["upload_chunk_bytes"])
+        if not chunk:
+            break
+        request, multipart_type = RequestFactory.Fileupload.chunk_req(chunk)
+        server.fileuploads.append(upload_id, request, multipart_type)
+        stats.add(len(chunk))
+    stats.finish()
+    logger.info(f"Uploaded {stats.bytes} bytes of {filename} in {stats.seconds:.1f}s "
+                f"({stats.bytes_per_second or 0} bytes/sec)")
+
+    file_extension = os.path.splitext(filename)[1][1:]
+    url = f"{endpoint.baseurl}?{type_parameter}={file_extension}&uploadSessionId={upload_id}"
+    if mode == TSC.Server.PublishMode.Overwrite:
+        url += "&overwrite=true"
+    xml_request, multipart_type = request_factory.publish_req_chunked(item)
+    response = endpoint.post_request(url, xml_request, multipart_type)
+    return item_class.from_response(response.content, server.namespace)[0]
@@ -0,0 +1,251 @@
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator, List, Optional
+
+# Sections of the summary; "sheets" covers worksheets, dashboards and stories
+SECTIONS = ("extensions", "datasources", "connections", "custom_sql", "calculated_fields", "parameters",
+            "sheets", "fonts", "images")
+
+# Element paths of the workbook-level definitions (worksheets repeat some of them as references);
+# a .tds has the datasource as its root
+DATASOURCE_PATH = ("workbook", "datasources", "datasource")
+TDS_DATASOURCE_PATH = ("datasource",)
+WORKSHEET_PATH = ("workbook", "worksheets", "worksheet")
+DASHBOARD_PATH = ("workbook", "dashboards", "dashboard")
+
+PARAMETERS_DATASOURCE = "Parameters"
+CONNECTION_FIELDS = ("class", "server", "dbname", "filename")
+
+
+@contextmanager
+def open_twb(workbook_path: str) -> Iterator[IO[bytes]]:
+    """
+    Open the workbook XML of a .twb file, or of the .twb member inside a .twbx, as a stream.
+
+    Datasources (.tds / .tdsx) open the same way. Nothing is extracted to disk; the member
+    is decompressed as it is read.
+    """
+    if not zipfile.is_zipfile(workbook_path):
+        with open(workbook_path, "rb") as twb:
+            yield twb
+        return
+    with zipfile.ZipFile(workbook_path, "r") as archive:
+        # The workbook sits at the top level; packaged files may include other .twb files
+        names = archive.namelist()
+        members = sorted((name for name in names if name.lower().endswith(".twb")), key=lambda name: name.count("/")) \
+            or sorted((name for name in names if name.lower().endswith(".tds")), key=lambda name: name.count("/"))
+        if not members:
+            raise FileNotFoundError("No .twb or .tds file found in the packaged archive.")
+        with archive.open(members[0]) as twb:
+            yield twb
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1].lower()
+
+
+def _field_name(attrib: dict) -> str:
+    return attrib.get("caption") or attrib.get("name", "").strip("[]")
+
+
+class TwbAnalysis:
+    """
+    Summary of one workbook built from `iterparse` events.
+
+    Elements are inspected on their start event, when their attributes are complete, so
+    nothing has to be kept once an element is finished; only custom SQL, which is element
+    text, is read on the end event.
+    """
+
+    def __init__(self, sections: Iterable[str] = SECTIONS):
+        self.sections = set(sections)
+        unknown = self.sections - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown analysis section(s): {', '.join(sorted(unknown))}")
+        self.extensions = {"tabpy": False, "einstein": False, "viz_ext": False}
+        self.datasources: List[str] = []
+        self.connections: List[dict] = []
+        self.custom_sql: List[dict] = []
+        self.calculated_fields: List[dict] = []
+        self.parameters: List[dict] = []
+        self.worksheets: List[str] = []
+        self.dashboards: List[str] = []
+        self.stories: List[str] = []
+        self.fonts = set()
+        self.images = set()
+        self._datasource_path = DATASOURCE_PATH
+        self._datasource: Optional[str] = None
+        self._column: Optional[dict] = None
+        self._seen = set()
+
+    @property
+    def complete(self) -> bool:
+        """True once nothing more can change the summary, so parsing may stop early."""
+        return self.sections <= {"extensions"} and all(self.extensions.values())
+
+    def _once(self, *key) -> bool:
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        return True
+
+    def start(self, path: List[str], attrib: dict):
+        tag = path[-1]
+        if "extensions" in self.sections:
+            if "extension" in tag:
+                self.extensions["viz_ext"] = True
+                if tag == "extension" and "einstein" in attrib.get("url", "").lower():
+                    self.extensions["einstein"] = True
+            elif tag == "script" and "tabpy" in attrib.get("url", "").lower():
+                self.extensions["tabpy"] = True
+
+        depth = len(path)
+        if depth == 1 and tag == "datasource":
+            self._datasource_path = TDS_DATASOURCE_PATH
+        base = len(self._datasource_path)
+        if depth >= base and tuple(path[:base]) == self._datasource_path:
+            self._datasource_start(path, attrib)
+        elif depth == 3 and tuple(path) == WORKSHEET_PATH and "sheets" in self.sections:
+            self.worksheets.append(attrib.get("name", ""))
+        elif depth == 3 and tuple(path) == DASHBOARD_PATH and "sheets" in self.sections:
+            (self.stories if attrib.get("type") == "storyboard" else self.dashboards).append(attrib.get("name", ""))
+
+        if "fonts" in self.sections:
+            if tag == "format" and attrib.get("attr") == "font-family" and attrib.get("value"):
+                self.fonts.add(attrib["value"])
+            elif tag == "run" and attrib.get("fontname"):
+                self.fonts.add(attrib["fontname"])
+        if "images" in self.sections:
+            if tag == "zone" and "bitmap" in (attrib.get("type-v2"), attrib.get("type")) and attrib.get("param"):
+                self.images.add(attrib["param"])
+            elif tag == "background_image" and attrib.get("image"):
+                self.images.add(attrib["image"])
+
+    def _datasource_start(self, path: List[str], attrib: dict):
+        # depth relative to the datasource element
+        depth, tag = len(path) - len(self._datasource_path), path[-1]
+        if depth == 0:
+            self._datasource = _field_name(attrib)
+            if "datasources" in self.sections and attrib.get("name") != PARAMETERS_DATASOURCE:
+                self.datasources.append(self._datasource)
+        elif depth == 1 and tag == "column":
+            self._column = attrib
+            if "param-domain-type" in attrib and "parameters" in self.sections:
+                self.parameters.append({"name": _field_name(attrib), "datatype": attrib.get("datatype"),
+                                        "value": attrib.get("value")})
+        elif depth == 2 and tag == "calculation" and path[-2] == "column" and self._column is not None:
+            if "param-domain-type" not in self._column and attrib.get("class") == "tableau" \
+                    and "calculated_fields" in self.sections:
+                self.calculated_fields.append({"datasource": self._datasource, "name": _field_name(self._column),
+                                               "field": self._column.get("name"), "formula": attrib.get("formula")})
+        elif tag == "connection" and "connections" in self.sections and attrib.get("class") != "federated":
+            connection = {field: attrib[field] for field in CONNECTION_FIELDS if attrib.get(field)}
+            if self._once("connection", *sorted(connection.items())):
+                self.connections.append(connection)
+
+    def end(self, path: List[str], element: ET.Element):
+        """`path` still includes the finished element."""
+        base = len(self._datasource_path)
+        if path[-1] == "relation" and element.attrib.get("type") == "text" and "custom_sql" in self.sections \
+                and len(path) > base and tuple(path[:base]) == self._datasource_path:
+            query = (element.text or "").strip()
+            # The relationship model repeats each relation in the datasource's object graph
+            if query and self._once("custom_sql", self._datasource, query):
+                self.custom_sql.append({"datasource": self._datasource, "name": element.attrib.get("name"),
+                                        "query": query})
+        elif path[-1] == "column" and len(path) == base + 1:
+            self._column = None
+
+    def summary(self) -> dict:
+        summary = {}
+        if "extensions" in self.sections:
+            summary["extensions"] = dict(self.extensions)
+        for section in ("datasources", "connections", "custom_sql", "calculated_fields", "parameters"):
+            if section in self.sections:
+                summary[section] = getattr(self, section)
+        if "sheets" in self.sections:
+            summary.update(worksheets=self.worksheets, dashboards=self.dashboards, stories=self.stories)
+        for section in ("fonts", "images"):
+            if section in self.sections:
+                summary[section] = sorted(getattr(self, section))
+        summary["counts"] = {key: len(value) for key, value in summary.items() if isinstance(value, list)}
+        return summary
+
+
+def analyze_twb(workbook_path: str, sections: Iterable[str] = SECTIONS) -> dict:
+    """
+    Summarize a .twb / .twbx (or .tds / .tdsx) in one streaming pass over its XML.
+
+    The summary holds the requested `sections` (all by default): extension usage, datasource
+    names, data connections, custom SQL, calculated fields, parameters, worksheet, dashboard
+    and story names, referenced fonts and images, plus a `counts` of each list. Finished
+    elements are discarded as soon as they are read, so memory stays flat regardless of
+    workbook size, and a scan for extensions alone stops once every kind has been found.
+    Module-level so process pools can run it; parse errors are raised.
+    """
+    analysis = TwbAnalysis(sections)
+    with open_twb(workbook_path) as twb:
+        open_elements, path = [], []
+        for event, element in ET.iterparse(twb, events=("start", "end")):
+            if event == "start":
+                open_elements.append(element)
+                path.append(local_name(element.tag))
+                analysis.start(path, element.attrib)
+                continue
+            analysis.end(path, element)
+            open_elements.pop()
+            path.pop()
+            # Detach the finished element so parents never accumulate children. The parser
+            # runs ahead of these events, so it is the parent's first child, not its last.
+            element.clear()
+            if open_elements and len(open_elements[-1]) and open_elements[-1][0] is element:
+                del open_elements[-1][0]
+            if analysis.complete:
+                break
+    return analysis.summary()
+
+
+# How entries of each summary list are matched between two summaries; entries that match
+# but differ are reported as changed. Lists without a key only have additions and removals.
+DIFF_KEYS = {
+    "connections": lambda entry: (entry.get("class"), entry.get("dbname") or entry.get("filename")),
+    "calculated_fields": lambda entry: (entry["datasource"], entry["field"]),
+    "parameters": lambda entry: entry["name"],
+}
+
+
+def _diff_list(old: list, new: list, key) -> dict:
+    key = key or repr  # plain values and unkeyed entries match as a whole
+    old_entries = {key(entry): entry for entry in old}
+    new_entries = {key(entry): entry for entry in new}
+    return {
+        "added": [entry for identity, entry in new_entries.items() if identity not in old_entries],
+        "removed": [entry for identity, entry in old_entries.items() if identity not in new_entries],
+        "changed": [{"old": old_entries[identity], "new": entry} for identity, entry in new_entries.items()
+                    if identity in old_entries and old_entries[identity] != entry],
+    }
+
+
+def diff_summaries(old: dict, new: dict) -> dict:
+    """
+    Structural difference between two `analyze_twb` summaries.
+
+    Returns `{section: {added, removed, changed}}` for the sections that differ, e.g. added or
+    removed sheets, calculated fields whose formula changed and connections moved to another
+    server; `extensions` maps each usage kind whose flag flipped to `{old, new}`.
+    """
+    changes = {}
+    for section, new_value in new.items():
+        if section == "counts" or section not in old:
+            continue
+        if section == "extensions":
+            flipped = {kind: {"old": old[section].get(kind), "new": used} for kind, used in new_value.items()
+                       if old[section].get(kind) != used}
+            if flipped:
+                changes[section] = flipped
+            continue
+        diff = _diff_list(old[section], new_value, DIFF_KEYS.get(section))
+        if any(diff.values()):
+            changes[section] = diff
+    return changes
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import tableauserverclient as TSC
+
+from base_setup.utils.common_utils import load_config
+from base_setup.utils.content_catalog import catalog_for
+from base_setup.utils.download_cache import IN_USE_GRACE_SECONDS, KeyLocks, evict_lru, updated_token
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.transfer import PARTIAL_SUFFIX
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'config.yaml'
+
+DEFAULT_VIEW_CACHE_MAX_MB = 512
+DEFAULT_VIEW_CACHE_TTL_SECONDS = 3600
+
+logger = logging.getLogger('tableau_automation')
+
+
+class ViewCache:
+    """
+    On-disk cache of rendered view images, PDFs and CSVs.
+
+    Renders are keyed by view id, format, filters and resolution plus the owning workbook's
+    `updated_at`, so republishing the workbook is a new key. Renders older than `ttl_seconds`
+    are rendered again because the data behind a view changes without a republish. The
+    workbook's `updated_at` comes from the content catalog when it is enabled, so a hit
+    needs no Tableau request. Least recently used renders are evicted past `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int, ttl_seconds: float):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._key_lock = KeyLocks()
+
+    @staticmethod
+    def digest(view_id: str, download_type: str, filters: Optional[Dict[str, str]] = None,
+               resolution: Optional[str] = None) -> str:
+        variant = json.dumps([view_id, download_type, sorted((filters or {}).items()), resolution])
+        return hashlib.sha256(variant.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def _workbook_updated(server: TSC.Server, view: TSC.ViewItem) -> Optional[str]:
+        if not view.workbook_id:
+            return None  # only the TTL applies
+        catalog = catalog_for(server)
+        workbook = catalog.get("workbook", view.workbook_id) if catalog else None
+        if workbook is None:
+            workbook = server.workbooks.get_by_id(view.workbook_id)
+        return updated_token(workbook.updated_at)
+
+    def _fresh(self, prefix: str, extension: str, ttl_seconds: float) -> Optional[Path]:
+        """Newest render for `prefix` (digest and workbook version) that is still within the TTL."""
+        now = time.time()
+        for path in sorted(self.root.glob(f"{prefix}-*.{extension}"), reverse=True):
+            rendered = path.stem.rsplit("-", 1)[-1]
+            if rendered.isdigit() and now - int(rendered) < ttl_seconds:
+                return path
+        return None
+
+    def fetch(self, server: TSC.Server, view: TSC.ViewItem, download_type: str, extension: str,
+              render: Callable[[str], object], filters: Optional[Dict[str, str]] = None,
+              resolution: Optional[str] = None, max_age_seconds: Optional[float] = None,
+              workbook_updated_at=None) -> Tuple[str, bool]:
+        """
+        Return `(path, from_cache)` for the render, calling `render(path)` on a miss.
+
+        `max_age_seconds` tightens the TTL for this call; `workbook_updated_at` skips the
+        workbook lookup when the caller already has it.
+        """
+        ttl = self.ttl_seconds if max_age_seconds is None else min(self.ttl_seconds, max_age_seconds)
+        digest = self.digest(view.id, download_type, filters, resolution)
+        updated = updated_token(workbook_updated_at) if workbook_updated_at else \
+            self._workbook_updated(server, view)
+        prefix = f"{digest}-{updated or 'unknown'}"
+
+        with self._key_lock(digest):
+            cached = self._fresh(prefix, extension, ttl)
+            if cached:
+                os.utime(cached)
+                logger.info(f"Serving {download_type} of view '{view.name}' from view cache")
+                report_progress("Served from view cache")
+                return str(cached), True
+
+            path = self.root / f"{prefix}-{int(time.time())}.{extension}"
+            render(str(path))
+            # Older renders of this variant are outdated now; ones used within the grace period may
+            # still be streaming to a client and are left to LRU eviction
+            cutoff = time.time() - IN_USE_GRACE_SECONDS
+            for other in self.root.glob(f"{digest}-*"):
+                if other == path or other.name.endswith(PARTIAL_SUFFIX):
+                    continue
+                try:
+                    if other.stat().st_mtime < cutoff:
+                        other.unlink(missing_ok=True)
+                except FileNotFoundError:
+                    pass
+
+        evict_lru(self.root, self.max_bytes, keep=path)
+        return str(path), False
+
+
+_view_cache: Optional[ViewCache] = None
+_view_cache_lock = threading.Lock()
+
+
+def get_view_cache() -> Optional[ViewCache]:
+    """
+    Return the shared render cache in `<download_path>/.view_cache` (or `view_cache_path`),
+    capped at `view_cache_max_mb`, or None when `view_cache_ttl_seconds` is 0.
+    """
+    global _view_cache
+    with _view_cache_lock:
+        if _view_cache is None:
+            tableau_cfg = load_config(str(CONFIG_PATH)).get('tableau', {})
+            ttl_seconds = tableau_cfg.get('view_cache_ttl_seconds', DEFAULT_VIEW_CACHE_TTL_SECONDS)
+            if not ttl_seconds:
+                return None
+            root = tableau_cfg.get('view_cache_path') or \
+                os.path.join(tableau_cfg.get('download_path', 'downloads'), '.view_cache')
+            max_mb = tableau_cfg.get('view_cache_max_mb', DEFAULT_VIEW_CACHE_MAX_MB)
+            _view_cache = ViewCache(root, int(max_mb * 1024 * 1024), ttl_seconds)
+        return _view_cache
@@ -1,13 +1,48 @@
+import logging
+
 from fastapi import FastAPI
 
+from base_setup.utils.content_catalog import load_catalog_snapshots, start_catalog_sync, stop_catalog_sync
+from base_setup.utils.executors import shutdown_executors
+from base_setup.utils.http_client import close_http_client
+from base_setup.utils.jobs import fail_interrupted_jobs, purge_jobs
+from base_setup.utils.session_pool import close_session_pools
 from routers import tableau
 
+logger = logging.getLogger("tableau_automation")
+
 app = FastAPI(title="Tableau Automation API")
 
 app.include_router(tableau.router, prefix="/tableau", tags=["Tableau Operations"]) 
 
+
+@app.on_event("startup")
+def warm_site_catalog():
+    try:
+        load_catalog_snapshots()
+        start_catalog_sync()
+    except Exception as e:
+        logger.warning(f"Site catalog warm start skipped: {e}")
+
+
+@app.on_event("startup")
+def purge_finished_jobs():
+    try:
+        fail_interrupted_jobs()
+        purge_jobs()
+    except Exception as e:
+        logger.warning(f"Job purge skipped: {e}")
+
+
+@app.on_event("shutdown")
+async def sign_out_tableau_sessions():
+    stop_catalog_sync()
+    shutdown_executors()
+    await close_http_client()
+    close_session_pools()
+
 #
 # @app.on_event("startup")
 # def start_background_monitoring():
 #     thread = threading.Thread(target=run_monitoring)
-#     thread.start()
\ No newline at end of file
+#     thread.start()
@@ -1,23 +1,92 @@
-from typing import Optional
+import asyncio
+import json
+from functools import partial
+from typing import Dict, List, Optional
 
+import httpx
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, EmailStr
 
-from scripts.content_management.copy_content import copy_workbook_to_project
+from base_setup.utils.content_catalog import CATALOG_TYPES, get_catalog_store
+from base_setup.utils.executors import ExecutorBusyError, run_operation
+from base_setup.utils.jobs import get_job, get_job_store, submit_job
+from base_setup.utils.scan_store import get_scan_store
+from base_setup.utils.session_pool import SessionPoolTimeoutError, get_session_pool
+from base_setup.utils.streaming import StreamResolver, open_tableau_stream
+from base_setup.utils.view_cache import get_view_cache
+
+from scripts.content_management.copy_content import copy_project_content, copy_workbook_to_project
 from scripts.content_management.create_content import create_project
 from scripts.content_management.delete_content import delete_content
 from scripts.content_management.move_content import move_content
 from scripts.content_management.update_ownership import update_ownership
-from scripts.download_utils.download_content import download_content
-from scripts.download_utils.download_view_assets import download_view_asset
-from scripts.monitoring.audit_multiple_sites import audit_site_user_group_roles
+from scripts.download_utils.backup_site import backup_site
+from scripts.download_utils.download_content import download_content, resolve_content_stream
+from scripts.download_utils.download_view_assets import (cached_view_asset, download_view_asset, export_views,
+                                                         resolve_view_asset_stream)
+from scripts.monitoring.audit_multiple_sites import audit_multiple_sites, audit_site_user_group_roles
 from scripts.monitoring.check_tcm_access import check_tcm_access
 from scripts.monitoring.validate_personal_space import validate_personal_spaces
-from scripts.revision_history.get_revision_history import get_revision_history
-from scripts.site_monitoring.slack_connectivity import slack_integration_with_webhook
+from scripts.revision_history.get_revision_history import diff_revisions, get_revision_history
+from scripts.site_monitoring.slack_connectivity import check_slack_connection
 
 router = APIRouter()
 
+# Capacity errors answered with 503 so clients back off and retry
+BUSY_ERRORS = (ExecutorBusyError, SessionPoolTimeoutError)
+
+
+async def offload(operation: str, func, *args, **kwargs):
+    """
+    Run a blocking call on the executor of its operation class ("lookup", "mutation",
+    "download" or "audit"), answering 503 when that class is already at capacity or no
+    Tableau session frees up in time.
+    """
+    try:
+        return await run_operation(operation, func, *args, **kwargs)
+    except BUSY_ERRORS as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+async def run_tableau(operation: str, func, *args, site_id: Optional[str] = None, **kwargs):
+    """Offload a script function that takes `server=`, running it with a pooled session."""
+    return await offload(operation, get_session_pool(site_id).run, func, *args, **kwargs)
+
+
+async def start_job(kind: str, operation: str, func, *args, params: dict, site_id: Optional[str] = None,
+                    **kwargs) -> JSONResponse:
+    """Queue a script function as a background job and answer 202 with the job id to poll."""
+    try:
+        job = await asyncio.to_thread(submit_job, kind, operation, get_session_pool(site_id).run, func, *args,
+                                      params=params, **kwargs)
+    except BUSY_ERRORS as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return JSONResponse(status_code=202, content={
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/tableau/jobs/{job['id']}",
+    })
+
+
+async def stream_tableau(resolve: StreamResolver, site_id: Optional[str] = None) -> StreamingResponse:
+    """Pipe a Tableau download straight to the client without buffering it on disk or in memory."""
+    try:
+        stream = await open_tableau_stream(resolve, site_id=site_id)
+    except BUSY_ERRORS as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        raise HTTPException(status_code=404 if status == 404 else 502, detail=f"Tableau returned {status}")
+    # The background task releases the session when the client disconnects mid-stream
+    return StreamingResponse(stream.iter_bytes(), media_type=stream.media_type, headers=stream.headers,
+                             background=BackgroundTask(stream.aclose))
+
 
 class WorkbookCreateRequest(BaseModel):
     workbook_name: str
@@ -25,6 +94,15 @@ class WorkbookCreateRequest(BaseModel):
     source_project: str | None = None
 
 
+class CopyProjectRequest(BaseModel):
+    source_project: str
+    target_project: str
+    recursive: bool = False  # also copy child projects, recreating them under the target
+    overwrite: bool = False
+    download_workers: Optional[int] = None
+    publish_workers: Optional[int] = None
+
+
 class MoveContentRequest(BaseModel):
     content_type: str  # "workbook" or "datasource"
     content_name: str
@@ -47,6 +125,14 @@ class RevisionHistoryRequest(BaseModel):
     project_name: Optional[str] = None  # Add project context if required for lookup
 
 
+class RevisionDiffRequest(BaseModel):
+    content_type: str
+    content_name: str
+    project_name: Optional[str] = None
+    old_revision: Optional[str] = None  # defaults to the revision before new_revision
+    new_revision: Optional[str] = None  # defaults to the current revision
+
+
 class DownloadRequest(BaseModel):
     content_type: str
     content_name: str
@@ -54,11 +140,53 @@ class DownloadRequest(BaseModel):
     format_type: Optional[str] = None  # e.g., 'pdf', 'csv', 'twb'
 
 
+class BackupRequest(BaseModel):
+    output_dir: Optional[str] = None  # relative to backup_path in config.yaml
+    archive: bool = False  # pack the backup into a .tar
+    include_extract: bool = True
+    include_revisions: bool = False
+    max_workers: Optional[int] = None
+    incremental: bool = False  # only download items changed since the last backup
+
+
+class ViewExportRequest(BaseModel):
+    workbook_name: Optional[str] = None  # export every view of this workbook...
+    view_names: Optional[List[str]] = None  # ...or only these views
+    project_name: Optional[str] = None
+    download_format: str = "image"  # 'image', 'pdf' or 'csv'
+    filters: Optional[Dict[str, str]] = None  # view filters, field name -> value
+    resolution: Optional[str] = None  # 'high' for high-resolution images
+    max_age: Optional[int] = None  # minutes Tableau may serve a cached render
+    output_dir: Optional[str] = None  # relative to download_path in config.yaml
+    max_workers: Optional[int] = None  # defaults to view_export_concurrency in config.yaml
+    use_cache: bool = True  # reuse renders still fresh in the view cache
+
+
+class ExtensionScanRequest(BaseModel):
+    project_name: Optional[str] = None  # whole site when omitted
+    download_workers: Optional[int] = None  # defaults to extension_scan_download_concurrency
+    parse_processes: Optional[int] = None  # defaults to extension_scan_processes
+    rescan: bool = False  # scan every workbook, not only those changed since the last scan
+
+
+class LineageExportRequest(BaseModel):
+    workbook_names: Optional[List[str]] = None  # every workbook of the site (or project) when omitted
+    project_name: Optional[str] = None
+    page_size: Optional[int] = None  # defaults to lineage_page_size in config.yaml
+
+
 class ProjectCreateRequest(BaseModel):
     project_name: str
     description: str = ""
 
 
+class AuditSitesRequest(BaseModel):
+    site_names: List[str] = []  # site content URLs
+    all_sites: bool = False  # audit every site on the server (server admins only)
+    full: bool = False
+    max_workers: Optional[int] = None
+
+
 class DeleteContentRequest(BaseModel):
     content_type: str  # "project", "workbook", "datasource"
     content_name: str
@@ -66,24 +194,26 @@ class DeleteContentRequest(BaseModel):
 
 
 @router.post("/create_project")
-def api_create_project(req: ProjectCreateRequest):
-    result = create_project(req.project_name, req.description)
+async def api_create_project(req: ProjectCreateRequest):
+    result = await run_tableau("mutation", create_project, req.project_name, req.description)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 
 @router.post("/delete_content")
-def api_delete_content(req: DeleteContentRequest):
-    result = delete_content(req.content_type, req.content_name, project_name=req.project_name)
+async def api_delete_content(req: DeleteContentRequest):
+    result = await run_tableau("mutation", delete_content, req.content_type, req.content_name,
+                               project_name=req.project_name)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 
 @router.post("/move_content")
-def api_move_content(req: MoveContentRequest):
-    result = move_content(req.content_type, req.content_name, req.source_project, req.new_project)
+async def api_move_content(req: MoveContentRequest):
+    result = await run_tableau("mutation", move_content, req.content_type, req.content_name,
+                               req.source_project, req.new_project)
 
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
@@ -92,113 +222,327 @@ def api_move_content(req: MoveContentRequest):
 
 
 @router.post("/update_ownership")
-def api_update_ownership(req: UpdateOwnershipRequest):
+async def api_update_ownership(req: UpdateOwnershipRequest):
     # Placeholder call to the script function
-    result = update_ownership(req.content_type, req.content_name, str(req.current_owner), str(req.new_owner),
-                              req.project_name)
+    result = await run_tableau("mutation", update_ownership, req.content_type, req.content_name,
+                               str(req.current_owner), str(req.new_owner), req.project_name)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 
 @router.post("/revision_history")
-def api_revision_history(req: RevisionHistoryRequest):
+async def api_revision_history(req: RevisionHistoryRequest):
     # Placeholder call to the script function
-    result = get_revision_history(req.content_type, req.content_name, req.project_name)
+    result = await run_tableau("lookup", get_revision_history, req.content_type, req.content_name,
+                               req.project_name)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+
+@router.post("/revision_diff")
+async def api_revision_diff(req: RevisionDiffRequest, background: bool = False):
+    """Added / removed sheets, changed calculations, connections and custom SQL between two revisions."""
+    args = (req.content_type, req.content_name, req.old_revision, req.new_revision, req.project_name)
+    if background:
+        return await start_job("revision_diff", "download", diff_revisions, *args, params=req.model_dump())
+    result = await run_tableau("download", diff_revisions, *args)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 
 @router.post("/download_content")
-def api_download(req: DownloadRequest):
+async def api_download(req: DownloadRequest, background: bool = False):
     # Placeholder call to the script function
-    result = download_content(req.content_type, req.content_name, req.project_name)
+    if background:
+        return await start_job("download_content", "download", download_content, req.content_type,
+                               req.content_name, req.project_name, params=req.model_dump())
+    result = await run_tableau("download", download_content, req.content_type, req.content_name,
+                               req.project_name)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 
+@router.get("/download_content/stream")
+async def api_download_stream(content_type: str, content_name: str, project_name: Optional[str] = None,
+                              include_extract: Optional[bool] = None):
+    return await stream_tableau(partial(resolve_content_stream, content_type=content_type,
+                                        content_name=content_name, project_name=project_name,
+                                        include_extract=include_extract))
+
+
+@router.post("/backup_site")
+async def api_backup_site(req: BackupRequest, background: bool = False):
+    args = (req.output_dir, req.archive, req.include_extract, req.include_revisions, req.max_workers,
+            req.incremental)
+    if background:
+        return await start_job("backup_site", "download", backup_site, *args, params=req.model_dump())
+    result = await run_tableau("download", backup_site, *args)
+    if "path" not in result:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+
 @router.post("/copy_content")
-def api_create_workbook(req: WorkbookCreateRequest):
+async def api_create_workbook(req: WorkbookCreateRequest, background: bool = False):
     # log_blank_line(logger)
-    result = copy_workbook_to_project(req.workbook_name, req.source_project, req.target_project)
+    if background:
+        return await start_job("copy_content", "mutation", copy_workbook_to_project, req.workbook_name,
+                               req.source_project, req.target_project, params=req.model_dump())
+    result = await run_tableau("mutation", copy_workbook_to_project, req.workbook_name, req.source_project,
+                               req.target_project)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 
+@router.post("/copy_project")
+async def api_copy_project(req: CopyProjectRequest, background: bool = False):
+    args = (req.source_project, req.target_project, req.recursive, req.overwrite, req.download_workers,
+            req.publish_workers)
+    if background:
+        return await start_job("copy_project", "mutation", copy_project_content, *args, params=req.model_dump())
+    result = await run_tableau("mutation", copy_project_content, *args)
+    if "items" not in result:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+
 @router.get("/slack_connection")
-def slack_connection():
+async def slack_connection():
     """
-    Placeholder endpoint to test Slack connection.
-    This can be replaced with actual Slack integration logic.
+    Test the Slack connection by posting to the configured webhook.
+    Needs no Tableau session; a failed post is answered with 502.
     """
-    return slack_integration_with_webhook()
+    result = await asyncio.to_thread(check_slack_connection)
+    if not result["success"]:
+        raise HTTPException(status_code=502, detail=result["message"])
+    return result
 
 
 @router.post("/audit_site")
-def audit_site(site_name: str = None):
-    return audit_site_user_group_roles(site_override=site_name)
+async def audit_site(site_name: str = None, full: bool = False):
+    return await run_tableau("audit", audit_site_user_group_roles, site_override=site_name, full=full,
+                             site_id=site_name or None)
+
+
+@router.post("/audit_sites")
+async def audit_sites(req: AuditSitesRequest):
+    result = await offload("audit", audit_multiple_sites, req.site_names, all_sites=req.all_sites,
+                           full=req.full, max_workers=req.max_workers)
+    if not result["sites"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
 
 
 @router.get("/personal_spaces")
-def get_personal_spaces():
+async def get_personal_spaces():
     """
     Placeholder endpoint to fetch personal spaces.
     This can be replaced with actual logic to fetch personal spaces from Tableau.
     """
-    result = validate_personal_spaces()
+    result = await run_tableau("lookup", validate_personal_spaces)
     return result
 
 
 @router.get("/get_lineage_for_workbook")
-def get_lineage_for_workbook(workbook_name: str):
+async def get_lineage_for_workbook(workbook_name: str):
     """
     Placeholder endpoint to get lineage for a specific workbook.
     This can be replaced with actual logic to fetch lineage from Tableau.
     """
     from scripts.monitoring.check_lineage_graphql import get_lineage_for_workbook as lineage_function
-    result = lineage_function(workbook_name)
+    result = await run_tableau("lookup", lineage_function, workbook_name)
     if not result:
         raise HTTPException(status_code=404, detail="Workbook not found or no lineage data available.")
     return result
 
 
+@router.post("/export_lineage")
+async def export_lineage(req: LineageExportRequest, background: bool = False):
+    """Lineage of many or all workbooks in a few paginated Metadata API requests, written as JSON Lines."""
+    from scripts.monitoring.check_lineage_graphql import export_site_lineage
+    args = (req.workbook_names, req.project_name, req.page_size)
+    if background:
+        return await start_job("export_lineage", "audit", export_site_lineage, *args, params=req.model_dump())
+    result = await run_tableau("audit", export_site_lineage, *args)
+    if not result["success"]:
+        raise HTTPException(status_code=502, detail=result["message"])
+    return result
+
+
+@router.get("/lineage/stream")
+async def stream_lineage(workbook_names: Optional[str] = None, project_name: Optional[str] = None,
+                         page_size: Optional[int] = None, site_id: Optional[str] = None):
+    """
+    Workbook lineage as newline-delimited JSON, one workbook per line, sent page by page as the
+    Metadata API returns it. `workbook_names` is comma-separated; all workbooks when omitted.
+    """
+    from scripts.monitoring.check_lineage_graphql import aiter_workbook_lineage
+    names = [name.strip() for name in workbook_names.split(",") if name.strip()] if workbook_names else None
+    pages = aiter_workbook_lineage(names, project_name, page_size, site_id=site_id)
+    try:
+        first = await pages.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except BUSY_ERRORS as e:
+        await pages.aclose()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except (httpx.HTTPError, RuntimeError) as e:
+        await pages.aclose()
+        raise HTTPException(status_code=502, detail=f"Metadata API request failed: {e}")
+
+    async def lines():
+        try:
+            for workbook in first:
+                yield json.dumps(workbook) + "\n"
+            async for page in pages:
+                for workbook in page:
+                    yield json.dumps(workbook) + "\n"
+        finally:
+            await pages.aclose()
+
+    # The background task releases the session when the client disconnects mid-stream
+    return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(pages.aclose))
+
+
 @router.get("/check_tcm_access")
-def check_tcm_access_for_site(site_name: str = None):
+async def check_tcm_access_for_site(site_name: str = None):
     """
     Placeholder endpoint to check TCM access.
     This can be replaced with actual logic to check TCM access.
     """
     # Implement the actual access check logic here
-    return check_tcm_access(site_name)
+    return await run_tableau("lookup", check_tcm_access, site_name, site_id=site_name or None)
 
 
 @router.get("/download_view_features")
-def download_view_features(view_name: str, download_format: str = "image"):
+async def download_view_features(view_name: str, download_format: str = "image"):
     """
     Placeholder endpoint to download view features.
     This can be replaced with actual logic to download view features from Tableau.
     """
-    return download_view_asset(view_name, download_format)
+    return await run_tableau("download", download_view_asset, view_name, download_format)
+
+
+@router.get("/download_view_features/stream")
+async def download_view_features_stream(view_name: str, download_format: str = "image", use_cache: bool = True):
+    if not use_cache or get_view_cache() is None:
+        return await stream_tableau(partial(resolve_view_asset_stream, view_name=view_name,
+                                            download_type=download_format))
+    # Repeated renders are served from the view cache on disk
+    result = await run_tableau("download", cached_view_asset, view_name, download_format)
+    if not result["success"]:
+        raise HTTPException(status_code=404 if "not found" in result["message"] else 400, detail=result["message"])
+    return FileResponse(result["path"], filename=result["filename"],
+                        headers={"X-Cache": "HIT" if result["from_cache"] else "MISS"})
+
+
+@router.post("/export_views")
+async def api_export_views(req: ViewExportRequest, background: bool = False):
+    args = (req.workbook_name, req.view_names, req.project_name, req.download_format, req.filters,
+            req.resolution, req.max_age, req.output_dir, req.max_workers, req.use_cache)
+    if background:
+        return await start_job("export_views", "download", export_views, *args, params=req.model_dump())
+    result = await run_tableau("download", export_views, *args)
+    if "views" not in result:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
 
 
 @router.get("/check_extensions_in_workbook")
-def check_extensions_in_workbook(workbook_name: str):
+async def check_extensions_in_workbook(workbook_name: str, background: bool = False):
     """
     Placeholder endpoint to check for extensions in a workbook.
     This can be replaced with actual logic to scan for extensions in Tableau workbooks.
     """
     from scripts.monitoring.verify_dashboard_extensions import check_extensions_in_workbook as extensions_function
-    return extensions_function(workbook_name)
+    if background:
+        return await start_job("check_extensions", "download", extensions_function, workbook_name,
+                               params={"workbook_name": workbook_name})
+    return await run_tableau("download", extensions_function, workbook_name)
+
+
+@router.get("/analyze_workbook")
+async def analyze_workbook(workbook_name: str, sections: Optional[str] = None, background: bool = False):
+    """
+    Static summary of a workbook (connections, custom SQL, calculated fields, parameters, sheets,
+    fonts, images, extensions) from one parse. `sections` is a comma-separated subset.
+    """
+    from scripts.monitoring.analyze_workbook import analyze_workbook as analyze_function
+    section_list = [section.strip() for section in sections.split(",") if section.strip()] if sections else None
+    if background:
+        return await start_job("analyze_workbook", "download", analyze_function, workbook_name, section_list,
+                               params={"workbook_name": workbook_name, "sections": section_list})
+    result = await run_tableau("download", analyze_function, workbook_name, section_list)
+    if not result["success"]:
+        raise HTTPException(status_code=404 if "not found" in result["message"] else 400, detail=result["message"])
+    return result
+
+
+@router.post("/scan_site_extensions")
+async def scan_site_extensions(req: ExtensionScanRequest, background: bool = False):
+    """Extension usage of every workbook on the site (or in one project), also written as CSV."""
+    from scripts.monitoring.verify_dashboard_extensions import scan_site_extensions as scan_function
+    args = (req.project_name, req.download_workers, req.parse_processes, req.rescan)
+    if background:
+        return await start_job("scan_site_extensions", "audit", scan_function, *args, params=req.model_dump())
+    result = await run_tableau("audit", scan_function, *args)
+    if "workbooks" not in result:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+
+@router.get("/extension_scan_results")
+async def extension_scan_results(site: Optional[str] = None, name: Optional[str] = None,
+                                 project_name: Optional[str] = None, tabpy: Optional[bool] = None,
+                                 einstein: Optional[bool] = None, viz_ext: Optional[bool] = None):
+    """
+    Stored results of earlier extension scans, without contacting Tableau. `site` is a site id
+    or content URL; `tabpy` / `einstein` / `viz_ext` filter on whether that usage was found.
+    """
+    return await asyncio.to_thread(get_scan_store().query, site, name, project_name, tabpy, einstein, viz_ext)
+
+
+@router.get("/inventory")
+async def inventory(content_type: str, site: Optional[str] = None, name: Optional[str] = None,
+                    project_name: Optional[str] = None, owner_id: Optional[str] = None):
+    """
+    Site inventory from the catalog snapshot, without contacting Tableau. `content_type` is one of
+    project, workbook, datasource, view, user or group; `site` is a site id or content URL.
+    """
+    if content_type not in CATALOG_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid content type '{content_type}'; "
+                                                    f"expected any of {', '.join(CATALOG_TYPES)}.")
+    store = get_catalog_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="The catalog snapshot is disabled (catalog_db_path).")
+    return await asyncio.to_thread(store.query, content_type, site, name, project_name=project_name,
+                                   owner_id=owner_id)
 
 
 @router.get("/confirm_content_labels_and_description")
-def confirm_content_labels_and_description():
+async def confirm_content_labels_and_description():
     """
     Placeholder endpoint to confirm content labels and descriptions.
     This can be replaced with actual logic to verify content labels and descriptions in Tableau.
     """
     from scripts.monitoring.content_labels_and_description import check_metadata_for_content
-    return check_metadata_for_content()
+    return await run_tableau("audit", check_metadata_for_content)
+
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50):
+    return await asyncio.to_thread(get_job_store().recent, limit)
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status, progress (message, bytes transferred) and result of a background job."""
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job
@@ -1,8 +1,12 @@
+import contextvars
 import os
 import logging
-from io import BytesIO
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 import tableauserverclient as TSC
 
 # Base setup
@@ -11,34 +15,38 @@ import sys
 
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import load_config, setup_logging
+from base_setup.utils.content_catalog import record_change
+from base_setup.utils.content_resolver import find_project, find_workbook, list_project_items
+from base_setup.utils.download_cache import get_download_cache
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.paging import concurrent_pager
+from base_setup.utils.session_pool import WorkerSessions, tableau_session, worker_sessions
+from base_setup.utils.transfer import publish_spooled, spooled_download, transfer_settings
 
 # Logging
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger("tableau_automation")
 
-
-def find_project(server: TSC.Server, project_name: str) -> Optional[TSC.ProjectItem]:
-    all_projects, _ = server.projects.get()
-    for project in all_projects:
-        if project.name.strip().lower() == project_name.strip().lower():
-            return project
-    return None
+DEFAULT_COPY_DOWNLOAD_CONCURRENCY = 4
+DEFAULT_COPY_PUBLISH_CONCURRENCY = 2
+COPY_CONTENT_TYPES = {"workbook": TSC.WorkbookItem, "datasource": TSC.DatasourceItem}
 
 
 def copy_workbook_to_project(
         workbook_name: str,
         source_project_name: str,
-        target_project_name: str
+        target_project_name: str,
+        server: Optional[TSC.Server] = None
 ) -> dict:
     """
     Copy a workbook from source project to target project by downloading and republishing.
+
+    The download (skipped when the download cache has this version) and the publish are timed
+    separately; each leg reports its own rate over the workbook size.
     """
     try:
-        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, auth = get_tableau_server_and_auth(config)
-
-        with server.auth.sign_in(auth):
+        with tableau_session(server) as server:
             # Lookup source and target projects
             source_proj = find_project(server, source_project_name)
             target_proj = find_project(server, target_project_name)
@@ -49,29 +57,229 @@ def copy_workbook_to_project(
                 return {"success": False, "message": f"Target project '{target_project_name}' not found."}
 
             # Find the workbook in the source project
-            all_workbooks, _ = server.workbooks.get()
-            workbook = next(
-                (wb for wb in all_workbooks if wb.name == workbook_name and wb.project_id == source_proj.id),
-                None
-            )
+            workbook = find_workbook(server, workbook_name, project_id=source_proj.id, project_name=source_proj.name)
             if not workbook:
                 return {"success": False,
                         "message": f"Workbook '{workbook_name}' not found in project '{source_project_name}'."}
 
-            # Download the workbook in memory
-            file_obj = BytesIO()
-            server.workbooks.download(workbook.id, filepath=file_obj)
-            file_obj.seek(0)
+            # Reuse the cached download when this version was fetched before
+            download_started = time.monotonic()
+            report_progress(f"Downloading workbook '{workbook.name}'")
+            cached_path, from_cache = get_download_cache().fetch(server, "workbook", workbook)
+            size = os.path.getsize(cached_path)
+            download_seconds = time.monotonic() - download_started
+            report_progress(f"Publishing to project '{target_proj.name}'", bytes_total=size * (1 if from_cache else 2))
 
-            # Publish to target project
-            new_workbook = TSC.WorkbookItem(name=workbook_name, project_id=target_proj.id)
-            server.workbooks.publish(new_workbook, file_obj, mode=TSC.Server.PublishMode.CreateNew)
+            # Publish to target project, streaming from disk
+            publish_started = time.monotonic()
+            with open(cached_path, "rb") as file_obj:
+                new_workbook = TSC.WorkbookItem(name=workbook_name, project_id=target_proj.id)
+                published = publish_spooled(server, "workbook", new_workbook, file_obj,
+                                            os.path.basename(cached_path), mode=TSC.Server.PublishMode.CreateNew)
+            publish_seconds = time.monotonic() - publish_started
+            record_change(server, "workbook", published)
 
             return {
                 "success": True,
-                "message": f"Workbook '{workbook_name}' successfully copied from '{source_project_name}' to '{target_project_name}'."
+                "message": f"Workbook '{workbook_name}' successfully copied from '{source_project_name}' to '{target_project_name}'.",
+                "bytes_copied": size,
+                "from_cache": from_cache,
+                "download_seconds": round(download_seconds, 3),
+                "download_bytes_per_second": round(size / download_seconds)
+                if download_seconds > 0 and not from_cache else None,
+                "publish_seconds": round(publish_seconds, 3),
+                "publish_bytes_per_second": round(size / publish_seconds) if publish_seconds > 0 else None
             }
 
     except Exception as e:
         logger.error(f"Error copying workbook: {str(e)}", exc_info=True)
         return {"success": False, "message": f"Unexpected error: {str(e)}"}
+
+
+def _copy_targets(server: TSC.Server, source: TSC.ProjectItem, target: TSC.ProjectItem,
+                  recursive: bool) -> List[Tuple[TSC.ProjectItem, TSC.ProjectItem]]:
+    """
+    Pair the source project (and, when recursive, each descendant) with its target project,
+    creating missing child projects under the target with the same names.
+    """
+    if not recursive:
+        return [(source, target)]
+
+    children = defaultdict(list)
+    for project in concurrent_pager(server.projects):
+        children[project.parent_id].append(project)
+
+    pairs, pending = [], [(source, target)]
+    while pending:
+        source_project, target_project = pending.pop()
+        pairs.append((source_project, target_project))
+        existing = {child.name.lower(): child for child in children[target_project.id]}
+        for child in children[source_project.id]:
+            if child.id == target.id:
+                continue  # target nested inside source: don't copy it into itself
+            target_child = existing.get(child.name.lower())
+            if target_child is None:
+                target_child = server.projects.create(TSC.ProjectItem(name=child.name, description=child.description,
+                                                                      parent_id=target_project.id))
+                record_change(server, "project", target_child)
+                logger.info(f"Created project '{child.name}' under '{target_project.name}'")
+            pending.append((child, target_child))
+    return pairs
+
+
+def _run_copy(plan: list, workers: WorkerSessions, download_workers: int, publish_workers: int,
+              mode: TSC.Server.PublishMode, settings: dict) -> List[dict]:
+    """Download and publish every planned item, on worker threads when `publish_workers` is set."""
+    waiting = threading.BoundedSemaphore(max(publish_workers, 1) * 2)  # downloaded, not yet published
+
+    def download(content_type, item):
+        waiting.acquire()
+        try:
+            with workers.session() as worker_server:
+                return spooled_download(worker_server, content_type, item.id, settings=settings)
+        except Exception:
+            waiting.release()
+            raise
+
+    def download_failed(content_type, item, target_project, error):
+        logger.error(f"Downloading {content_type} '{item.name}' failed: {error}")
+        return _copy_result(content_type, item, target_project, success=False, stage="download", error=str(error))
+
+    def publish(content_type, item, target_project, downloaded):
+        spool, filename, stats = downloaded
+        publish_started = time.monotonic()
+        try:
+            with spool, workers.session() as worker_server:
+                new_item = COPY_CONTENT_TYPES[content_type](project_id=target_project.id, name=item.name)
+                published = publish_spooled(worker_server, content_type, new_item, spool, filename,
+                                            mode=mode, settings=settings)
+                record_change(worker_server, content_type, published)
+            report_progress(f"Copied {content_type} '{item.name}'")
+            return _copy_result(content_type, item, target_project, success=True, bytes=stats.bytes,
+                                download_seconds=round(stats.seconds, 3),
+                                publish_seconds=round(time.monotonic() - publish_started, 3))
+        except Exception as e:
+            logger.error(f"Publishing {content_type} '{item.name}' failed: {e}")
+            return _copy_result(content_type, item, target_project, success=False, stage="publish",
+                                error=str(e), download_seconds=round(stats.seconds, 3))
+        finally:
+            waiting.release()
+
+    results = []
+    if not publish_workers:
+        for content_type, item, target_project in plan:
+            try:
+                downloaded = download(content_type, item)
+            except Exception as e:
+                results.append(download_failed(content_type, item, target_project, e))
+                continue
+            results.append(publish(content_type, item, target_project, downloaded))
+        return results
+
+    with ThreadPoolExecutor(download_workers, thread_name_prefix="copy-download") as downloads, \
+            ThreadPoolExecutor(publish_workers, thread_name_prefix="copy-publish") as publishes:
+        download_futures = {
+            downloads.submit(contextvars.copy_context().run, download, content_type, item):
+                (content_type, item, target_project)
+            for content_type, item, target_project in plan
+        }
+        publish_futures = []
+        for future in as_completed(download_futures):
+            content_type, item, target_project = download_futures[future]
+            try:
+                downloaded = future.result()
+            except Exception as e:
+                results.append(download_failed(content_type, item, target_project, e))
+                continue
+            publish_futures.append(publishes.submit(contextvars.copy_context().run, publish,
+                                                    content_type, item, target_project, downloaded))
+        results += [future.result() for future in publish_futures]
+    return results
+
+
+def _copy_result(content_type: str, item, target_project: TSC.ProjectItem, **details) -> dict:
+    return {
+        "content_type": content_type,
+        "name": item.name,
+        "source_project": item.project_name,
+        "target_project": target_project.name,
+        **details
+    }
+
+
+def copy_project_content(
+        source_project_name: str,
+        target_project_name: str,
+        recursive: bool = False,
+        overwrite: bool = False,
+        download_workers: Optional[int] = None,
+        publish_workers: Optional[int] = None,
+        server: Optional[TSC.Server] = None
+) -> dict:
+    """
+    Copy every workbook and datasource of a project (and optionally its child projects) to another project.
+
+    Items flow through a producer/consumer pipeline: up to `download_workers` downloads run while up
+    to `publish_workers` publishes drain them, with at most two downloaded items waiting per
+    publisher so spooled files don't pile up. One failed item is recorded and the batch carries on.
+    Concurrency defaults come from `copy_download_concurrency` / `copy_publish_concurrency` in config.yaml.
+
+    Every download and publish runs on its own pooled session, so the workers are capped at the
+    sessions free in the pool when the copy starts. With fewer than two free, items are copied
+    one at a time on the caller's session.
+    """
+    try:
+        tableau_cfg = load_config(os.path.join(base_setup_path, 'config', 'config.yaml')).get('tableau', {})
+        download_workers = download_workers or tableau_cfg.get('copy_download_concurrency',
+                                                               DEFAULT_COPY_DOWNLOAD_CONCURRENCY)
+        publish_workers = publish_workers or tableau_cfg.get('copy_publish_concurrency',
+                                                             DEFAULT_COPY_PUBLISH_CONCURRENCY)
+        mode = TSC.Server.PublishMode.Overwrite if overwrite else TSC.Server.PublishMode.CreateNew
+        settings = transfer_settings()
+        started = time.monotonic()
+
+        with tableau_session(server) as server:
+            source = find_project(server, source_project_name)
+            target = find_project(server, target_project_name)
+            if not source:
+                return {"success": False, "message": f"Source project '{source_project_name}' not found."}
+            if not target:
+                return {"success": False, "message": f"Target project '{target_project_name}' not found."}
+            if source.id == target.id:
+                return {"success": False, "message": "Source and target project must be different."}
+
+            plan = []
+            for source_project, target_project in _copy_targets(server, source, target, recursive):
+                for content_type in COPY_CONTENT_TYPES:
+                    plan += [(content_type, item, target_project)
+                             for item in list_project_items(server, content_type, source_project)]
+
+            with worker_sessions(server, download_workers + publish_workers) as workers:
+                if workers.count < 2:
+                    download_workers = publish_workers = 0
+                elif workers.count < download_workers + publish_workers:
+                    publish_workers = max(1, min(publish_workers, workers.count // 2))
+                    download_workers = min(download_workers, workers.count - publish_workers)
+                    logger.info(f"{workers.count} free session(s) limit the copy to {download_workers} download / "
+                                f"{publish_workers} publish workers")
+                logger.info(f"Copying {len(plan)} item(s) from '{source.name}' to '{target.name}' "
+                            + (f"({download_workers} download / {publish_workers} publish workers)"
+                               if publish_workers else "one at a time, no free sessions for workers"))
+                report_progress(f"Copying {len(plan)} item(s)")
+                results = _run_copy(plan, workers, download_workers, publish_workers, mode, settings)
+
+        failed = [result for result in results if not result["success"]]
+        return {
+            "success": not failed,
+            "message": f"Copied {len(results) - len(failed)} of {len(plan)} item(s) from "
+                       f"'{source_project_name}' to '{target_project_name}'"
+                       + (f"; {len(failed)} failed." if failed else "."),
+            "copied": len(results) - len(failed),
+            "failed": len(failed),
+            "seconds": round(time.monotonic() - started, 3),
+            "items": results
+        }
+
+    except Exception as e:
+        logger.error(f"Error copying project content: {str(e)}", exc_info=True)
+        return {"success": False, "message": f"Unexpected error: {str(e)}"}
@@ -2,6 +2,7 @@ import sys
 import os
 import logging
 from pathlib import Path
+from typing import Optional
 from tableauserverclient import ProjectItem
 import tableauserverclient as TSC
 
@@ -9,31 +10,24 @@ import tableauserverclient as TSC
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.content_catalog import record_change
+from base_setup.utils.content_resolver import find_project
+from base_setup.utils.session_pool import tableau_session
 
 # Setup logging
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger('tableau_automation')
 
 
-def find_project(server: TSC.Server, project_name: str):
-    all_projects, _ = server.projects.get()
-    for project in all_projects:
-        if project.name.strip().lower() == project_name.strip().lower():
-            return project
-    return None
-
-
-def create_project(project_name: str, description: str = "") -> dict:
-    config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-    server, auth = get_tableau_server_and_auth(config)
-
-    with server.auth.sign_in(auth):
+def create_project(project_name: str, description: str = "", server: Optional[TSC.Server] = None) -> dict:
+    with tableau_session(server) as server:
         if find_project(server, project_name):
             return {"success": False, "message": f"Project '{project_name}' already exists."}
 
         new_project = ProjectItem(name=project_name, description=description)
         created = server.projects.create(new_project)
+        record_change(server, "project", created)
 
         return {
             "success": True,
@@ -9,31 +9,26 @@ import tableauserverclient as TSC
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.content_catalog import record_removal
+from base_setup.utils.content_resolver import find_project, find_workbook, find_datasource
+from base_setup.utils.session_pool import tableau_session
 
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger("tableau_automation")
 
 
-def get_project_id_map(server: TSC.Server) -> dict:
-    projects, _ = server.projects.get()
-    return {project.id: project.name for project in projects}
-
-
-def delete_project(project_name: str) -> dict:
+def delete_project(project_name: str, server: Optional[TSC.Server] = None) -> dict:
     try:
         logger.info(f"Deleting project: {project_name}")
-        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, auth = get_tableau_server_and_auth(config)
-
-        with server.auth.sign_in(auth):
-            projects, _ = server.projects.get()
-            project = next((p for p in projects if p.name.strip().lower() == project_name.strip().lower()), None)
+        with tableau_session(server) as server:
+            project = find_project(server, project_name)
 
             if not project:
                 return {"success": False, "message": f"Project '{project_name}' not found."}
 
             server.projects.delete(project.id)
+            record_removal(server, "project", project.id)
             return {"success": True, "message": f"Project '{project_name}' deleted successfully."}
 
     except Exception as e:
@@ -41,27 +36,17 @@ def delete_project(project_name: str) -> dict:
         return {"success": False, "message": f"Error deleting project: {e}"}
 
 
-def delete_workbook(workbook_name: str, project_name: str) -> dict:
+def delete_workbook(workbook_name: str, project_name: str, server: Optional[TSC.Server] = None) -> dict:
     try:
         logger.info(f"Deleting workbook: {workbook_name} from project: {project_name}")
-        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, auth = get_tableau_server_and_auth(config)
-
-        with server.auth.sign_in(auth):
-            workbooks, _ = server.workbooks.get()
-            project_map = get_project_id_map(server)
-
-            workbook = next(
-                (wb for wb in workbooks
-                 if wb.name.strip().lower() == workbook_name.strip().lower() and
-                 project_map.get(wb.project_id, "").strip().lower() == project_name.strip().lower()),
-                None
-            )
+        with tableau_session(server) as server:
+            workbook = find_workbook(server, workbook_name, project_name=project_name)
 
             if not workbook:
                 return {"success": False, "message": f"Workbook '{workbook_name}' not found in project '{project_name}'."}
 
             server.workbooks.delete(workbook.id)
+            record_removal(server, "workbook", workbook.id)
             return {"success": True, "message": f"Workbook '{workbook_name}' deleted from project '{project_name}'."}
 
     except Exception as e:
@@ -69,27 +54,17 @@ def delete_workbook(workbook_name: str, project_name: str) -> dict:
         return {"success": False, "message": f"Error deleting workbook: {e}"}
 
 
-def delete_datasource(datasource_name: str, project_name: str) -> dict:
+def delete_datasource(datasource_name: str, project_name: str, server: Optional[TSC.Server] = None) -> dict:
     try:
         logger.info(f"Deleting datasource: {datasource_name} from project: {project_name}")
-        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, auth = get_tableau_server_and_auth(config)
-
-        with server.auth.sign_in(auth):
-            datasources, _ = server.datasources.get()
-            project_map = get_project_id_map(server)
-
-            datasource = next(
-                (ds for ds in datasources
-                 if ds.name.strip().lower() == datasource_name.strip().lower() and
-                 project_map.get(ds.project_id, "").strip().lower() == project_name.strip().lower()),
-                None
-            )
+        with tableau_session(server) as server:
+            datasource = find_datasource(server, datasource_name, project_name=project_name)
 
             if not datasource:
                 return {"success": False, "message": f"Datasource '{datasource_name}' not found in project '{project_name}'."}
 
             server.datasources.delete(datasource.id)
+            record_removal(server, "datasource", datasource.id)
             return {"success": True, "message": f"Datasource '{datasource_name}' deleted from project '{project_name}'."}
 
     except Exception as e:
@@ -97,18 +72,19 @@ def delete_datasource(datasource_name: str, project_name: str) -> dict:
         return {"success": False, "message": f"Error deleting datasource: {e}"}
 
 
-def delete_content(content_type: str, content_name: str, project_name: Optional[str] = None) -> dict:
+def delete_content(content_type: str, content_name: str, project_name: Optional[str] = None,
+                   server: Optional[TSC.Server] = None) -> dict:
     content_type = content_type.strip().lower()
     if content_type == "project":
-        return delete_project(content_name)
+        return delete_project(content_name, server=server)
     elif content_type == "workbook":
         if not project_name:
             return {"success": False, "message": "Project name is required to delete a workbook."}
-        return delete_workbook(content_name, project_name)
+        return delete_workbook(content_name, project_name, server=server)
     elif content_type == "datasource":
         if not project_name:
             return {"success": False, "message": "Project name is required to delete a datasource."}
-        return delete_datasource(content_name, project_name)
+        return delete_datasource(content_name, project_name, server=server)
     else:
         return {"success": False, "message": f"Unsupported content type: {content_type}"}
 
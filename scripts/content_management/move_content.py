@@ -9,40 +9,25 @@ import tableauserverclient as TSC
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.content_catalog import record_change
+from base_setup.utils.content_resolver import find_project, find_one
+from base_setup.utils.session_pool import tableau_session
 
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger('tableau_automation')
 
 
-def find_project(server: TSC.Server, project_name: str) -> Optional[TSC.ProjectItem]:
-    """Find a project by name (case-insensitive)."""
-    try:
-        all_projects, _ = server.projects.get()
-        name = project_name.strip().lower()
-        return next((p for p in all_projects if p.name.strip().lower() == name), None)
-    except Exception as e:
-        logger.error(f"Error finding project '{project_name}': {e}", exc_info=True)
-        return None
-
-
 def get_content_item(
     server: TSC.Server,
     content_type: str,
     content_name: str,
-    project_id: str
+    project: TSC.ProjectItem
 ) -> Optional[Union[TSC.WorkbookItem, TSC.DatasourceItem]]:
-    """Retrieve a workbook or datasource by name and project_id."""
+    """Retrieve a workbook or datasource by name within a project, with all fields so it can be updated."""
     try:
-        name = content_name.strip().lower()
-
-        if content_type == "workbook":
-            items, _ = server.workbooks.get()
-        else:  # datasource
-            items, _ = server.datasources.get()
-
-        return next((i for i in items if i.project_id == project_id and i.name.strip().lower() == name), None)
-
+        return find_one(server, content_type, content_name,
+                        project_name=project.name, project_id=project.id, fields=None)
     except Exception as e:
         logger.error(f"Error retrieving {content_type} '{content_name}': {e}", exc_info=True)
         return None
@@ -52,7 +37,8 @@ def move_content(
     content_type: str,
     content_name: str,
     source_project: str,
-    new_project: str
+    new_project: str,
+    server: Optional[TSC.Server] = None
 ) -> Dict[str, object]:
     """
     Move a workbook or datasource from one project to another.
@@ -62,6 +48,7 @@ def move_content(
         content_name: The name of the content item to move
         source_project: The current project name
         new_project: The destination project name
+        server: Signed-in server to reuse; a pooled session is borrowed when omitted
 
     Returns:
         A dictionary with success status and message
@@ -74,10 +61,7 @@ def move_content(
         }
 
     try:
-        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, auth = get_tableau_server_and_auth(config)
-
-        with server.auth.sign_in(auth):
+        with tableau_session(server) as server:
             source_proj = find_project(server, source_project)
             if not source_proj:
                 return {
@@ -92,7 +76,7 @@ def move_content(
                     "message": f"Destination project '{new_project}' not found."
                 }
 
-            content_item = get_content_item(server, content_type, content_name, source_proj.id)
+            content_item = get_content_item(server, content_type, content_name, source_proj)
             if not content_item:
                 return {
                     "success": False,
@@ -102,9 +86,11 @@ def move_content(
             # Perform the move
             content_item.project_id = target_proj.id
             if content_type == "workbook":
-                server.workbooks.update(content_item)
+                updated_item = server.workbooks.update(content_item)
             else:
-                server.datasources.update(content_item)
+                updated_item = server.datasources.update(content_item)
+            updated_item._project_name = target_proj.name
+            record_change(server, content_type, updated_item)
 
             logger.info(f"Moved {content_type} '{content_name}' to project '{new_project}'")
             return {
@@ -3,7 +3,10 @@ import logging
 import requests
 from pathlib import Path
 from typing import Optional
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.content_catalog import record_change
+from base_setup.utils.content_resolver import find_project, find_one, find_user_by_email
+from base_setup.utils.session_pool import tableau_session
 import tableauserverclient as TSC
 
 # Setup paths and logging
@@ -14,65 +17,28 @@ LOGGING_CONFIG_PATH = BASE_DIR / 'logging_config.yaml'
 setup_logging(str(LOGGING_CONFIG_PATH))
 logger = logging.getLogger('tableau_automation')
 
-def find_user_by_email(server: TSC.Server, email: str) -> Optional[TSC.UserItem]:
-    logger.debug(f"Searching user by email: {email}")
-    all_users, _ = server.users.get()
-    for user in all_users:
-        if user.name.strip().lower() == email.strip().lower():
-            logger.debug(f"Found user: {user.name} with ID: {user.id}")
-            return user
-    logger.warning(f"User not found: {email}")
-    return None
-
-def find_project(server: TSC.Server, project_name: str) -> Optional[TSC.ProjectItem]:
-    logger.debug(f"Searching project: {project_name}")
-    all_projects, _ = server.projects.get()
-    for project in all_projects:
-        if project.name.strip().lower() == project_name.strip().lower():
-            logger.debug(f"Found project: {project.name} with ID: {project.id}")
-            return project
-    logger.warning(f"Project not found: {project_name}")
-    return None
-
-def find_workbook(server: TSC.Server, workbook_name: str, project_id: Optional[str] = None) -> Optional[TSC.WorkbookItem]:
+def find_workbook(server: TSC.Server, workbook_name: str, project_id: Optional[str] = None,
+                  project_name: Optional[str] = None) -> Optional[TSC.WorkbookItem]:
     logger.debug(f"Searching workbook: {workbook_name} in project ID: {project_id}")
-    all_workbooks, _ = server.workbooks.get()
-    filtered = [wb for wb in all_workbooks if wb.name.strip().lower() == workbook_name.strip().lower()]
-    if project_id:
-        filtered = [wb for wb in filtered if wb.project_id == project_id]
-    if len(filtered) == 1:
-        # Fetch full workbook details to ensure owner_id is populated
-        full_workbook = server.workbooks.get_by_id(filtered[0].id)
-        logger.debug(f"Found workbook: {full_workbook.name} with ID: {full_workbook.id} and owner ID: {full_workbook.owner_id}")
-        return full_workbook
-    if len(filtered) > 1:
-        logger.warning(f"Multiple workbooks found with name '{workbook_name}'. Please be more specific.")
-    else:
-        logger.warning(f"No workbook found with name '{workbook_name}' and project ID '{project_id}'")
-    return None
-
-
-def find_datasource(server: TSC.Server, datasource_name: str, project_id: Optional[str] = None) -> Optional[TSC.DatasourceItem]:
-    """Find a datasource by name and optional project ID."""
+    match = find_one(server, "workbook", workbook_name, project_name, project_id)
+    if not match:
+        return None
+    # Fetch full workbook details so the update below does not drop any attribute
+    full_workbook = server.workbooks.get_by_id(match.id)
+    logger.debug(f"Found workbook: {full_workbook.name} with ID: {full_workbook.id} and owner ID: {full_workbook.owner_id}")
+    return full_workbook
+
+
+def find_datasource(server: TSC.Server, datasource_name: str, project_id: Optional[str] = None,
+                    project_name: Optional[str] = None) -> Optional[TSC.DatasourceItem]:
+    """Find a datasource by name and optional project, returning the full item."""
     logger.debug(f"Searching datasource: {datasource_name} in project ID: {project_id}")
-    
-    # Search in project or globally
-    all_datasources, _ = server.datasources.get()
-    filtered = [ds for ds in all_datasources 
-               if ds.name.strip().lower() == datasource_name.strip().lower()]
-    
-    if project_id:
-        filtered = [ds for ds in filtered if ds.project_id == project_id]
-        
-    if len(filtered) == 1:
-        full_datasource = server.datasources.get_by_id(filtered[0].id)
-        logger.debug(f"Found datasource: {full_datasource.name} with ID: {full_datasource.id}")
-        return full_datasource
-    elif len(filtered) > 1:
-        logger.warning(f"Multiple datasources found with name '{datasource_name}'.")
-    else:
-        logger.warning(f"No datasource found with name '{datasource_name}'")
-    return None
+    match = find_one(server, "datasource", datasource_name, project_name, project_id)
+    if not match:
+        return None
+    full_datasource = server.datasources.get_by_id(match.id)
+    logger.debug(f"Found datasource: {full_datasource.name} with ID: {full_datasource.id}")
+    return full_datasource
 
 
 def update_workbook_ownership(server: TSC.Server, workbook_name: str, current_owner_email: str, new_owner_email: str, project_name: Optional[str]) -> dict:
@@ -84,7 +50,7 @@ def update_workbook_ownership(server: TSC.Server, workbook_name: str, current_ow
             return {"success": False, "message": f"Project '{project_name}' not found."}
         project_id = project.id
 
-    workbook = find_workbook(server, workbook_name, project_id)
+    workbook = find_workbook(server, workbook_name, project_id, project_name)
     if not workbook:
         return {"success": False, "message": f"Workbook '{workbook_name}' not found."}
 
@@ -93,11 +59,6 @@ def update_workbook_ownership(server: TSC.Server, workbook_name: str, current_ow
         return {"success": False, "message": f"Current owner '{current_owner_email}' not found."}
 
     logger.debug(f"Workbook owner ID: {workbook.owner_id}")
-    owner_user = next((user for user in server.users.get()[0] if user.id == workbook.owner_id), None)
-    if owner_user:
-        logger.debug(f"Actual workbook owner email: {owner_user.name}")
-    else:
-        logger.debug("Could not find actual owner email for workbook owner ID")
 
     if workbook.owner_id != current_owner.id:
         logger.warning(f"Current owner mismatch for workbook '{workbook_name}'")
@@ -108,7 +69,7 @@ def update_workbook_ownership(server: TSC.Server, workbook_name: str, current_ow
         return {"success": False, "message": f"New owner '{new_owner_email}' not found."}
 
     workbook.owner_id = new_owner.id
-    server.workbooks.update(workbook)
+    record_change(server, "workbook", server.workbooks.update(workbook))
     logger.info(f"Workbook '{workbook_name}' ownership changed successfully to '{new_owner_email}'")
     return {"success": True, "message": f"Workbook '{workbook_name}' ownership changed to '{new_owner_email}'"}
 
@@ -126,7 +87,7 @@ def update_datasource_ownership(server: TSC.Server, datasource_name: str, curren
             return {"success": False, "message": f"Project '{project_name}' not found."}
         project_id = project.id
 
-    datasource = find_datasource(server, datasource_name, project_id)
+    datasource = find_datasource(server, datasource_name, project_id, project_name)
     if not datasource:
         return {"success": False, "message": f"Datasource '{datasource_name}' not found."}
 
@@ -143,19 +104,17 @@ def update_datasource_ownership(server: TSC.Server, datasource_name: str, curren
         return {"success": False, "message": f"New owner '{new_owner_email}' not found."}
 
     datasource.owner_id = new_owner.id
-    server.datasources.update(datasource)
+    record_change(server, "datasource", server.datasources.update(datasource))
     logger.info(f"Datasource '{datasource_name}' ownership changed successfully to '{new_owner_email}'")
     return {"success": True, "message": f"Datasource '{datasource_name}' ownership changed to '{new_owner_email}'"}
 
 
 
-def update_ownership(content_type: str, content_name: str, current_owner: str, new_owner: str, project_name: Optional[str] = None) -> dict:
+def update_ownership(content_type: str, content_name: str, current_owner: str, new_owner: str, project_name: Optional[str] = None,
+                     server: Optional[TSC.Server] = None) -> dict:
     try:
         logger.info(f"Request to update ownership - Type: {content_type}, Content: {content_name}, From: {current_owner}, To: {new_owner}, Project: {project_name}")
-        config = load_config(str(CONFIG_PATH))
-        server, tableau_auth = get_tableau_server_and_auth(config)
-
-        with server.auth.sign_in(tableau_auth):
+        with tableau_session(server) as server:
             if content_type.lower() == 'workbook':
                 return update_workbook_ownership(server, content_name, current_owner, new_owner, project_name)
             elif content_type.lower() == 'datasource':
@@ -0,0 +1,310 @@
+import argparse
+import contextvars
+import json
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import tableauserverclient as TSC
+
+# Add base_setup to path
+base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
+sys.path.append(base_setup_path)
+
+from base_setup.utils.common_utils import load_config, setup_logging, ensure_directory_exists, resolve_under, \
+    safe_filename
+from base_setup.utils.content_catalog import CLOCK_SKEW_SECONDS
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.paging import concurrent_pager, paging_options
+from base_setup.utils.session_pool import tableau_session, worker_sessions
+from base_setup.utils.transfer import resumable_download, transfer_settings
+
+# Logging
+setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
+logger = logging.getLogger('tableau_automation')
+
+DEFAULT_BACKUP_PATH = "backups"
+DEFAULT_BACKUP_CONCURRENCY = 4
+BACKUP_CONTENT_TYPES = {"workbook": "workbooks", "datasource": "datasources"}
+MANIFEST_NAME = "manifest.json"
+STATE_NAME = "backup_state.json"
+
+
+def _project_paths(projects: List[TSC.ProjectItem]) -> Dict[str, str]:
+    """Map each project id to its path from the top level, e.g. 'Finance/Reports'."""
+    by_id = {project.id: project for project in projects}
+    paths: Dict[str, str] = {}
+
+    def path_of(project_id: str) -> str:
+        if project_id not in paths:
+            project = by_id[project_id]
+            parent = path_of(project.parent_id) + "/" if project.parent_id in by_id else ""
+            paths[project_id] = parent + safe_filename(project.name)
+        return paths[project_id]
+
+    for project_id in by_id:
+        path_of(project_id)
+    return paths
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _manifest_entry(content_type: str, item, project_paths: Dict[str, str], owners: Dict[str, str]) -> dict:
+    return {
+        "content_type": content_type,
+        "id": item.id,
+        "name": item.name,
+        "project_id": item.project_id,
+        "project_name": item.project_name,
+        "project_path": project_paths.get(item.project_id, safe_filename(item.project_name or "")),
+        "owner_id": item.owner_id,
+        "owner_name": owners.get(item.owner_id),
+        "content_url": getattr(item, "content_url", None),
+        "created_at": _isoformat(getattr(item, "created_at", None)),
+        "updated_at": _isoformat(item.updated_at),
+    }
+
+
+def _load_state(site_root: Path) -> dict:
+    state_path = site_root / STATE_NAME
+    if not state_path.exists():
+        return {}
+    with open(state_path, encoding="utf-8") as state_file:
+        return json.load(state_file)
+
+
+def _save_state(site_root: Path, state: dict):
+    partial = site_root / f"{STATE_NAME}.part"
+    with open(partial, "w", encoding="utf-8") as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(partial, site_root / STATE_NAME)
+
+
+def _read_manifest(site_root: Path, backup_name: str) -> Optional[dict]:
+    """Load the manifest of an earlier backup, stored as a directory or a .tar archive."""
+    directory, archive_path = site_root / backup_name, site_root / f"{backup_name}.tar"
+    if (directory / MANIFEST_NAME).exists():
+        with open(directory / MANIFEST_NAME, encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    if archive_path.exists():
+        with tarfile.open(archive_path) as archive:
+            return json.load(archive.extractfile(f"{backup_name}/{MANIFEST_NAME}"))
+    return None
+
+
+def _unchanged(item, previous: Optional[dict], watermark: Optional[datetime]) -> bool:
+    """True when the previous backup holds this exact version of the item."""
+    if not previous or not previous.get("success"):
+        return False
+    if previous.get("updated_at") != _isoformat(item.updated_at):
+        return False
+    # Anything updated since the last successful run started is downloaded again
+    return not (watermark and item.updated_at and item.updated_at >= watermark)
+
+
+def _write_archive(backup_dir: Path) -> Path:
+    """Pack a finished backup directory into `<backup_dir>.tar` and remove the directory."""
+    archive_path = backup_dir.with_suffix(".tar")
+    partial = archive_path.with_suffix(".tar.part")
+    # Workbooks and datasources are already zip-compressed; a plain tar avoids recompressing them
+    with tarfile.open(partial, "w") as archive:
+        archive.add(backup_dir, arcname=backup_dir.name)
+    os.replace(partial, archive_path)
+    shutil.rmtree(backup_dir)
+    return archive_path
+
+
+def backup_site(
+        output_dir: Optional[str] = None,
+        archive: bool = False,
+        include_extract: bool = True,
+        include_revisions: bool = False,
+        max_workers: Optional[int] = None,
+        incremental: bool = False,
+        server: Optional[TSC.Server] = None
+) -> Dict[str, object]:
+    """
+    Back up every workbook and datasource of the site to `<output_dir>/<site>/<timestamp>/`.
+
+    Projects, users and content are each listed once; items are then downloaded concurrently
+    (resumable and verified, see `resumable_download`) into a directory per project, and a
+    `manifest.json` records ids, owners, projects, `updated_at`, revision numbers (with
+    `include_revisions`, one extra call per item), sizes and SHA-256 checksums. Failed items are
+    listed in the manifest without stopping the backup. With `archive` the directory is packed
+    into a `.tar` afterwards.
+
+    With `incremental`, only items whose `updatedAt` differs from the previous backup or is newer
+    than the site's watermark (start of the last fully successful run, minus clock skew) are
+    downloaded. Unchanged items are not stored again: their manifest entry points with
+    `stored_in` to the backup that holds the file, and a re-downloaded file whose SHA-256 matches
+    the previous one is dropped the same way. Restoring from an incremental backup therefore
+    needs the earlier backups it references. The watermark and last backup are kept in
+    `<output_dir>/<site>/backup_state.json`.
+
+    Defaults come from `backup_path` and `backup_concurrency` in config.yaml; a given `output_dir`
+    is taken relative to `backup_path` and may not point outside of it. Each worker downloads on
+    its own pooled session, so the workers are capped at the sessions free when the backup starts.
+
+    Returns:
+        dict: { success, message, path, item_count, downloaded, reused, failed, bytes, elapsed_seconds }
+    """
+    started = time.monotonic()
+    try:
+        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
+        tableau_cfg = config.get("tableau", {})
+        try:
+            output_dir = resolve_under(tableau_cfg.get("backup_path", DEFAULT_BACKUP_PATH), output_dir)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        max_workers = max_workers or tableau_cfg.get("backup_concurrency", DEFAULT_BACKUP_CONCURRENCY)
+        paging = paging_options(tableau_cfg)
+        settings = transfer_settings()
+
+        with tableau_session(server) as server:
+            site = tableau_cfg.get("site_id") or "default"
+            timestamp = datetime.now(timezone.utc)
+            site_root = Path(output_dir) / safe_filename(site)
+            backup_name = timestamp.strftime("%Y%m%dT%H%M%SZ")
+            backup_dir = site_root / backup_name
+            ensure_directory_exists(str(backup_dir))
+
+            state = _load_state(site_root)
+            previous_entries, watermark = {}, None
+            if incremental and state.get("last_backup"):
+                previous = _read_manifest(site_root, state["last_backup"])
+                if previous and previous.get("include_extract") == include_extract:
+                    previous_entries = {entry["id"]: dict(entry, stored_in=entry.get("stored_in", state["last_backup"]))
+                                        for entry in previous["items"]}
+                    watermark = datetime.fromisoformat(state["watermark"]) if state.get("watermark") else None
+                    logger.info(f"Incremental backup against '{state['last_backup']}' (watermark {watermark})")
+                else:
+                    logger.info("No compatible previous backup, running a full backup")
+
+            report_progress("Listing site content")
+            project_paths = _project_paths(list(concurrent_pager(server.projects, **paging)))
+            owners = {user.id: user.name for user in concurrent_pager(server.users, **paging)}
+            items = [(content_type, item)
+                     for content_type, endpoint_name in BACKUP_CONTENT_TYPES.items()
+                     for item in concurrent_pager(getattr(server, endpoint_name), **paging)]
+            # One file stem per item; a workbook and a datasource sharing a name get distinct stems
+            stems, taken = {}, set()
+            for content_type, item in items:
+                project_path = project_paths.get(item.project_id, safe_filename(item.project_name or ''))
+                stem = f"{project_path}/{safe_filename(item.name)}"
+                if stem.lower() in taken:
+                    stem = f"{stem}-{item.id[:8]}"
+                taken.add(stem.lower())
+                stems[item.id] = stem
+            report_progress(f"Backing up {len(items)} item(s)")
+
+            def backup_item(content_type: str, item) -> dict:
+                entry = _manifest_entry(content_type, item, project_paths, owners)
+                previous = previous_entries.get(item.id)
+                if _unchanged(item, previous, watermark):
+                    entry.update(success=True, reused=True, path=previous["path"], stored_in=previous["stored_in"],
+                                 bytes=previous["bytes"], sha256=previous["sha256"], revision=previous.get("revision"))
+                    return entry
+                item_started = time.monotonic()
+                try:
+                    stem = backup_dir / "content" / stems[item.id]
+                    stem.parent.mkdir(parents=True, exist_ok=True)
+                    with workers.session() as worker_server:
+                        download = resumable_download(worker_server, content_type, item.id, str(stem),
+                                                      include_extract=include_extract, settings=settings)
+                        if include_revisions:
+                            endpoint = getattr(worker_server, BACKUP_CONTENT_TYPES[content_type])
+                            endpoint.populate_revisions(item)
+                            entry["revision"] = max((int(revision.revision_number) for revision in item.revisions),
+                                                    default=None)
+                    entry.update(success=True, reused=False, path=str(Path(download["path"]).relative_to(backup_dir)),
+                                 stored_in=backup_name, bytes=download["bytes"], sha256=download["sha256"])
+                    if previous and previous.get("success") and previous.get("sha256") == download["sha256"]:
+                        # Same content under a new timestamp: keep the copy the earlier backup holds
+                        os.remove(download["path"])
+                        entry.update(path=previous["path"], stored_in=previous["stored_in"])
+                except Exception as e:
+                    logger.error(f"Backup of {content_type} '{item.name}' failed: {e}")
+                    entry.update(success=False, error=str(e))
+                entry["elapsed_seconds"] = round(time.monotonic() - item_started, 3)
+                report_progress(f"Backed up {content_type} '{item.name}'")
+                return entry
+
+            # Each worker downloads on its own pooled session; with none free, one worker uses ours
+            with worker_sessions(server, max_workers) as workers:
+                max_workers = max(workers.count, 1)
+                logger.info(f"Backing up {len(items)} item(s) from site '{site}' with {max_workers} workers")
+                with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tableau-backup") as executor:
+                    futures = [executor.submit(contextvars.copy_context().run, backup_item, content_type, item)
+                               for content_type, item in items]
+                    entries = [future.result() for future in as_completed(futures)]
+
+        entries.sort(key=lambda entry: (entry["project_path"], entry["content_type"], entry["name"]))
+        failed = [entry for entry in entries if not entry["success"]]
+        downloaded = [entry for entry in entries if entry["success"] and not entry["reused"]]
+        total_bytes = sum(entry.get("bytes", 0) for entry in entries if entry.get("stored_in") == backup_name)
+        manifest = {
+            "site": site,
+            "created_at": timestamp.isoformat(),
+            "incremental": bool(previous_entries),
+            "base_backup": state.get("last_backup") if previous_entries else None,
+            "include_extract": include_extract,
+            "item_count": len(entries),
+            "downloaded": len(downloaded),
+            "reused": len(entries) - len(downloaded) - len(failed),
+            "failed": len(failed),
+            "bytes": total_bytes,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+            "items": entries,
+        }
+        with open(backup_dir / MANIFEST_NAME, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+        path = _write_archive(backup_dir) if archive else backup_dir
+        state["last_backup"] = backup_name
+        if not failed:
+            state["watermark"] = (timestamp - timedelta(seconds=CLOCK_SKEW_SECONDS)).isoformat()
+        _save_state(site_root, state)
+
+        message = f"Backed up {len(entries) - len(failed)} of {len(entries)} item(s) to {path} " \
+                  f"({manifest['downloaded']} downloaded, {manifest['reused']} unchanged)" + \
+                  (f"; {len(failed)} failed." if failed else ".")
+        logger.info(message)
+        return {
+            "success": not failed,
+            "message": message,
+            "path": str(path),
+            "item_count": len(entries),
+            "downloaded": manifest["downloaded"],
+            "reused": manifest["reused"],
+            "failed": len(failed),
+            "bytes": total_bytes,
+            "elapsed_seconds": manifest["elapsed_seconds"],
+        }
+
+    except Exception as e:
+        logger.error(f"Site backup failed: {e}", exc_info=True)
+        return {"success": False, "message": f"Site backup failed: {e}"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up every workbook and datasource of the configured site.")
+    parser.add_argument("--output-dir", help="Backup root directory, relative to backup_path in config.yaml")
+    parser.add_argument("--archive", action="store_true", help="Pack the backup into a .tar file")
+    parser.add_argument("--no-extract", action="store_true", help="Download workbooks and datasources without extracts")
+    parser.add_argument("--revisions", action="store_true", help="Record each item's current revision number")
+    parser.add_argument("--workers", type=int, help="Concurrent downloads (default: backup_concurrency)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only download items changed since the last backup")
+    args = parser.parse_args()
+    print(json.dumps(backup_site(args.output_dir, archive=args.archive, include_extract=not args.no_extract,
+                                 include_revisions=args.revisions, max_workers=args.workers,
+                                 incremental=args.incremental), indent=2))
@@ -2,21 +2,64 @@ import logging
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import tableauserverclient as TSC
 
 # Add base_setup to path
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth, ensure_directory_exists
+from base_setup.utils.common_utils import load_config, setup_logging, ensure_directory_exists, safe_filename
+from base_setup.utils.content_resolver import find_items, find_project
+from base_setup.utils.download_cache import get_download_cache, link_or_copy
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.session_pool import tableau_session
 
 # Logging
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger('tableau_automation')
 
 
-def download_content(content_type: str, content_name: str, project_name: Optional[str] = None) -> Dict[str, object]:
+def _find_download_item(server: TSC.Server, content_type: str, content_name: str, project_name: Optional[str]):
+    """Resolve the single item to download, raising `LookupError` with a user-facing message."""
+    # Filter by name and, when given, project
+    project = None
+    if project_name:
+        project = find_project(server, project_name)
+        if not project:
+            raise LookupError(f"Project '{project_name}' not found.")
+    filtered = find_items(server, content_type, content_name,
+                          project_name=project.name if project else None,
+                          project_id=project.id if project else None)
+
+    if not filtered:
+        raise LookupError(f"{content_type.capitalize()} '{content_name}' not found.")
+    if len(filtered) > 1:
+        raise LookupError(f"Multiple items named '{content_name}' found. Please specify a project.")
+    return filtered[0]
+
+
+def resolve_content_stream(server: TSC.Server, content_type: str, content_name: str,
+                           project_name: Optional[str] = None,
+                           include_extract: Optional[bool] = None) -> Tuple[str, Optional[dict], Optional[str]]:
+    """
+    Resolver for `open_tableau_stream`: the REST path of a workbook's or datasource's content.
+
+    Extracts follow `download_content` (left out of workbooks, kept in datasources) unless
+    `include_extract` is given. The file name is left to Tableau's `Content-Disposition`.
+    """
+    content_type = content_type.lower()
+    if content_type not in ("workbook", "datasource"):
+        raise ValueError(f"Invalid content type: {content_type}")
+    item = _find_download_item(server, content_type, content_name, project_name)
+    if include_extract is None:
+        include_extract = content_type != "workbook"
+    params = None if include_extract else {"includeExtract": "False"}
+    return f"{content_type}s/{item.id}/content", params, None
+
+
+def download_content(content_type: str, content_name: str, project_name: Optional[str] = None,
+                     server: Optional[TSC.Server] = None) -> Dict[str, object]:
     """
     Download a workbook (.twbx) or datasource (.tdsx) from Tableau Server.
 
@@ -24,6 +67,7 @@ def download_content(content_type: str, content_name: str, project_name: Optiona
         content_type (str): "workbook" or "datasource"
         content_name (str): Name of the content to download
         project_name (str, optional): Filter by project
+        server (TSC.Server, optional): Signed-in server to reuse; a pooled session is borrowed when omitted
 
     Returns:
         dict: { success: bool, message: str, download_path?: str }
@@ -34,51 +78,31 @@ def download_content(content_type: str, content_name: str, project_name: Optiona
             return {"success": False, "message": f"Invalid content type: {content_type}"}
 
         config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, auth = get_tableau_server_and_auth(config)
         download_dir = config.get("tableau", {}).get("download_path", "downloads")
         ensure_directory_exists(download_dir)
 
-        with server.auth.sign_in(auth):
-            # Fetch items
-            if content_type == "workbook":
-                items, _ = server.workbooks.get()
-                extension = "twbx"
-            else:
-                items, _ = server.datasources.get()
-                extension = "tdsx"
-
-            # Filter by name
-            filtered = [item for item in items if item.name.strip().lower() == content_name.strip().lower()]
-
-            # Further filter by project
-            if project_name:
-                projects, _ = server.projects.get()
-                project = next((p for p in projects if p.name.strip().lower() == project_name.strip().lower()), None)
-                if not project:
-                    return {"success": False, "message": f"Project '{project_name}' not found."}
-                filtered = [item for item in filtered if item.project_id == project.id]
-
-            if not filtered:
-                return {"success": False, "message": f"{content_type.capitalize()} '{content_name}' not found."}
-            if len(filtered) > 1:
-                return {"success": False, "message": f"Multiple items named '{content_name}' found. Please specify a project."}
-
-            item = filtered[0]
-
-            # Let Tableau assign file path, then rename
-            if content_type == "workbook":
-                downloaded_path = server.workbooks.download(item.id, filepath=download_dir, include_extract=False)
-            else:
-                downloaded_path = server.datasources.download(item.id, filepath=download_dir)
-
-            final_path = os.path.join(download_dir, f"{content_name.replace(' ', '_')}.{extension}")
-            if downloaded_path != final_path:
-                os.rename(downloaded_path, final_path)
+        with tableau_session(server) as server:
+            extension = "twbx" if content_type == "workbook" else "tdsx"
+
+            try:
+                item = _find_download_item(server, content_type, content_name, project_name)
+            except LookupError as e:
+                return {"success": False, "message": str(e)}
+
+            # Served from the download cache when this version was fetched before
+            report_progress(f"Downloading {content_type} '{item.name}'")
+            cached_path, from_cache = get_download_cache().fetch(server, content_type, item,
+                                                                  include_extract=content_type != "workbook")
+
+            final_path = os.path.join(download_dir, f"{safe_filename(content_name).replace(' ', '_')}.{extension}")
+            link_or_copy(cached_path, final_path)
+            report_progress("Downloaded")
 
             return {
                 "success": True,
                 "message": f"Downloaded {content_type} '{content_name}' successfully.",
-                "download_path": final_path
+                "download_path": final_path,
+                "from_cache": from_cache
             }
 
     except Exception as e:
@@ -1,80 +1,334 @@
 
 
+import contextvars
 import logging
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import tableauserverclient as TSC
 
 # Setup paths
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth, ensure_directory_exists
+from base_setup.utils.common_utils import load_config, setup_logging, ensure_directory_exists, resolve_under, \
+    safe_filename
+from base_setup.utils.content_resolver import find_view, find_workbook
+from base_setup.utils.download_cache import link_or_copy
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.session_pool import tableau_session, worker_sessions
+from base_setup.utils.transfer import PARTIAL_SUFFIX, TransferStats, transfer_settings
+from base_setup.utils.view_cache import get_view_cache
 
 # Logging
 logger = setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 
+# download type -> (REST view resource, file extension)
+VIEW_ASSET_FORMATS = {"image": ("image", "png"), "pdf": ("pdf", "pdf"), "csv": ("data", "csv")}
+DEFAULT_VIEW_EXPORT_CONCURRENCY = 4
+
+
+def resolve_view_asset_stream(server: TSC.Server, view_name: str,
+                              download_type: str = "image") -> Tuple[str, Optional[dict], Optional[str]]:
+    """Resolver for `open_tableau_stream`: the REST path of a view's image, PDF or CSV export."""
+    if download_type not in VIEW_ASSET_FORMATS:
+        raise ValueError(f"Invalid download type '{download_type}'")
+    view = find_view(server, view_name)
+    if not view:
+        raise LookupError(f"View '{view_name}' not found.")
+    resource, _ = VIEW_ASSET_FORMATS[download_type]
+    return f"views/{view.id}/{resource}", None, _view_filename(view, download_type)
+
+
+def _export_options(download_type: str, filters: Optional[Dict[str, str]] = None,
+                    resolution: Optional[str] = None, max_age: Optional[int] = None):
+    """Build the TSC export options for a view: view filters, image resolution and cache age (minutes)."""
+    maxage = -1 if max_age is None else max_age
+    if download_type == "image":
+        options = TSC.ImageRequestOptions(
+            imageresolution=TSC.ImageRequestOptions.Resolution.High if resolution == "high" else None,
+            maxage=maxage)
+    elif download_type == "pdf":
+        options = TSC.PDFRequestOptions(maxage=maxage)
+    else:
+        options = TSC.CSVRequestOptions(maxage=maxage)
+    for name, value in (filters or {}).items():
+        options.vf(name, value)
+    return options
+
+
+def _stream_view_export(server: TSC.Server, view: TSC.ViewItem, download_type: str, options,
+                        destination: str, settings: dict) -> int:
+    """Write a view export to `destination` chunk by chunk and return its size in bytes."""
+    resource, _ = VIEW_ASSET_FORMATS[download_type]
+    url = f"{server.views.baseurl}/{view.id}/{resource}"
+    partial = destination + PARTIAL_SUFFIX
+    stats = TransferStats()
+    response = server.views.get_request(url, request_object=options, parameters={"stream": True})
+    try:
+        with open(partial, "wb") as f:
+            for chunk in response.iter_content(settings["download_chunk_bytes"]):
+                f.write(chunk)
+                stats.add(len(chunk))
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        response.close()
+    os.replace(partial, destination)
+    return stats.finish().bytes
+
+
+def _view_filename(view: TSC.ViewItem, download_type: str) -> str:
+    return f"{safe_filename(view.name).replace(' ', '_')}.{VIEW_ASSET_FORMATS[download_type][1]}"
+
+
+def _render_cached(server: TSC.Server, view: TSC.ViewItem, download_type: str, settings: dict,
+                   filters: Optional[Dict[str, str]] = None, resolution: Optional[str] = None,
+                   max_age: Optional[int] = None, workbook_updated_at=None) -> Tuple[str, bool]:
+    """Return `(path, from_cache)` of the render in the view cache, exporting it on a miss."""
+    options = _export_options(download_type, filters, resolution, max_age)
+    return get_view_cache().fetch(
+        server, view, download_type, VIEW_ASSET_FORMATS[download_type][1],
+        lambda path: _stream_view_export(server, view, download_type, options, path, settings),
+        filters=filters, resolution=resolution, max_age_seconds=None if max_age is None else max_age * 60,
+        workbook_updated_at=workbook_updated_at
+    )
+
+
+def _export_view(server: TSC.Server, view: TSC.ViewItem, download_type: str, destination: str, settings: dict,
+                 filters: Optional[Dict[str, str]] = None, resolution: Optional[str] = None,
+                 max_age: Optional[int] = None, use_cache: bool = True, workbook_updated_at=None) -> Tuple[int, bool]:
+    """Export a view to `destination`, through the view cache when enabled; returns `(bytes, from_cache)`."""
+    if not use_cache or get_view_cache() is None:
+        options = _export_options(download_type, filters, resolution, max_age)
+        return _stream_view_export(server, view, download_type, options, destination, settings), False
+    cached_path, from_cache = _render_cached(server, view, download_type, settings, filters, resolution, max_age,
+                                             workbook_updated_at)
+    link_or_copy(cached_path, destination)
+    return os.path.getsize(destination), from_cache
+
+
+def cached_view_asset(view_name: str, download_type: str = "image", filters: Optional[Dict[str, str]] = None,
+                      resolution: Optional[str] = None, max_age: Optional[int] = None,
+                      server: Optional[TSC.Server] = None) -> dict:
+    """
+    Return the view cache's file for a view render, rendering it on a miss.
+
+    Used to serve repeated requests for the same render straight from disk.
+
+    Returns:
+        dict: { success, message, path?, filename?, from_cache? }
+    """
+    try:
+        if download_type not in VIEW_ASSET_FORMATS:
+            return {"success": False, "message": f"Invalid download type '{download_type}'"}
+        if get_view_cache() is None:
+            return {"success": False, "message": "View cache is disabled."}
+
+        with tableau_session(server) as server:
+            view = find_view(server, view_name)
+            if not view:
+                return {"success": False, "message": f"View '{view_name}' not found."}
+            path, from_cache = _render_cached(server, view, download_type, transfer_settings(), filters,
+                                              resolution, max_age)
+            return {"success": True, "message": f"{download_type.capitalize()} ready", "path": path,
+                    "filename": _view_filename(view, download_type), "from_cache": from_cache}
+
+    except Exception as e:
+        logger.error(f"Failed to render view asset: {e}", exc_info=True)
+        return {"success": False, "message": f"Error: {e}"}
+
 
-def download_view_asset(view_name: str, download_type: str = "image") -> dict:
+def download_view_asset(view_name: str, download_type: str = "image", filters: Optional[Dict[str, str]] = None,
+                        resolution: Optional[str] = None, max_age: Optional[int] = None, use_cache: bool = True,
+                        server: Optional[TSC.Server] = None) -> dict:
     """
     Download Tableau view as image/pdf/csv.
 
+    The export is streamed to disk in `download_chunk_kb` reads rather than held in memory,
+    and repeated requests for the same render are served from the view cache.
+
     Args:
         view_name (str): Name of the view (sheet or dashboard)
         download_type (str): "image", "pdf", or "csv"
+        filters (dict, optional): View filters as field name -> value
+        resolution (str, optional): "high" for high-resolution images
+        max_age (int, optional): Minutes Tableau (and the view cache) may serve a cached render
+        use_cache (bool): Set to False to always render a fresh export
+        server (TSC.Server, optional): Signed-in server to reuse; a pooled session is borrowed when omitted
 
     Returns:
-        dict: { success, message, path? }
+        dict: { success, message, path?, bytes?, from_cache? }
     """
     try:
+        if download_type not in VIEW_ASSET_FORMATS:
+            return {"success": False, "message": f"Invalid download type '{download_type}'"}
+
         config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, auth = get_tableau_server_and_auth(config)
         download_dir = config.get("tableau", {}).get("download_path", "downloads")
         ensure_directory_exists(download_dir)
 
-        with server.auth.sign_in(auth):
+        with tableau_session(server) as server:
             logger.info("Signed into Tableau Server")
 
-            all_views, _ = server.views.get()
-            view = next((v for v in all_views if v.name.strip().lower() == view_name.strip().lower()), None)
+            view = find_view(server, view_name)
 
             if not view:
                 return {"success": False, "message": f"View '{view_name}' not found."}
 
-            # Populate the desired asset
-            if download_type == "pdf":
-                server.views.populate_pdf(view)
-                content = view.pdf
-                ext = "pdf"
-            elif download_type == "image":
-                server.views.populate_image(view)
-                content = view.image
-                ext = "png"
-            elif download_type == "csv":
-                server.views.populate_csv(view)
-                content = b''.join(view.csv)  # <-- Fix: join generator output into bytes
-                ext = "csv"
-            else:
-                return {"success": False, "message": f"Invalid download type '{download_type}'"}
-
-            filename = f"{view.name.replace(' ', '_')}.{ext}"
-            full_path = os.path.join(download_dir, filename)
-
-            with open(full_path, "wb") as f:
-                f.write(content)
-
-            logger.info(f"{download_type.upper()} for view '{view.name}' saved to {full_path}")
-            return {"success": True, "message": f"{download_type.capitalize()} downloaded", "path": full_path}
+            full_path = os.path.join(download_dir, _view_filename(view, download_type))
+            size, from_cache = _export_view(server, view, download_type, full_path, transfer_settings(),
+                                            filters, resolution, max_age, use_cache)
+
+            logger.info(f"{download_type.upper()} for view '{view.name}' saved to {full_path} ({size} bytes)")
+            return {"success": True, "message": f"{download_type.capitalize()} downloaded", "path": full_path,
+                    "bytes": size, "from_cache": from_cache}
 
     except Exception as e:
         logger.error(f"Failed to download view asset: {e}", exc_info=True)
         return {"success": False, "message": f"Error: {e}"}
 
 
+def export_views(
+        workbook_name: Optional[str] = None,
+        view_names: Optional[List[str]] = None,
+        project_name: Optional[str] = None,
+        download_type: str = "image",
+        filters: Optional[Dict[str, str]] = None,
+        resolution: Optional[str] = None,
+        max_age: Optional[int] = None,
+        output_dir: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        use_cache: bool = True,
+        server: Optional[TSC.Server] = None
+) -> dict:
+    """
+    Export every view of a workbook, or the listed views, concurrently.
+
+    Each export is streamed to `<output_dir>` (default `<download_path>/<workbook name>` or
+    `<download_path>/views`; a given directory is taken relative to `download_path` and may
+    not point outside of it) with at most `max_workers` (default `view_export_concurrency`,
+    4) running at once, one pooled session per worker, and no more workers than there are
+    free sessions. The same filters, resolution and cache age apply to every view, and
+    renders still fresh in the view cache are reused unless `use_cache` is False. Failed
+    views are reported without stopping the batch.
+
+    Returns:
+        dict: { success, message, output_dir, exported, failed, missing, from_cache, bytes, elapsed_seconds, views }
+    """
+    started = time.monotonic()
+    try:
+        if download_type not in VIEW_ASSET_FORMATS:
+            return {"success": False, "message": f"Invalid download type '{download_type}'"}
+        if not workbook_name and not view_names:
+            return {"success": False, "message": "Provide a workbook name or a list of view names."}
+
+        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
+        tableau_cfg = config.get("tableau", {})
+        max_workers = max_workers or tableau_cfg.get("view_export_concurrency", DEFAULT_VIEW_EXPORT_CONCURRENCY)
+        download_dir = tableau_cfg.get("download_path", "downloads")
+        try:
+            output_dir = resolve_under(download_dir, output_dir or
+                                       safe_filename(workbook_name or "views").replace(" ", "_"))
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        ensure_directory_exists(output_dir)
+        settings = transfer_settings()
+
+        with tableau_session(server) as server:
+            views: List[TSC.ViewItem] = []
+            workbook_updated_at = None
+            if workbook_name:
+                workbook = find_workbook(server, workbook_name, project_name=project_name)
+                if not workbook:
+                    return {"success": False, "message": f"Workbook '{workbook_name}' not found or not unique."}
+                server.workbooks.populate_views(workbook)
+                workbook_updated_at = workbook.updated_at
+                views = list(workbook.views)
+            missing = []
+            if view_names:
+                wanted = {name.lower() for name in view_names}
+                if views:
+                    views = [view for view in views if view.name.lower() in wanted]
+                    missing = sorted(wanted - {view.name.lower() for view in views})
+                else:
+                    for name in view_names:
+                        view = find_view(server, name)
+                        if view:
+                            views.append(view)
+                        else:
+                            missing.append(name)
+            if not views:
+                return {"success": False, "message": "No matching views found.", "missing": missing}
+
+            # One file per view; views sharing a name get the view id appended
+            filenames, taken = {}, set()
+            for view in views:
+                filename = _view_filename(view, download_type)
+                if filename.lower() in taken:
+                    stem, ext = os.path.splitext(filename)
+                    filename = f"{stem}-{view.id[:8]}{ext}"
+                taken.add(filename.lower())
+                filenames[view.id] = filename
+            report_progress(f"Exporting {len(views)} view(s)")
+
+            def export_view(view: TSC.ViewItem) -> dict:
+                entry = {"view": view.name, "view_id": view.id}
+                try:
+                    path = os.path.join(output_dir, filenames[view.id])
+                    with workers.session() as worker_server:
+                        size, from_cache = _export_view(worker_server, view, download_type, path, settings, filters,
+                                                        resolution, max_age, use_cache, workbook_updated_at)
+                    entry.update(success=True, path=path, bytes=size, from_cache=from_cache)
+                except Exception as e:
+                    logger.error(f"Export of view '{view.name}' failed: {e}")
+                    entry.update(success=False, error=str(e))
+                report_progress(f"Exported view '{view.name}'")
+                return entry
+
+            # Each worker exports on its own pooled session; with none free, one worker uses ours
+            with worker_sessions(server, min(max_workers, len(views))) as workers:
+                max_workers = max(workers.count, 1)
+                logger.info(f"Exporting {len(views)} view(s) as {download_type} with {max_workers} workers")
+                with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tableau-view-export") as executor:
+                    futures = [executor.submit(contextvars.copy_context().run, export_view, view) for view in views]
+                    entries = [future.result() for future in as_completed(futures)]
+
+        entries.sort(key=lambda entry: entry["view"])
+        failed = [entry for entry in entries if not entry["success"]]
+        message = f"Exported {len(entries) - len(failed)} of {len(entries)} view(s) to {output_dir}" + \
+                  (f"; {len(failed)} failed." if failed else ".") + \
+                  (f" Not found: {', '.join(missing)}." if missing else "")
+        logger.info(message)
+        return {
+            "success": not failed,
+            "message": message,
+            "output_dir": output_dir,
+            "exported": len(entries) - len(failed),
+            "failed": len(failed),
+            "missing": missing,
+            "from_cache": sum(1 for entry in entries if entry.get("from_cache")),
+            "bytes": sum(entry.get("bytes", 0) for entry in entries),
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+            "views": entries,
+        }
+
+    except Exception as e:
+        logger.error(f"View export failed: {e}", exc_info=True)
+        return {"success": False, "message": f"Error: {e}"}
+
+
 if __name__ == "__main__":
     view_name = "Product"  # Change this to your actual view name
 
     print(download_view_asset(view_name, download_type="image"))
     print(download_view_asset(view_name, download_type="pdf"))
     print(download_view_asset(view_name, download_type="csv"))
+    print(export_views(workbook_name="Superstore", download_type="pdf"))
 
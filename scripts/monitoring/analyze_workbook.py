@@ -0,0 +1,71 @@
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Add base_setup directory to Python path
+base_setup_path = str(Path(__file__).parent.parent.parent / "base_setup")
+sys.path.append(base_setup_path)
+
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.content_resolver import find_items
+from base_setup.utils.download_cache import get_download_cache
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.session_pool import tableau_session
+from base_setup.utils.twb_analyzer import SECTIONS, analyze_twb
+
+import tableauserverclient as TSC
+
+# Setup logging
+logger = setup_logging(os.path.join(base_setup_path, "config", "logging_config.yaml"))
+
+
+def analyze_workbook(workbook_name: str, sections: Optional[Iterable[str]] = None,
+                     server: Optional[TSC.Server] = None) -> dict:
+    """
+    Static analysis of a published workbook from a single parse of its XML.
+
+    The workbook is downloaded without extracts through the download cache and summarized
+    by `analyze_twb`; `sections` limits the summary (all of `SECTIONS` by default).
+
+    Returns:
+        dict: { success, message, workbook, workbook_id, project, summary }
+    """
+    try:
+        sections = tuple(sections or SECTIONS)
+        unknown = set(sections) - set(SECTIONS)
+        if unknown:
+            return {"success": False, "message": f"Unknown section(s) {', '.join(sorted(unknown))}; "
+                                                 f"expected any of {', '.join(SECTIONS)}."}
+        with tableau_session(server) as server:
+            logger.info(f"Looking up workbook '{workbook_name}'")
+            workbook = next(iter(find_items(server, "workbook", workbook_name)), None)
+            if not workbook:
+                return {"success": False, "message": f"Workbook '{workbook_name}' not found."}
+
+            report_progress(f"Downloading workbook '{workbook.name}'")
+            path, from_cache = get_download_cache().fetch(server, "workbook", workbook, include_extract=False)
+            logger.info(f"{'Reused cached' if from_cache else 'Downloaded'} workbook {path} (ID: {workbook.id})")
+
+        report_progress("Analyzing workbook")
+        summary = analyze_twb(path, sections)
+        counts = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in summary["counts"].items())
+        message = f"Analyzed workbook '{workbook.name}'" + (f": {counts}." if counts else ".")
+        logger.info(message)
+        return {
+            "success": True,
+            "message": message,
+            "workbook": workbook.name,
+            "workbook_id": workbook.id,
+            "project": workbook.project_name,
+            "summary": summary,
+        }
+
+    except Exception as e:
+        logger.error(f"Workbook analysis failed: {e}", exc_info=True)
+        return {"success": False, "message": f"Workbook analysis failed: {e}"}
+
+
+if __name__ == "__main__":
+    # Provide workbook name here
+    print(analyze_workbook("Superstore")["message"])
@@ -1,66 +1,187 @@
+import argparse
+import json
 import logging
 import os
 import sys
+import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Optional
 
 # Add base_setup directory to Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import load_config, setup_logging
+from base_setup.utils.paging import concurrent_pager, count_items, paging_options
+from base_setup.utils.session_pool import get_session_pool, tableau_session
 
 # Setup logging
 logger = setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 
-from tableauserverclient import Pager, Server, PersonalAccessTokenAuth
+from tableauserverclient import Filter, RequestOptions, Server
 
+DEFAULT_SITE_AUDIT_CONCURRENCY = 8
 
-def audit_site_user_group_roles(site_override: str = None) -> dict:
+# Current site roles; legacy roles (Interactor, Publisher, ...) are rejected as filters by Tableau Cloud
+SITE_ROLES = ("Creator", "Explorer", "ExplorerCanPublish", "SiteAdministratorCreator",
+              "SiteAdministratorExplorer", "Viewer", "Unlicensed", "ServerAdministrator")
+
+
+def count_users_by_role(server: Server, max_workers: int) -> dict:
+    """
+    Count users per site role with one filtered pageSize=1 query per role.
+
+    A role whose query fails is reported as "Error" without affecting the other roles.
+    """
+    def count_role(role: str):
+        options = RequestOptions()
+        options.filter.add(Filter(RequestOptions.Field.SiteRole, RequestOptions.Operator.Equals, role))
+        try:
+            return count_items(server.users, options)
+        except Exception as e:
+            logger.warning(f"Failed to count users with site role '{role}': {e}")
+            return "Error"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        counts = dict(zip(SITE_ROLES, executor.map(count_role, SITE_ROLES)))
+    return {role: count for role, count in counts.items() if count}
+
+
+def audit_site_user_group_roles(site_override: str = None, full: bool = False, server: Server = None) -> dict:
+    """
+    Audit user, group and site role totals for a site.
+
+    By default totals come from `totalAvailable` of pageSize=1 queries and the role breakdown
+    from one filtered count per site role, so the cost does not grow with the number of users.
+    Pass full=True to enumerate every user and group instead.
+    """
     config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
 
     if site_override:
         logger.info(f"Overriding site with '{site_override}'")
-        tableau_cfg = config["tableau"]
-        auth = PersonalAccessTokenAuth(
-            token_name=tableau_cfg["token_name"],
-            personal_access_token=tableau_cfg["personal_access_token"],
-            site_id=site_override
-        )
-        server = Server(tableau_cfg["server_url"], use_server_version=True)
-    else:
-        server, auth = get_tableau_server_and_auth(config)
-
-    with server.auth.sign_in(auth):
+
+    paging = paging_options(config["tableau"])
+
+    with tableau_session(server, site_id=site_override or None) as server:
         logger.info("Connected to Tableau Cloud site")
 
         # Users
+        role_counter = {}
         try:
-            users = list(Pager(server.users))
-            user_count = len(users)
-            role_counter = Counter(user.site_role for user in users)
+            if full:
+                users = list(concurrent_pager(server.users, **paging))
+                user_count = len(users)
+                role_counter = Counter(user.site_role for user in users)
+            else:
+                user_count = count_items(server.users)
             logger.info(f"User count: {user_count}")
-            logger.info(f"Role breakdown: {dict(role_counter)}")
         except Exception as e:
             logger.error(f"Failed to fetch users: {e}")
             user_count = "Error"
-            role_counter = {}
+        if not full:
+            role_counter = count_users_by_role(server, paging["max_workers"])
+        logger.info(f"Role breakdown: {dict(role_counter)}")
 
         # Groups
         try:
-            group_count = sum(1 for _ in Pager(server.groups))
+            if full:
+                group_count = sum(1 for _ in concurrent_pager(server.groups, **paging))
+            else:
+                group_count = count_items(server.groups)
             logger.info(f"Group count: {group_count}")
         except Exception as e:
             logger.error(f"Failed to fetch groups: {e}")
             group_count = "Error"
 
         return {
-            "site": site_override or config["site_id"],
+            "site": site_override or config["tableau"]["site_id"],
+            "mode": "full" if full else "count",
             "user_count": user_count,
             "group_count": group_count,
             "role_breakdown": dict(role_counter)
         }
 
 
+def failed_counts(audit: dict) -> List[str]:
+    """Names of the counts in a site audit that fell back to "Error"."""
+    failed = [key for key in ("user_count", "group_count") if audit.get(key) == "Error"]
+    return failed + [f"role {role}" for role, count in (audit.get("role_breakdown") or {}).items()
+                     if count == "Error"]
+
+
+def list_site_content_urls(server: Server) -> List[str]:
+    """Return the content URL of every site on the server (requires a server administrator)."""
+    return [site.content_url for site in concurrent_pager(server.sites)]
+
+
+def audit_multiple_sites(site_names: Optional[List[str]] = None, all_sites: bool = False,
+                         full: bool = False, max_workers: Optional[int] = None) -> dict:
+    """
+    Audit several sites concurrently, each through its own pooled session.
+
+    Args:
+        site_names: Site content URLs to audit
+        all_sites: Audit every site on the server instead (server administrators only)
+        full: Enumerate users and groups instead of using count queries
+        max_workers: Sites audited at once; defaults to `site_audit_concurrency` in config.yaml
+
+    Returns:
+        dict: { success, site_count, elapsed_seconds, sites: [ {site, success, elapsed_seconds, audit?, error?} ] }
+    """
+    config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
+    max_workers = max_workers or config["tableau"].get("site_audit_concurrency", DEFAULT_SITE_AUDIT_CONCURRENCY)
+    started = time.perf_counter()
+
+    if all_sites:
+        try:
+            with tableau_session() as server:
+                site_names = list_site_content_urls(server)
+        except Exception as e:
+            logger.error(f"Failed to list sites: {e}", exc_info=True)
+            return {"success": False, "message": f"Failed to list sites: {e}", "sites": []}
+    site_names = list(dict.fromkeys(site_names or []))
+    if not site_names:
+        return {"success": False, "message": "No sites to audit.", "sites": []}
+
+    def audit_one(site_name: str) -> dict:
+        site_started = time.perf_counter()
+        try:
+            audit = get_session_pool(site_name).run(audit_site_user_group_roles, site_override=site_name, full=full)
+            result = {"site": site_name, "success": True, "audit": audit,
+                      "elapsed_seconds": round(time.perf_counter() - site_started, 3)}
+            failed_fields = failed_counts(audit)
+            if failed_fields:
+                result.update(success=False, error=f"Failed to count {', '.join(failed_fields)}")
+            return result
+        except Exception as e:
+            logger.error(f"Audit failed for site '{site_name}': {e}", exc_info=True)
+            return {"site": site_name, "success": False, "error": str(e),
+                    "elapsed_seconds": round(time.perf_counter() - site_started, 3)}
+
+    logger.info(f"Auditing {len(site_names)} site(s) with {max_workers} worker(s)")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="site-audit") as executor:
+        results = list(executor.map(audit_one, site_names))
+
+    failed = [f"{r['site']} ({r['error']})" for r in results if not r["success"]]
+    return {
+        "success": not failed,
+        "message": f"Audited {len(results) - len(failed)} of {len(results)} site(s)."
+                   + (f" Failed: {'; '.join(failed)}" if failed else ""),
+        "site_count": len(results),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "sites": results
+    }
+
+
 if __name__ == '__main__':
-    audit_site_user_group_roles("nitidev")
+    parser = argparse.ArgumentParser(description="Audit user, group and role totals across Tableau sites.")
+    parser.add_argument("sites", nargs="*", help="Site content URLs to audit")
+    parser.add_argument("--all", action="store_true", help="Audit every site on the server (server admin only)")
+    parser.add_argument("--full", action="store_true", help="Enumerate users and groups instead of counting")
+    parser.add_argument("--workers", type=int, default=None, help="Number of sites audited concurrently")
+    args = parser.parse_args()
+
+    report = audit_multiple_sites(args.sites, all_sites=args.all, full=args.full, max_workers=args.workers)
+    print(json.dumps(report, indent=2))
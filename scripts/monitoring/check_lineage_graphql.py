@@ -2,39 +2,32 @@ import os
 import sys
 import json
 import logging
-import requests
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+from tableauserverclient import Server
 
 # Add base_setup directory to Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / "base_setup")
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, get_tableau_server_and_auth, setup_logging
+from base_setup.utils.common_utils import load_config, setup_logging, ensure_directory_exists
+from base_setup.utils.http_client import get_http_client
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.session_pool import async_tableau_session, tableau_session
 
 # Setup logging
 logger = setup_logging(os.path.join(base_setup_path, "config", "logging_config.yaml"))
 
+# Workbooks per Metadata API request; each brings its sheets, dashboards and datasources,
+# so pages stay well below the API's node limit
+DEFAULT_LINEAGE_PAGE_SIZE = 100
 
-def run_metadata_graphql(query: str, variables: dict = None):
-    config = load_config(os.path.join(base_setup_path, "config", "config.yaml"))
-    server, auth = get_tableau_server_and_auth(config)
 
-    with server.auth.sign_in(auth):
+def run_metadata_graphql(query: str, variables: dict = None, server: Server = None):
+    with tableau_session(server) as server:
         logger.info("Signed into Tableau Cloud")
-
-        site_id = server.site_id
-        token = server.auth_token
-        server_url = config["tableau"]["server_url"]
-
-        graphql_url = f"{server_url}/api/metadata/graphql"
-
-        headers = {
-            "X-Tableau-Auth": token,
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-
         payload = {
             "query": query,
             "variables": variables or {}
@@ -42,7 +35,8 @@ def run_metadata_graphql(query: str, variables: dict = None):
 
         try:
             logger.info("Sending GraphQL metadata query...")
-            response = requests.post(graphql_url, headers=headers, json=payload)
+            response = get_http_client().post(f"{server.server_address}/api/metadata/graphql",
+                                              server=server, json=payload)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -50,8 +44,7 @@ def run_metadata_graphql(query: str, variables: dict = None):
             return None
 
 
-def get_lineage_for_workbook(workbook_name: str):
-    query = """
+LINEAGE_QUERY = """
     query getWorkbookLineage($name: String!) {
       workbooks(filter: {name: $name}) {
         name
@@ -76,14 +69,180 @@ def get_lineage_for_workbook(workbook_name: str):
       }
     }
     """
-    response = run_metadata_graphql(query, {"name": workbook_name})
-    logger.info(f"GraphQL response: {json.dumps(response, indent=2)}")
+
+
+def get_lineage_for_workbook(workbook_name: str, server: Server = None):
+    response = run_metadata_graphql(LINEAGE_QUERY, {"name": workbook_name}, server=server)
+    logger.info(f"Lineage for workbook '{workbook_name}': "
+                f"{len(((response or {}).get('data') or {}).get('workbooks') or [])} match(es)")
     return {
         "success": True,
         "response": response
     }
 
 
+LINEAGE_PAGE_QUERY = """
+    query workbookLineagePage($first: Int!, $after: String, $filter: Workbook_Filter) {
+      workbooksConnection(first: $first, after: $after, filter: $filter) {
+        nodes {
+          name
+          id
+          luid
+          projectName
+          updatedAt
+          upstreamDatasources {
+            name
+            id
+          }
+          embeddedDatasources {
+            name
+            id
+          }
+          sheets {
+            name
+            id
+          }
+          dashboards {
+            name
+            id
+          }
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+    }
+    """
+
+
+def _lineage_page_size(page_size: Optional[int]) -> int:
+    if page_size:
+        return page_size
+    tableau_cfg = load_config(os.path.join(base_setup_path, "config", "config.yaml")).get("tableau", {})
+    return tableau_cfg.get("lineage_page_size", DEFAULT_LINEAGE_PAGE_SIZE)
+
+
+def _lineage_filters(workbook_names: Optional[Iterable[str]], project_name: Optional[str],
+                     page_size: int) -> Iterator[Optional[dict]]:
+    """One Metadata API filter per batch of names (one filter for all workbooks without names)."""
+    base = {"projectName": project_name} if project_name else {}
+    if workbook_names is None:
+        yield base or None
+        return
+    names = list(dict.fromkeys(workbook_names))
+    for start in range(0, len(names), page_size):
+        yield {**base, "nameWithin": names[start:start + page_size]}
+
+
+def _lineage_request(lineage_filter: Optional[dict], page_size: int, cursor: Optional[str]) -> dict:
+    """JSON body of the Metadata API request for the page after `cursor`."""
+    return {"query": LINEAGE_PAGE_QUERY, "variables": {"first": page_size, "after": cursor, "filter": lineage_filter}}
+
+
+def _lineage_page(response) -> Tuple[List[dict], Optional[str]]:
+    """Workbooks of one page and the cursor of the next page (None on the last page)."""
+    response.raise_for_status()
+    payload = response.json()
+    errors = payload.get("errors")
+    connection = (payload.get("data") or {}).get("workbooksConnection")
+    if connection is None:
+        raise RuntimeError(f"Metadata API query failed: {errors or 'no data returned'}")
+    if errors:
+        logger.warning(f"Metadata API returned partial lineage: {errors}")
+    page_info = connection.get("pageInfo") or {}
+    workbooks = connection.get("nodes") or []
+    logger.debug(f"Fetched lineage page of {len(workbooks)} workbook(s)")
+    return workbooks, page_info.get("endCursor") if page_info.get("hasNextPage") else None
+
+
+def iter_workbook_lineage(workbook_names: Optional[Iterable[str]] = None, project_name: Optional[str] = None,
+                          page_size: Optional[int] = None, server: Server = None) -> Iterator[List[dict]]:
+    """
+    Yield workbook lineage page by page from the Metadata API's `workbooksConnection`.
+
+    Without `workbook_names` every workbook on the site (or in `project_name`) is returned;
+    names are looked up `page_size` at a time with a `nameWithin` filter. Each page is one
+    request of up to `page_size` workbooks (`lineage_page_size`, default 100), fetched only
+    when the caller asks for it, and one signed-in session is used for all pages.
+    """
+    page_size = _lineage_page_size(page_size)
+    with tableau_session(server) as server:
+        url = f"{server.server_address}/api/metadata/graphql"
+        for lineage_filter in _lineage_filters(workbook_names, project_name, page_size):
+            cursor = None
+            while True:
+                response = get_http_client().post(url, server=server,
+                                                  json=_lineage_request(lineage_filter, page_size, cursor))
+                workbooks, cursor = _lineage_page(response)
+                yield workbooks
+                if cursor is None:
+                    break
+
+
+async def aiter_workbook_lineage(workbook_names: Optional[Iterable[str]] = None, project_name: Optional[str] = None,
+                                 page_size: Optional[int] = None, site_id: Optional[str] = None
+                                 ) -> AsyncIterator[List[dict]]:
+    """Async variant of `iter_workbook_lineage` that holds a pooled session while it is iterated."""
+    page_size = _lineage_page_size(page_size)
+    async with async_tableau_session(site_id=site_id) as server:
+        url = f"{server.server_address}/api/metadata/graphql"
+        for lineage_filter in _lineage_filters(workbook_names, project_name, page_size):
+            cursor = None
+            while True:
+                response = await get_http_client().apost(url, server=server,
+                                                         json=_lineage_request(lineage_filter, page_size, cursor))
+                workbooks, cursor = _lineage_page(response)
+                yield workbooks
+                if cursor is None:
+                    break
+
+
+def export_site_lineage(workbook_names: Optional[List[str]] = None, project_name: Optional[str] = None,
+                        page_size: Optional[int] = None, server: Server = None) -> dict:
+    """
+    Write the lineage of many (or all) workbooks to `<download_path>/lineage_<timestamp>.jsonl`.
+
+    Pages from `iter_workbook_lineage` are appended as they arrive, one workbook per line, so
+    memory holds a single page however large the site is.
+
+    Returns:
+        dict: { success, message, report_path, workbooks, requests, missing }
+    """
+    try:
+        tableau_cfg = load_config(os.path.join(base_setup_path, "config", "config.yaml")).get("tableau", {})
+        download_dir = tableau_cfg.get("download_path", "downloads")
+        ensure_directory_exists(download_dir)
+        report_path = os.path.join(download_dir,
+                                   f"lineage_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.jsonl")
+        found, exported, pages = set(), 0, 0
+        with open(report_path, "w", encoding="utf-8") as report:
+            for workbooks in iter_workbook_lineage(workbook_names, project_name, page_size, server=server):
+                pages += 1
+                exported += len(workbooks)
+                for workbook in workbooks:
+                    report.write(json.dumps(workbook) + "\n")
+                    found.add(workbook["name"])
+                report_progress(f"Fetched lineage of {exported} workbook(s)")
+
+        missing = sorted(set(workbook_names or []) - found)
+        message = f"Exported lineage of {exported} workbook(s) in {pages} request(s)" + \
+                  (f"; not found: {', '.join(missing)}." if missing else ".")
+        logger.info(message)
+        return {
+            "success": True,
+            "message": message,
+            "report_path": report_path,
+            "workbooks": exported,
+            "requests": pages,
+            "missing": missing,
+        }
+
+    except Exception as e:
+        logger.error(f"Lineage export failed: {e}", exc_info=True)
+        return {"success": False, "message": f"Lineage export failed: {e}"}
+
+
 if __name__ == "__main__":
     workbook_name = "Superstore"  # Replace with your workbook name
 
@@ -3,34 +3,26 @@ import os
 import sys
 from pathlib import Path
 
-from tableauserverclient import Server, PersonalAccessTokenAuth
+from tableauserverclient import Server
 
 # Add base_setup directory to Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / "base_setup")
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import load_config, setup_logging
+from base_setup.utils.session_pool import tableau_session
 
 # Setup logging
 logger = setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 
 
-def check_tcm_access(site_override: str = None) -> dict:
+def check_tcm_access(site_override: str = None, server: Server = None) -> dict:
     config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
 
     if site_override:
         logger.info(f"Overriding site with '{site_override}'")
-        tableau_cfg = config["tableau"]
-        auth = PersonalAccessTokenAuth(
-            token_name=tableau_cfg["token_name"],
-            personal_access_token=tableau_cfg["personal_access_token"],
-            site_id=site_override
-        )
-        server = Server(tableau_cfg["server_url"], use_server_version=True)
-    else:
-        server, auth = get_tableau_server_and_auth(config)
 
-    with server.auth.sign_in(auth):
+    with tableau_session(server, site_id=site_override or None) as server:
         logger.info(f"✅ Signed in to Tableau Cloud site: {server.site_id}")
 
         try:
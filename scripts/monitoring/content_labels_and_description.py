@@ -2,29 +2,31 @@ import os
 import sys
 import logging
 from pathlib import Path
-from tableauserverclient import Server, Pager
+from tableauserverclient import Server
 
 # Setup base path
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth
+from base_setup.utils.common_utils import load_config, setup_logging
+from base_setup.utils.paging import concurrent_pager, paging_options
+from base_setup.utils.session_pool import tableau_session
 
 # Logging
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger('metadata_check')
 
 
-def check_metadata_for_content():
+def check_metadata_for_content(server: Server = None):
     config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-    server, auth = get_tableau_server_and_auth(config)
+    paging = paging_options(config["tableau"])
 
-    with server.auth.sign_in(auth):
+    with tableau_session(server) as server:
         logger.info("Signed into Tableau Cloud")
 
         # --- Workbooks ---
         logger.info("Fetching workbooks...")
-        workbooks = list(Pager(server.workbooks))
+        workbooks = list(concurrent_pager(server.workbooks, **paging))
 
         workbook_results = []
         for wb in workbooks:
@@ -38,7 +40,7 @@ def check_metadata_for_content():
 
         # --- Datasources ---
         logger.info("Fetching datasources...")
-        datasources = list(Pager(server.datasources))
+        datasources = list(concurrent_pager(server.datasources, **paging))
 
         datasource_results = []
         for ds in datasources:
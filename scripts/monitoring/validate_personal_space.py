@@ -2,41 +2,33 @@ import os
 import sys
 import logging
 from pathlib import Path
-import requests
+
+from tableauserverclient import Server
 
 # Add base_setup directory to Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, get_tableau_server_and_auth, setup_logging
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.http_client import get_http_client, site_api_url
+from base_setup.utils.session_pool import tableau_session
 
 # Setup logging
 logger = setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 
 
-def validate_personal_spaces():
-    config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-    server, auth = get_tableau_server_and_auth(config)
+API_VERSION = "3.26"  # or adjust as needed
 
-    with server.auth.sign_in(auth):
-        logger.info("Connected to Tableau Cloud")
-        auth_token = server.auth_token
-        site_id = server.site_id
-        server_url = config["tableau"]["server_url"]
-        api_version = "3.26"  # or adjust as needed
-
-        headers = {
-            "X-Tableau-Auth": auth_token,
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
 
+def validate_personal_spaces(server: Server = None):
+    with tableau_session(server) as server:
+        logger.info("Connected to Tableau Cloud")
         results = []
 
         try:
             logger.info("Fetching personal spaces...")
-            url = f"{server_url}/api/{api_version}/sites/{site_id}/projects?pageSize=1000"
-            response = requests.get(url, headers=headers)
+            url = site_api_url(server, "projects?pageSize=1000", API_VERSION)
+            response = get_http_client().get(url, server=server)
             response.raise_for_status()
             project_data = response.json()
 
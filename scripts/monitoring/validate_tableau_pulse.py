@@ -1,39 +1,32 @@
 import os
 import sys
 import logging
-import requests
 from pathlib import Path
 
+from tableauserverclient import Server
+
 # Add base_setup directory to Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / "base_setup")
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, get_tableau_server_and_auth, setup_logging
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.http_client import get_http_client, site_api_url
+from base_setup.utils.session_pool import tableau_session
 
 # Setup logging
 logger = setup_logging(os.path.join(base_setup_path, "config", "logging_config.yaml"))
 
-def fetch_pulse_metrics():
-    config = load_config(os.path.join(base_setup_path, "config", "config.yaml"))
-    server, auth = get_tableau_server_and_auth(config)
+API_VERSION = "3.26"
+
 
-    with server.auth.sign_in(auth):
+def fetch_pulse_metrics(server: Server = None):
+    with tableau_session(server) as server:
         logger.info("Authenticated to Tableau Cloud")
-        auth_token = server.auth_token
-        site_id = server.site_id
-        server_url = config["tableau"]["server_url"]
-        api_version = "3.26"
-
-        url = f"{server_url}/api/{api_version}/sites/{site_id}/pulse/metric-definitions"
-        headers = {
-            "X-Tableau-Auth": auth_token,
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
 
         try:
             logger.info("Requesting Pulse metric definitions...")
-            response = requests.get(url, headers=headers)
+            response = get_http_client().get(site_api_url(server, "pulse/metric-definitions", API_VERSION),
+                                             server=server)
 
             if response.status_code == 404:
                 logger.warning("Pulse API is not enabled for this site. Skipping metric audit.")
@@ -1,55 +1,62 @@
+import contextvars
+import csv
 import logging
+import multiprocessing
 import os
 import sys
-import zipfile
-import xml.etree.ElementTree as ET
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
+from typing import List, Optional
 
 # Add base_setup directory to Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / "base_setup")
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import (
-    load_config,
-    setup_logging,
-    get_tableau_server_and_auth,
-    ensure_directory_exists,
-)
+from base_setup.utils.common_utils import load_config, setup_logging, ensure_directory_exists
+from base_setup.utils.content_resolver import find_items, find_project, list_project_items
+from base_setup.utils.download_cache import get_download_cache
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.paging import concurrent_pager, paging_options
+from base_setup.utils.scan_store import ExtensionScanStore, get_scan_store
+from base_setup.utils.session_pool import tableau_session, worker_sessions
+from base_setup.utils.transfer import resumable_download, transfer_settings
+from base_setup.utils.twb_analyzer import analyze_twb
 
 import tableauserverclient as TSC
 
 # Setup logging
 logger = setup_logging(os.path.join(base_setup_path, "config", "logging_config.yaml"))
 
+DEFAULT_SCAN_DOWNLOAD_CONCURRENCY = 4
+DEFAULT_SCAN_PROCESSES = min(4, os.cpu_count() or 1)
+# Bump when detection changes so stored results are scanned again
+SCANNER_VERSION = 1
+SCAN_REPORT_COLUMNS = ("project", "workbook", "workbook_id", "owner_id", "updated_at",
+                       "tabpy", "einstein", "viz_ext", "cached", "success", "error")
 
-def extract_twb_from_twbx(twbx_path: str, extract_to_dir: str) -> str:
-    with zipfile.ZipFile(twbx_path, "r") as zip_ref:
-        for file in zip_ref.namelist():
-            if file.endswith(".twb"):
-                zip_ref.extract(file, extract_to_dir)
-                twb_path = os.path.join(extract_to_dir, file)
-                logger.info(f"Extracted .twb: {twb_path}")
-                return twb_path
-    raise FileNotFoundError("No .twb file found in the .twbx archive.")
 
+def _scan_workbook_file(workbook_path: str) -> dict:
+    """
+    Detect TabPy scripts, Einstein extensions and dashboard extensions in one streaming pass.
 
-def scan_for_extensions(twb_path: str) -> dict:
-    try:
-        tree = ET.parse(twb_path)
-        root = tree.getroot()
+    Parsing stops once every kind of usage has been found; use `analyze_twb` for the full
+    summary. Module-level so process pools can run it.
+    """
+    return analyze_twb(workbook_path, sections=("extensions",))["extensions"]
 
-        tabpy_used = any("tabpy" in el.attrib.get("url", "").lower() for el in root.iter("script"))
-        einstein_used = any("einstein" in el.attrib.get("url", "").lower() for el in root.iter("extension"))
-        viz_ext_used = any("extension" in el.tag.lower() for el in root.iter())
 
-        return {
-            "tabpy": tabpy_used,
-            "einstein": einstein_used,
-            "viz_ext": viz_ext_used
-        }
+def scan_for_extensions(workbook_path: str) -> dict:
+    """Scan a .twb or .twbx for extension usage; parse errors are logged and reported as no usage."""
+    try:
+        return _scan_workbook_file(workbook_path)
 
     except Exception as e:
-        logger.error(f"Failed to parse {twb_path}: {e}", exc_info=True)
+        logger.error(f"Failed to parse {workbook_path}: {e}", exc_info=True)
         return {
             "tabpy": False,
             "einstein": False,
@@ -57,50 +64,225 @@ def scan_for_extensions(twb_path: str) -> dict:
         }
 
 
-def check_extensions_in_workbook(workbook_name: str):
-    config = load_config(os.path.join(base_setup_path, "config", "config.yaml"))
-    download_dir = config.get("tableau", {}).get("download_path", "downloads")
-    ensure_directory_exists(download_dir)
-
-    server, auth = get_tableau_server_and_auth(config)
-
-    with server.auth.sign_in(auth):
+def check_extensions_in_workbook(workbook_name: str, server: TSC.Server = None):
+    with tableau_session(server) as server:
         logger.info("Signed into Tableau Server")
 
-        # Fetch all workbooks
-        logger.info("Querying all workbooks on site")
-        workbooks = list(TSC.Pager(server.workbooks))
-
-        workbook = next((w for w in workbooks if w.name.strip().lower() == workbook_name.strip().lower()), None)
+        logger.info(f"Looking up workbook '{workbook_name}'")
+        workbook = next(iter(find_items(server, "workbook", workbook_name)), None)
         if not workbook:
             print(f"Workbook '{workbook_name}' not found.")
             return
 
-        # Download workbook — don't add extension manually
-        download_stub = os.path.join(download_dir, workbook.name.replace(' ', '_'))
-        downloaded_path = server.workbooks.download(workbook.id, filepath=download_stub, include_extract=False)
-        logger.info(f"Downloaded workbook to {downloaded_path} (ID: {workbook.id})")
-
-        # Extract .twb and scan
-        twb_path = extract_twb_from_twbx(downloaded_path, download_dir)
-        ext_usage = scan_for_extensions(twb_path)
+        # The lookup may come from the content catalog; the stored result is checked against
+        # the workbook's current revision
+        workbook = server.workbooks.get_by_id(workbook.id)
+        stored = get_scan_store().current(server.site_id, workbook, SCANNER_VERSION)
+        if stored:
+            logger.info(f"Using stored scan of workbook '{workbook.name}' (updated {stored['updated_at']})")
+            ext_usage, downloaded_path = stored, None
+        else:
+            ext_usage, downloaded_path = _download_and_scan(server, workbook)
 
         # Output result
         print("\n=== Dashboard Extension Scan ===")
         print(f"Workbook         : {workbook.name}")
-        print(f"Path             : {twb_path}")
+        print(f"Path             : {downloaded_path or '(stored result)'}")
         print(f"Uses TabPy       : {'✅' if ext_usage['tabpy'] else '❌'}")
         print(f"Uses Einstein    : {'✅' if ext_usage['einstein'] else '❌'}")
         print(f"Uses Viz Ext     : {'✅' if ext_usage['viz_ext'] else '❌'}")
         return {
             "workbook": workbook.name,
-            "path": twb_path,
+            "path": downloaded_path,
+            "cached": bool(stored),
             "tabpy_used": ext_usage["tabpy"],
             "einstein_used": ext_usage["einstein"],
             "viz_ext_used": ext_usage["viz_ext"]
         }
 
 
+def _download_and_scan(server: TSC.Server, workbook: TSC.WorkbookItem):
+    """Download and scan one workbook, storing the result when the workbook parsed."""
+    # Download workbook — don't add extension manually
+    report_progress(f"Downloading workbook '{workbook.name}'")
+    downloaded_path, from_cache = get_download_cache().fetch(server, "workbook", workbook, include_extract=False,
+                                                             verify=False)
+    logger.info(f"{'Reused cached' if from_cache else 'Downloaded'} workbook {downloaded_path} (ID: {workbook.id})")
+
+    # Scan the .twb straight from the downloaded archive
+    report_progress("Scanning for extensions")
+    try:
+        ext_usage = _scan_workbook_file(downloaded_path)
+    except Exception as e:
+        logger.error(f"Failed to parse {downloaded_path}: {e}", exc_info=True)
+        return {"tabpy": False, "einstein": False, "viz_ext": False}, downloaded_path
+    get_scan_store().save(server.site_id, server.site_url, workbook, ext_usage, SCANNER_VERSION)
+    return ext_usage, downloaded_path
+
+
+def _write_scan_report(rows: List[dict], report_path: str):
+    with open(report_path, "w", newline="", encoding="utf-8") as report:
+        writer = csv.DictWriter(report, fieldnames=SCAN_REPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def scan_site_extensions(
+        project_name: Optional[str] = None,
+        download_workers: Optional[int] = None,
+        parse_processes: Optional[int] = None,
+        rescan: bool = False,
+        server: Optional[TSC.Server] = None
+) -> dict:
+    """
+    Audit extension usage across every workbook of the site, or of one project.
+
+    Workbooks are downloaded without extracts by `download_workers` threads (no more than the
+    pooled sessions free at the start, as each thread needs a session of its own) into a temporary
+    directory and parsed by `parse_processes` worker processes as they arrive; at most two
+    downloaded files per process wait to be parsed and each is deleted once scanned. The
+    table is returned and written as CSV to `<download_path>/extension_audit_<timestamp>.csv`.
+    Defaults come from `extension_scan_download_concurrency` / `extension_scan_processes`.
+
+    Results are stored per workbook revision (see `ExtensionScanStore`); workbooks whose
+    `updated_at` matches the stored result are reported from the store without a download,
+    unless `rescan` is set. A site-wide scan also drops stored results of deleted workbooks.
+
+    Returns:
+        dict: { success, message, report_path, scanned, cached, rescanned, failed, tabpy, einstein, viz_ext,
+                seconds, workbooks }
+    """
+    try:
+        tableau_cfg = load_config(os.path.join(base_setup_path, "config", "config.yaml")).get("tableau", {})
+        download_workers = download_workers or tableau_cfg.get("extension_scan_download_concurrency",
+                                                               DEFAULT_SCAN_DOWNLOAD_CONCURRENCY)
+        parse_processes = parse_processes or tableau_cfg.get("extension_scan_processes", DEFAULT_SCAN_PROCESSES)
+        download_dir = tableau_cfg.get("download_path", "downloads")
+        ensure_directory_exists(download_dir)
+        settings = transfer_settings()
+        started = time.monotonic()
+
+        with tableau_session(server) as server:
+            if project_name:
+                project = find_project(server, project_name)
+                if not project:
+                    return {"success": False, "message": f"Project '{project_name}' not found."}
+                workbooks = list_project_items(server, "workbook", project)
+            else:
+                workbooks = list(concurrent_pager(server.workbooks, **paging_options(tableau_cfg)))
+
+            def row(workbook, **fields) -> dict:
+                return {"workbook": workbook.name, "workbook_id": workbook.id, "project": workbook.project_name,
+                        "owner_id": workbook.owner_id, "updated_at": workbook.updated_at, **fields}
+
+            store = get_scan_store()
+            stored = {} if rescan else store.results(server.site_id)
+            rows, changed = [], []
+            for workbook in workbooks:
+                previous = stored.get(workbook.id)
+                if ExtensionScanStore.is_current(previous, workbook, SCANNER_VERSION):
+                    rows.append(row(workbook, cached=True, success=True,
+                                    **{kind: previous[kind] for kind in ("tabpy", "einstein", "viz_ext")}))
+                else:
+                    changed.append(workbook)
+            report_progress(f"Scanning {len(changed)} changed workbook(s)")
+
+            waiting = threading.BoundedSemaphore(parse_processes * 2)  # downloaded, not yet parsed
+            results = []
+
+            with tempfile.TemporaryDirectory(prefix="extension-scan-", dir=settings["spool_dir"]) as scratch:
+                def download(workbook) -> str:
+                    waiting.acquire()
+                    try:
+                        with workers.session() as worker_server:
+                            return resumable_download(worker_server, "workbook", workbook.id,
+                                                      os.path.join(scratch, workbook.id),
+                                                      include_extract=False, settings=settings)["path"]
+                    except Exception:
+                        waiting.release()
+                        raise
+
+                def parsed(path: str, _future: Future):
+                    try:
+                        os.remove(path)
+                    finally:
+                        waiting.release()
+
+                # Each download thread holds its own pooled session; with none free, one thread uses ours
+                with worker_sessions(server, download_workers) as workers:
+                    download_workers = max(workers.count, 1)
+                    logger.info(f"Scanning {len(changed)} of {len(workbooks)} workbook(s) for extensions, "
+                                f"{len(rows)} unchanged since the last scan "
+                                f"({download_workers} download threads / {parse_processes} parse processes)")
+                    # Spawned workers avoid forking a process that is running threads
+                    spawn = multiprocessing.get_context("spawn")
+                    with ThreadPoolExecutor(download_workers, thread_name_prefix="scan-download") as downloads, \
+                            ProcessPoolExecutor(parse_processes, mp_context=spawn) as parsers:
+                        download_futures = {
+                            downloads.submit(contextvars.copy_context().run, download, workbook): workbook
+                            for workbook in changed
+                        }
+                        parse_futures = {}
+                        for future in as_completed(download_futures):
+                            workbook = download_futures[future]
+                            try:
+                                path = future.result()
+                            except Exception as e:
+                                logger.error(f"Downloading workbook '{workbook.name}' failed: {e}")
+                                rows.append(row(workbook, cached=False, success=False, error=f"download: {e}"))
+                                continue
+                            parse_future = parsers.submit(_scan_workbook_file, path)
+                            parse_future.add_done_callback(partial(parsed, path))
+                            parse_futures[parse_future] = workbook
+                        for future in as_completed(parse_futures):
+                            workbook = parse_futures[future]
+                            try:
+                                usage = future.result()
+                            except Exception as e:
+                                logger.error(f"Parsing workbook '{workbook.name}' failed: {e}")
+                                rows.append(row(workbook, cached=False, success=False, error=f"parse: {e}"))
+                            else:
+                                rows.append(row(workbook, cached=False, success=True, **usage))
+                                results.append((workbook, usage))
+                            report_progress(f"Scanned workbook '{workbook.name}'")
+
+            store.save_many(server.site_id, server.site_url, results, SCANNER_VERSION)
+            if not project_name:
+                pruned = store.prune(server.site_id, (workbook.id for workbook in workbooks))
+                if pruned:
+                    logger.info(f"Dropped stored scan results of {pruned} deleted workbook(s)")
+
+        rows.sort(key=lambda entry: ((entry["project"] or "").lower(), entry["workbook"].lower()))
+        report_path = os.path.join(download_dir,
+                                   f"extension_audit_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.csv")
+        _write_scan_report(rows, report_path)
+        failed = [entry for entry in rows if not entry["success"]]
+        cached = sum(1 for entry in rows if entry["cached"])
+        usage = {kind: sum(1 for entry in rows if entry.get(kind)) for kind in ("tabpy", "einstein", "viz_ext")}
+        message = f"Scanned {len(rows) - len(failed)} of {len(workbooks)} workbook(s): {usage['tabpy']} use TabPy, " \
+                  f"{usage['einstein']} Einstein, {usage['viz_ext']} extensions; {cached} unchanged since " \
+                  f"the last scan" + \
+                  (f"; {len(failed)} failed." if failed else ".")
+        logger.info(message)
+        return {
+            "success": not failed,
+            "message": message,
+            "report_path": report_path,
+            "scanned": len(rows) - len(failed),
+            "cached": cached,
+            "rescanned": len(rows) - cached,
+            "failed": len(failed),
+            **usage,
+            "seconds": round(time.monotonic() - started, 3),
+            "workbooks": rows,
+        }
+
+    except Exception as e:
+        logger.error(f"Site extension scan failed: {e}", exc_info=True)
+        return {"success": False, "message": f"Site extension scan failed: {e}"}
+
+
 if __name__ == "__main__":
     # Provide workbook name here
     check_extensions_in_workbook("Superstore")
+    print(scan_site_extensions()["message"])
@@ -2,13 +2,22 @@ import sys
 import os
 import logging
 from pathlib import Path
-import requests # Import the requests library
+from typing import Optional
+
+import tableauserverclient as TSC
 
 # Add the base_setup directory to the Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
-from base_setup.utils.common_utils import load_config, setup_logging, get_tableau_server_and_auth # Updated import
+from base_setup.utils.common_utils import setup_logging
+from base_setup.utils.content_resolver import find_items, find_project
+from base_setup.utils.download_cache import get_download_cache
+from base_setup.utils.http_client import get_http_client, site_api_url
+from base_setup.utils.jobs import report_progress
+from base_setup.utils.session_pool import tableau_session
+from base_setup.utils.transfer import PUBLISHABLE
+from base_setup.utils.twb_analyzer import SECTIONS, analyze_twb, diff_summaries
 
 try:
     from tableauserverclient import Filter  # Try modern import first
@@ -19,7 +28,29 @@ except ImportError:
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger('tableau_automation')
 
-def get_revision_history(content_type: str, content_name: str, project_name: str | None = None) -> dict:
+def _find_content_item(server: TSC.Server, content_type: str, content_name: str, project_name: str | None = None):
+    """Return `(item, None)` for the uniquely named workbook or datasource, or `(None, error message)`."""
+    # Find the content item by name and project
+    project = None
+    if project_name:
+        project = find_project(server, project_name)
+        if not project:
+            return None, f"Project '{project_name}' not found."
+    filtered_items = find_items(server, content_type, content_name,
+                                project_name=project.name if project else None,
+                                project_id=project.id if project else None)
+
+    if not filtered_items:
+        return None, f"{content_type.capitalize()} '{content_name}'" + \
+            (f" in project '{project_name}'" if project_name else "") + " not found."
+    elif len(filtered_items) > 1:
+        return None, f"Multiple {content_type}s found with name '{content_name}'." + \
+            (" Please provide a project name to narrow down." if not project_name else "")
+    return filtered_items[0], None
+
+
+def get_revision_history(content_type: str, content_name: str, project_name: str | None = None,
+                         server: Optional[TSC.Server] = None) -> dict:
     """
     Get the revision history for a content item.
     
@@ -27,6 +58,7 @@ def get_revision_history(content_type: str, content_name: str, project_name: str
         content_type (str): Type of content ('workbook' or 'datasource')
         content_name (str): Name of the content
         project_name (str, optional): Project name to narrow down search.
+        server (TSC.Server, optional): Signed-in server to reuse; a pooled session is borrowed when omitted
         
     Returns:
         dict: Result with revision history data or error message
@@ -38,63 +70,21 @@ def get_revision_history(content_type: str, content_name: str, project_name: str
         }
 
     try:
-        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        server, tableau_auth = get_tableau_server_and_auth(config)
-
-        with server.auth.sign_in(tableau_auth):  # Changed from server.server.auth
+        with tableau_session(server) as server:
             logger.info(f"Fetching revision history for {content_type} '{content_name}'" + 
                       (f" in project '{project_name}'" if project_name else ""))
 
-            # Find the content item
-            if content_type.lower() == 'workbook':
-                items, _ = server.workbooks.get()
-            else:
-                items, _ = server.datasources.get()
-
-            # Filter by name and project
-            filtered_items = [item for item in items 
-                            if item.name.lower() == content_name.lower()]
-            
-            if project_name:
-                project = next((p for p in server.projects.get()[0] 
-                              if p.name.lower() == project_name.lower()), None)
-                if not project:
-                    msg = f"Project '{project_name}' not found."
-                    logger.error(msg)
-                    return {"success": False, "message": msg, "revisions": []}
-                filtered_items = [item for item in filtered_items 
-                                if item.project_id == project.id]
-
-            if not filtered_items:
-                msg = f"{content_type.capitalize()} '{content_name}'" + \
-                      (f" in project '{project_name}'" if project_name else "") + " not found."
+            content_item, msg = _find_content_item(server, content_type, content_name, project_name)
+            if not content_item:
                 logger.error(msg)
                 return {"success": False, "message": msg, "revisions": []}
-            elif len(filtered_items) > 1:
-                msg = f"Multiple {content_type}s found with name '{content_name}'." + \
-                      (" Please provide a project name to narrow down." if not project_name else "")
-                logger.error(msg)
-                return {"success": False, "message": msg, "revisions": []}
-
-            content_item = filtered_items[0]
 
             # Get revision history via REST API
-            server_info = server.server_info.get()
-            api_version = server_info.rest_api_version
-            base_url = server.server_address.replace('/api', '')  # Ensure clean base URL
-            site_id = server.site_id
-            auth_token = server.auth_token
-
             endpoint = f"workbooks/{content_item.id}/revisions" if content_type.lower() == 'workbook' \
                       else f"datasources/{content_item.id}/revisions"
-            
-            url = f"{base_url}/api/{api_version}/sites/{site_id}/{endpoint}"
-            headers = {
-                "X-Tableau-Auth": auth_token,
-                "Accept": "application/json"
-            }
-
-            response = requests.get(url, headers=headers)
+            url = site_api_url(server, endpoint)
+
+            response = get_http_client().get(url, server=server)
             if response.status_code != 200:
                 msg = f"API request failed ({response.status_code}): {response.text}"
                 logger.error(msg)
@@ -125,4 +115,99 @@ def get_revision_history(content_type: str, content_name: str, project_name: str
 
     except Exception as e:
         logger.error(f"Error fetching revision history: {str(e)}", exc_info=True)
-        return {"success": False, "message": str(e), "revisions": []}
\ No newline at end of file
+        return {"success": False, "message": str(e), "revisions": []}
+
+def _revision_file(server: TSC.Server, content_type: str, item, revision: str, current: bool) -> str:
+    """Path of the revision in the download cache; the current revision is the item's regular download."""
+    report_progress(f"Downloading revision {revision}")
+    cache = get_download_cache()
+    if current:
+        path, _ = cache.fetch(server, content_type, item, include_extract=False)
+    else:
+        path, _ = cache.fetch_revision(server, content_type, item, revision, include_extract=False)
+    return path
+
+
+def diff_revisions(content_type: str, content_name: str, old_revision: str | None = None,
+                   new_revision: str | None = None, project_name: str | None = None,
+                   server: Optional[TSC.Server] = None) -> dict:
+    """
+    Structural diff between two revisions of a workbook or datasource.
+
+    Both revisions are downloaded without extracts through the download cache (revisions
+    never change, so each is downloaded once) and summarized in one streaming pass each;
+    the summaries are compared instead of the raw XML, so memory stays bounded on large
+    files. `new_revision` defaults to the current revision and `old_revision` to the one
+    before it.
+
+    Returns:
+        dict: { success, message, old_revision, new_revision, changes } where `changes` maps
+        each section that differs (worksheets, dashboards, calculated_fields, connections,
+        custom_sql, parameters, ...) to its added / removed / changed entries
+    """
+    content_type = content_type.lower()
+    if content_type not in PUBLISHABLE:
+        return {"success": False,
+                "message": f"Invalid content type: {content_type}. Must be 'workbook' or 'datasource'"}
+
+    try:
+        with tableau_session(server) as server:
+            content_item, msg = _find_content_item(server, content_type, content_name, project_name)
+            if not content_item:
+                logger.error(msg)
+                return {"success": False, "message": msg}
+            endpoint = getattr(server, PUBLISHABLE[content_type][0])
+            content_item = endpoint.get_by_id(content_item.id)
+            endpoint.populate_revisions(content_item)
+            revisions = sorted((revision for revision in content_item.revisions if not revision.deleted),
+                               key=lambda revision: int(revision.revision_number))
+            numbers = [revision.revision_number for revision in revisions]
+            current = next((revision.revision_number for revision in revisions if revision.current),
+                           numbers[-1] if numbers else None)
+            if len(numbers) < 2:
+                return {"success": False, "message": f"{content_type.capitalize()} '{content_name}' has only "
+                                                     f"{len(numbers)} revision(s) to compare."}
+
+            new_revision = str(new_revision or numbers[-1])
+            if new_revision not in numbers:
+                return {"success": False, "message": f"Revision {new_revision} not found (available: "
+                                                     f"{', '.join(numbers)})."}
+            older = numbers[:numbers.index(new_revision)]
+            old_revision = str(old_revision or (older[-1] if older else ""))
+            if old_revision not in numbers or old_revision == new_revision:
+                return {"success": False, "message": f"No revision to compare with {new_revision} "
+                                                     f"(available: {', '.join(numbers)})."}
+
+            logger.info(f"Comparing revisions {old_revision} and {new_revision} of {content_type} "
+                        f"'{content_item.name}'")
+            paths = {revision: _revision_file(server, content_type, content_item, revision,
+                                              current=revision == current)
+                     for revision in (old_revision, new_revision)}
+
+        report_progress("Comparing revisions")
+        sections = [section for section in SECTIONS if section != "extensions" or content_type == "workbook"]
+        changes = diff_summaries(analyze_twb(paths[old_revision], sections),
+                                 analyze_twb(paths[new_revision], sections))
+        summary = ", ".join(
+            f"{section.replace('_', ' ')} "
+            + " / ".join(f"{len(entries)} {kind}" for kind, entries in diff.items() if entries)
+            for section, diff in changes.items() if section != "extensions"
+        )
+        if "extensions" in changes:
+            summary = ", ".join(filter(None, [summary, "extension usage " + ", ".join(changes["extensions"])]))
+        message = f"Revision {old_revision} -> {new_revision} of {content_type} '{content_item.name}': " + \
+                  (summary or "no structural changes")
+        logger.info(message)
+        return {
+            "success": True,
+            "message": message,
+            "content_type": content_type,
+            "name": content_item.name,
+            "old_revision": old_revision,
+            "new_revision": new_revision,
+            "changes": changes,
+        }
+
+    except Exception as e:
+        logger.error(f"Error comparing revisions: {str(e)}", exc_info=True)
+        return {"success": False, "message": str(e)}
@@ -1,42 +1,70 @@
 import os
 import sys
 import logging
-import requests
+
+import httpx
 from pathlib import Path
 
+from tableauserverclient import Server
+
 # Add the base_setup directory to the Python path
 base_setup_path = str(Path(__file__).parent.parent.parent / 'base_setup')
 sys.path.append(base_setup_path)
 
 from base_setup.utils.common_utils import (
     load_config,
-    get_tableau_server_and_auth,
     setup_logging
 )
+from base_setup.utils.http_client import get_http_client, site_api_url
+from base_setup.utils.session_pool import tableau_session
 
 # Setup logging
 setup_logging(os.path.join(base_setup_path, 'config', 'logging_config.yaml'))
 logger = logging.getLogger('tableau_automation')
 
 
-def slack_integration_with_webhook():
+API_VERSION = "3.10"  # Ensure your site supports this or adjust accordingly
+
+
+def _slack_webhook_url() -> str:
+    config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
+    slack_url = config.get("slack", {}).get("webhook_url")
+    if not slack_url:
+        raise ValueError("Slack webhook URL is missing in config.")
+    return slack_url
+
+
+def check_slack_connection() -> dict:
+    """
+    Post a test message straight to the configured Slack webhook; no Tableau session is involved.
+
+    Returns:
+        dict: { success: bool, message: str, status_code?: int }
+    """
     try:
-        # Load configuration
-        config = load_config(os.path.join(base_setup_path, 'config', 'config.yaml'))
-        tableau_cfg = config["tableau"]
-        slack_url = config["slack"].get("webhook_url")
+        slack_url = _slack_webhook_url()
+        response = get_http_client().post(slack_url, json={"text": "Tableau automation connectivity test"})
+        if response.is_success:
+            return {"success": True, "message": "Slack webhook is reachable.", "status_code": response.status_code}
+        return {"success": False, "message": f"Slack webhook answered HTTP {response.status_code}: {response.text}",
+                "status_code": response.status_code}
 
-        if not slack_url:
-            raise ValueError("Slack webhook URL is missing in config.")
+    except httpx.HTTPError as http_err:
+        logger.error(f"HTTP error: {http_err}", exc_info=True)
+        return {"success": False, "message": f"Slack webhook unreachable: {http_err}"}
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return {"success": False, "message": f"Error: {e}"}
 
-        # Authenticate with Tableau
-        server, auth = get_tableau_server_and_auth(config)
-        with server.auth.sign_in(auth):
-            auth_token = server.auth_token
-            site_id = server.site_id
-            api_version = "3.10"  # Ensure your site supports this or adjust accordingly
 
-            webhook_endpoint = f"{tableau_cfg['server_url']}/api/{api_version}/sites/{site_id}/webhooks"
+def slack_integration_with_webhook(server: Server = None):
+    """Register a Tableau webhook that posts to the configured Slack webhook when a workbook is created."""
+    try:
+        slack_url = _slack_webhook_url()
+
+        # Authenticate with Tableau
+        with tableau_session(server) as server:
+            webhook_endpoint = site_api_url(server, "webhooks", API_VERSION)
 
             payload = {
                 "webhook": {
@@ -51,27 +79,28 @@ def slack_integration_with_webhook():
                 }
             }
 
-            headers = {
-                "X-Tableau-Auth": auth_token,
-                "Content-Type": "application/json"
-            }
-
             # Send webhook creation request
             logger.info(f"Sending webhook creation request to {webhook_endpoint}")
-            response = requests.post(webhook_endpoint, headers=headers, json=payload)
+            response = get_http_client().post(webhook_endpoint, server=server, json=payload)
 
             if response.status_code == 201:
                 return {
                     "success": True,
                     "message": "Slack webhook integration Exists."
                 }
+            return {
+                "success": False,
+                "message": f"Creating the Tableau webhook failed with HTTP {response.status_code}: {response.text}"
+            }
 
-    except requests.HTTPError as http_err:
+    except httpx.HTTPError as http_err:
         logger.error(f"HTTP error: {http_err}", exc_info=True)
         print(f"❌ HTTP Error: {http_err}")
+        return {"success": False, "message": f"HTTP error: {http_err}"}
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
         print(f"❌ Error: {e}")
+        return {"success": False, "message": f"Error: {e}"}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+# test_backup_site.py
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import scripts.download_utils.backup_site as backup_site
+from base_setup.utils.transfer import file_sha256
+
+PREVIOUS = "20240601T100000Z"
+WATERMARK = datetime(2024, 6, 1, 9, 55, tzinfo=timezone.utc)
+BEFORE = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+AFTER = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _item(item_id: str, name: str, updated_at: datetime):
+    return SimpleNamespace(id=item_id, name=name, project_id="p-1", project_name="Finance", owner_id="u-1",
+                           content_url=name, created_at=BEFORE, updated_at=updated_at)
+
+
+class FakeSite:
+    """Lists fixed projects, users and content, and serves each item's bytes as its download."""
+
+    def __init__(self, contents: dict, workbooks: list, datasources: list = ()):
+        self.contents = contents
+        self.downloads = []
+        self.server = SimpleNamespace(projects=[SimpleNamespace(id="p-1", name="Finance", parent_id=None)],
+                                      users=[SimpleNamespace(id="u-1", name="ana@example.com")],
+                                      workbooks=list(workbooks), datasources=list(datasources))
+
+    def download(self, server, content_type, item_id, destination_stem, include_extract=True, settings=None):
+        self.downloads.append(item_id)
+        path = destination_stem + (".twbx" if content_type == "workbook" else ".tdsx")
+        Path(path).write_bytes(self.contents[item_id])
+        return {"path": path, "bytes": len(self.contents[item_id]), "sha256": file_sha256(path)}
+
+
+@pytest.fixture
+def backup_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup_site, "load_config",
+                        lambda path: {"tableau": {"backup_path": str(tmp_path), "site_id": "finance"}})
+    monkeypatch.setattr(backup_site, "transfer_settings", lambda: {})
+    monkeypatch.setattr(backup_site, "concurrent_pager", lambda endpoint, **paging: iter(endpoint))
+    return tmp_path
+
+
+def _previous_backup(site_root: Path, items: dict):
+    """Write an earlier backup of `items` (id -> (content_type, name, updated_at, bytes)) and its state."""
+    backup_dir = site_root / PREVIOUS
+    entries = []
+    for item_id, (content_type, name, updated_at, content) in items.items():
+        path = backup_dir / "content" / "Finance" / f"{name}.{'twbx' if content_type == 'workbook' else 'tdsx'}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        entries.append({"content_type": content_type, "id": item_id, "name": name, "project_path": "Finance",
+                        "updated_at": updated_at.isoformat(), "success": True, "reused": False,
+                        "path": str(path.relative_to(backup_dir)), "stored_in": PREVIOUS,
+                        "bytes": len(content), "sha256": file_sha256(str(path))})
+    (backup_dir / backup_site.MANIFEST_NAME).write_text(json.dumps({"include_extract": True, "items": entries}))
+    (site_root / backup_site.STATE_NAME).write_text(json.dumps({"last_backup": PREVIOUS,
+                                                                "watermark": WATERMARK.isoformat()}))
+
+
+def _manifest(result: dict) -> dict:
+    with open(Path(result["path"]) / backup_site.MANIFEST_NAME, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def _entries(result: dict) -> dict:
+    return {entry["id"]: entry for entry in _manifest(result)["items"]}
+
+
+def test_unchanged_compares_updated_at_and_watermark():
+    item = _item("wb-1", "Sales", BEFORE)
+    previous = {"success": True, "updated_at": BEFORE.isoformat()}
+
+    assert backup_site._unchanged(item, previous, WATERMARK)
+    assert backup_site._unchanged(item, previous, None)
+    assert not backup_site._unchanged(item, None, WATERMARK)
+    assert not backup_site._unchanged(item, dict(previous, success=False), WATERMARK)
+    assert not backup_site._unchanged(_item("wb-1", "Sales", AFTER), previous, WATERMARK)
+    # Same updated_at but not older than the watermark: it may have changed again within the same second
+    assert not backup_site._unchanged(item, previous, BEFORE)
+
+
+def test_full_backup_records_state(backup_path, monkeypatch):
+    site = FakeSite({"wb-1": b"sales v1", "ds-1": b"orders v1"},
+                    [_item("wb-1", "Sales", BEFORE)], [_item("ds-1", "Orders", BEFORE)])
+    monkeypatch.setattr(backup_site, "resumable_download", site.download)
+
+    started = datetime.now(timezone.utc)
+    result = backup_site.backup_site(server=site.server)
+
+    assert result["success"], result["message"]
+    assert (result["downloaded"], result["reused"]) == (2, 0)
+    assert sorted(site.downloads) == ["ds-1", "wb-1"]
+    assert _entries(result)["wb-1"]["path"] == os.path.join("content", "Finance", "Sales.twbx")
+    state = json.loads((backup_path / "finance" / backup_site.STATE_NAME).read_text())
+    assert state["last_backup"] == Path(result["path"]).name
+    assert datetime.fromisoformat(state["watermark"]) >= \
+        started.replace(microsecond=0) - timedelta(seconds=backup_site.CLOCK_SKEW_SECONDS)
+
+
+def test_incremental_backup_reuses_and_dedups_earlier_files(backup_path, monkeypatch):
+    site_root = backup_path / "finance"
+    _previous_backup(site_root, {"wb-1": ("workbook", "Sales", BEFORE, b"sales v1"),
+                                 "wb-2": ("workbook", "Margins", BEFORE, b"margins v1"),
+                                 "ds-1": ("datasource", "Orders", BEFORE, b"orders v1")})
+    # wb-1 is untouched, wb-2 was republished with the same bytes, ds-1 really changed
+    site = FakeSite({"wb-2": b"margins v1", "ds-1": b"orders v2"},
+                    [_item("wb-1", "Sales", BEFORE), _item("wb-2", "Margins", AFTER)],
+                    [_item("ds-1", "Orders", AFTER)])
+    monkeypatch.setattr(backup_site, "resumable_download", site.download)
+
+    result = backup_site.backup_site(incremental=True, server=site.server)
+
+    assert result["success"], result["message"]
+    assert sorted(site.downloads) == ["ds-1", "wb-2"]
+    assert (result["downloaded"], result["reused"], result["bytes"]) == (2, 1, len(b"orders v2"))
+    manifest = _manifest(result)
+    assert manifest["incremental"] and manifest["base_backup"] == PREVIOUS
+    entries = _entries(result)
+    backup_name = Path(result["path"]).name
+
+    # Unchanged: not downloaded, pointed at the earlier backup
+    assert (entries["wb-1"]["reused"], entries["wb-1"]["stored_in"]) == (True, PREVIOUS)
+    # Same sha256 as before: the fresh download is deleted and the entry points at the earlier copy
+    assert (entries["wb-2"]["reused"], entries["wb-2"]["stored_in"]) == (False, PREVIOUS)
+    assert not (Path(result["path"]) / "content" / "Finance" / "Margins.twbx").exists()
+    assert (site_root / PREVIOUS / entries["wb-2"]["path"]).read_bytes() == b"margins v1"
+    # Changed: stored in the new backup
+    assert entries["ds-1"]["stored_in"] == backup_name
+    assert (Path(result["path"]) / entries["ds-1"]["path"]).read_bytes() == b"orders v2"
+
+
+def test_incremental_backup_skips_the_base_after_extract_setting_changes(backup_path, monkeypatch):
+    _previous_backup(backup_path / "finance", {"wb-1": ("workbook", "Sales", BEFORE, b"sales v1")})
+    site = FakeSite({"wb-1": b"sales v1"}, [_item("wb-1", "Sales", BEFORE)])
+    monkeypatch.setattr(backup_site, "resumable_download", site.download)
+
+    result = backup_site.backup_site(include_extract=False, incremental=True, server=site.server)
+
+    assert site.downloads == ["wb-1"]
+    assert _entries(result)["wb-1"]["stored_in"] == Path(result["path"]).name
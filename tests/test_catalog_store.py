@@ -0,0 +1,101 @@
+# test_catalog_store.py
+
+from datetime import datetime, timezone
+
+import pytest
+import tableauserverclient as TSC
+
+import routers.tableau as tableau_router
+from base_setup.utils.catalog_store import CatalogStore
+
+UPDATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def _project(item_id: str, name: str, parent_id: str = None) -> TSC.ProjectItem:
+    project = TSC.ProjectItem(name=name, parent_id=parent_id, id=item_id)
+    project._owner_id = "user-1"
+    return project
+
+
+def _workbook(item_id: str, name: str, project: TSC.ProjectItem, owner_id: str) -> TSC.WorkbookItem:
+    workbook = TSC.WorkbookItem(project_id=project.id, name=name)
+    workbook._id = item_id
+    workbook._project_name = project.name
+    workbook.owner_id = owner_id
+    workbook._updated_at = UPDATED
+    return workbook
+
+
+@pytest.fixture
+def store(tmp_path):
+    finance, sales = _project("p-1", "Finance"), _project("p-2", "Sales", parent_id="p-1")
+    user = TSC.UserItem(name="ana@example.com", site_role="Creator")
+    user._id = "user-1"
+    store = CatalogStore(str(tmp_path / "catalog" / "site_catalog.db"))
+    store.replace_site("site-1", {
+        "project": [finance, sales],
+        "workbook": [_workbook("wb-1", "Superstore", finance, "user-1"),
+                     _workbook("wb-2", "Pipeline", sales, "user-2")],
+        "user": [user],
+    })
+    store.save_site_state("site-1", "finance-site", UPDATED, full_synced_at=100.0, synced_at=200.0)
+    return store
+
+
+def test_snapshot_round_trip(store):
+    items = store.load_items("site-1")
+
+    assert {content_type: len(entries) for content_type, entries in items.items()} == \
+        {"project": 2, "workbook": 2, "user": 1}
+    workbook = next(item for item in items["workbook"] if item.id == "wb-1")
+    assert isinstance(workbook, TSC.WorkbookItem)
+    assert (workbook.name, workbook.project_id, workbook.project_name, workbook.owner_id) == \
+        ("Superstore", "p-1", "Finance", "user-1")
+    assert workbook.updated_at == UPDATED
+    sales = next(item for item in items["project"] if item.id == "p-2")
+    assert (sales.name, sales.parent_id) == ("Sales", "p-1")
+    assert items["user"][0].site_role == "Creator"
+
+    site = store.sites()[0]
+    assert (site["site_id"], site["content_url"], site["watermark"]) == \
+        ("site-1", "finance-site", UPDATED.isoformat())
+
+
+def test_upsert_and_delete_items(store):
+    finance = _project("p-1", "Finance")
+    store.upsert_items("site-1", "workbook", [_workbook("wb-1", "Superstore v2", finance, "user-1"),
+                                              _workbook("wb-3", "Forecast", finance, "user-1")])
+    store.delete_items("site-1", "workbook", ["wb-2"])
+
+    workbooks = {item.id: item.name for item in store.load_items("site-1")["workbook"]}
+    assert workbooks == {"wb-1": "Superstore v2", "wb-3": "Forecast"}
+
+
+def test_replace_site_drops_items_no_longer_listed(store):
+    store.replace_site("site-1", {"project": [_project("p-1", "Finance")]})
+
+    assert set(store.load_items("site-1")) == {"project"}
+
+
+def test_query_filters(store):
+    assert [row["id"] for row in store.query("workbook")] == ["wb-2", "wb-1"]  # ordered by name
+    assert [row["id"] for row in store.query("workbook", name=" superstore ")] == ["wb-1"]
+    assert [row["id"] for row in store.query("workbook", project_name="sales")] == ["wb-2"]
+    assert [row["id"] for row in store.query("workbook", project_id="p-1")] == ["wb-1"]
+    assert [row["id"] for row in store.query("workbook", owner_id="user-2")] == ["wb-2"]
+    # A site matches by id or content URL
+    assert len(store.query("workbook", site="finance-site")) == len(store.query("workbook", site="site-1")) == 2
+    assert store.query("workbook", site="other-site") == []
+    assert store.query("workbook", name="Superstore")[0]["content_url"] == "finance-site"
+
+
+@pytest.mark.asyncio
+async def test_inventory_route_reads_the_snapshot(async_client, store, monkeypatch):
+    monkeypatch.setattr(tableau_router, "get_catalog_store", lambda: store)
+
+    resp = await async_client.get("/tableau/inventory", params={"content_type": "workbook", "owner_id": "user-1"})
+    assert resp.status_code == 200
+    assert [row["name"] for row in resp.json()] == ["Superstore"]
+
+    resp = await async_client.get("/tableau/inventory", params={"content_type": "flow"})
+    assert resp.status_code == 400
@@ -0,0 +1,139 @@
+# test_download_cache.py
+
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import base_setup.utils.download_cache as download_cache
+from base_setup.utils.download_cache import (IN_USE_GRACE_SECONDS, PARTIAL_MAX_AGE_SECONDS, DownloadCache, KeyLocks,
+                                             evict_lru)
+
+UPDATED = datetime(2024, 5, 1, 12, 30)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DownloadCache(str(tmp_path / "cache"), max_bytes=10_000)
+
+
+def _file(path, size: int = 100, age: float = 0):
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_key_covers_item_version_and_extract_setting(cache):
+    item = SimpleNamespace(id="wb-1", updated_at=UPDATED)
+
+    assert cache.key("workbook", item, include_extract=True) == "workbook-wb-1-20240501T123000-extract"
+    assert cache.key("workbook", item, include_extract=False) == "workbook-wb-1-20240501T123000-noextract"
+    assert cache.key("datasource", SimpleNamespace(id="ds-1", updated_at="2024-05-01T12:30:00Z"), True) == \
+        "datasource-ds-1-20240501T123000Z-extract"
+    assert cache.key("workbook", SimpleNamespace(id="wb-1", updated_at=None), True) is None
+
+
+def test_drop_other_versions_keeps_other_items_and_extract_settings(cache):
+    root = cache.root
+    keep = _file(root / "workbook-wb-1-20240501T123000-extract.twbx")
+    old = _file(root / "workbook-wb-1-20240401T080000-extract.twbx")
+    other_setting = _file(root / "workbook-wb-1-20240401T080000-noextract.twbx")
+    partial = _file(root / "workbook-wb-1-20240601T000000-extract.part")
+    other_item = _file(root / "workbook-wb-10-20240401T080000-extract.twbx")
+
+    cache._drop_other_versions("workbook", "wb-1", keep=keep)
+
+    assert not old.exists()
+    assert all(path.exists() for path in (keep, other_setting, partial, other_item))
+
+
+def test_evict_lru_removes_oldest_files_first(tmp_path):
+    oldest = _file(tmp_path / "a.twbx", age=3000)
+    older = _file(tmp_path / "b.twbx", age=2000)
+    old = _file(tmp_path / "c.twbx", age=1000)
+
+    evict_lru(tmp_path, max_bytes=150)
+
+    assert [path.exists() for path in (oldest, older, old)] == [False, False, True]
+
+
+def test_evict_lru_spares_recently_used_and_kept_files(tmp_path):
+    kept = _file(tmp_path / "kept.twbx", age=3000)
+    recent = _file(tmp_path / "recent.twbx", age=IN_USE_GRACE_SECONDS / 2)
+    old = _file(tmp_path / "old.twbx", age=1000)
+
+    evict_lru(tmp_path, max_bytes=0, keep=kept)
+
+    # Over the limit either way: only the file outside the grace period and not kept goes
+    assert [path.exists() for path in (kept, recent, old)] == [True, True, False]
+
+
+def test_evict_lru_cleans_up_abandoned_partials_only(tmp_path):
+    abandoned = _file(tmp_path / "abandoned.part", size=1000, age=PARTIAL_MAX_AGE_SECONDS + 60)
+    in_progress = _file(tmp_path / "in_progress.part", size=1000, age=60)
+    cached = _file(tmp_path / "cached.twbx", age=1000)
+
+    evict_lru(tmp_path, max_bytes=100)
+
+    # A partial download neither counts towards the size nor is evicted while it may still resume
+    assert [path.exists() for path in (abandoned, in_progress, cached)] == [False, True, True]
+
+
+def test_key_locks_only_block_the_same_key():
+    locks = KeyLocks()
+    holding, release, waited = threading.Event(), threading.Event(), threading.Event()
+
+    def hold(key):
+        with locks(key):
+            holding.set()
+            release.wait(5)
+
+    def wait_for(key):
+        with locks(key):
+            waited.set()
+
+    holder = threading.Thread(target=hold, args=("workbook-wb-1",))
+    holder.start()
+    holding.wait(5)
+    with locks("workbook-wb-2"):
+        pass  # another key does not wait
+    waiter = threading.Thread(target=wait_for, args=("workbook-wb-1",))
+    waiter.start()
+    assert not waited.wait(0.1)
+    release.set()
+    assert waited.wait(5)
+    holder.join(5)
+    waiter.join(5)
+
+    assert locks._in_use == {}
+
+
+def test_concurrent_fetches_of_one_key_download_once(cache, monkeypatch):
+    downloads = []
+
+    def fake_download(server, content_type, item_id, destination_stem, include_extract, **kwargs):
+        downloads.append(item_id)
+        time.sleep(0.05)
+        path = destination_stem + ".twbx"
+        _file(Path(path))
+        return {"path": path, "bytes": 100, "sha256": "0" * 64, "bytes_per_second": None}
+
+    monkeypatch.setattr(download_cache, "resumable_download", fake_download)
+    monkeypatch.setattr(download_cache, "report_progress", lambda message: None)
+    item = SimpleNamespace(id="wb-1", name="Superstore", updated_at=UPDATED)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.fetch(None, "workbook", item, verify=False)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert downloads == ["wb-1"]
+    assert sorted(from_cache for _, from_cache in results) == [False, True, True]
+    assert len({path for path, _ in results}) == 1
@@ -0,0 +1,58 @@
+# test_executors.py
+
+import threading
+import time
+
+import pytest
+
+import base_setup.utils.executors as executors
+from base_setup.utils.executors import BoundedExecutor, ExecutorBusyError
+
+
+@pytest.fixture
+def busy_executor():
+    """An executor with every worker and queue slot taken until the test ends."""
+    release = threading.Event()
+    executor = BoundedExecutor("test", max_workers=2, max_queue=3)
+    futures = [executor.submit(release.wait) for _ in range(executor.max_workers + executor.max_queue)]
+    yield executor
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    executor.shutdown(wait=True)
+
+
+def test_submit_beyond_capacity_is_rejected(busy_executor):
+    assert busy_executor.pending == busy_executor.max_workers + busy_executor.max_queue
+    with pytest.raises(ExecutorBusyError):
+        busy_executor.submit(lambda: None)
+
+
+def _wait_idle(executor: BoundedExecutor, timeout: float = 5):
+    # Slots are released by done callbacks, which may still run after result() returns
+    deadline = time.monotonic() + timeout
+    while executor.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_slots_are_released_when_calls_finish():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    try:
+        for _ in range(5):
+            futures = [executor.submit(lambda: "done") for _ in range(2)]
+            assert [future.result(timeout=5) for future in futures] == ["done", "done"]
+            _wait_idle(executor)
+            assert executor.pending == 0
+    finally:
+        executor.shutdown(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_busy_operation_class_answers_503(async_client, busy_executor, monkeypatch):
+    monkeypatch.setitem(executors._executors, "audit", busy_executor)
+
+    resp = await async_client.post("/tableau/audit_sites", json={"site_names": ["default"]})
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "5"
+    assert "Too many test operations" in resp.json()["detail"]
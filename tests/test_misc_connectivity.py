@@ -40,6 +40,21 @@ async def test_audit_sites(async_client):
     assert resp.status_code == 200
 
 
+@pytest.mark.asyncio
+async def test_audit_multiple_sites(async_client):
+    resp = await async_client.post("/tableau/audit_sites", json={
+        "site_names": ["nitidev"],
+    })
+    log_section("Audit Multiple Sites", {
+        "📡 Status Code": resp.status_code,
+        "✅ Success": resp.json().get("success"),
+        "🏢 Site Count": resp.json().get("site_count"),
+        "⏱️ Elapsed": resp.json().get("elapsed_seconds")
+    })
+    assert resp.status_code == 200
+    assert resp.json().get("site_count") == 1
+
+
 @pytest.mark.asyncio
 async def test_validate_personal_spaces(async_client):
     resp = await async_client.get("/tableau/personal_spaces")
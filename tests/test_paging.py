@@ -0,0 +1,108 @@
+# test_paging.py
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+import tableauserverclient as TSC
+
+import base_setup.utils.session_pool as session_pool
+from base_setup.utils.paging import concurrent_pager, count_items
+from base_setup.utils.session_pool import TableauSession, TableauSessionPool
+
+
+class FakeEndpoint:
+    """Serves `total` numbered items page by page, recording each request."""
+
+    def __init__(self, total: int, parent_srv=None):
+        self.parent_srv = parent_srv
+        self.items = list(range(total))
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, options: TSC.RequestOptions):
+        with self._lock:
+            self.requests.append((options.pagenumber, options.pagesize, list(options.filter)))
+        start = (options.pagenumber - 1) * options.pagesize
+        return self.items[start:start + options.pagesize], SimpleNamespace(total_available=len(self.items))
+
+
+@pytest.mark.parametrize("total, page_size, pages", [
+    (0, 10, 1),  # empty result
+    (3, 10, 1),  # smaller than one page
+    (10, 10, 1),  # exactly one full page
+    (25, 10, 3),  # last page not full
+    (30, 10, 3),  # last page full
+])
+def test_concurrent_pager_yields_every_item_once(total, page_size, pages):
+    endpoint = FakeEndpoint(total)
+
+    items = list(concurrent_pager(endpoint, page_size=page_size, max_workers=2))
+
+    assert sorted(items) == list(range(total))
+    assert sorted(number for number, _, _ in endpoint.requests) == list(range(1, pages + 1))
+    assert {size for _, size, _ in endpoint.requests} == {page_size}
+
+
+def test_concurrent_pager_applies_request_options_to_every_page():
+    endpoint = FakeEndpoint(25)
+    options = TSC.RequestOptions()
+    options.filter.add(TSC.Filter(TSC.RequestOptions.Field.Name, TSC.RequestOptions.Operator.Equals, "Sales"))
+
+    list(concurrent_pager(endpoint, options, page_size=10))
+
+    assert all(len(filters) == 1 for _, _, filters in endpoint.requests)
+    # The caller's options are copied, not changed
+    assert options.pagenumber == 1
+
+
+def test_concurrent_pager_stops_when_the_caller_does():
+    endpoint = FakeEndpoint(5)
+
+    assert next(iter(concurrent_pager(endpoint, page_size=2, max_workers=1))) == 0
+    assert [number for number, _, _ in endpoint.requests] == [1]
+
+
+class FakeServer:
+    """A signed-in server whose `workbooks` endpoint serves `total` items."""
+
+    def __init__(self, total: int):
+        self.workbooks = FakeEndpoint(total, parent_srv=self)
+        self.auth = SimpleNamespace(sign_in=lambda auth: None, sign_out=lambda: None)
+
+    def is_signed_in(self):
+        return True
+
+
+class FakePool(TableauSessionPool):
+    def __init__(self, total: int, max_size: int):
+        super().__init__({"tableau": {"site_id": "site-1"}}, max_size=max_size, checkout_timeout=0.2)
+        self.total = total
+
+    def _new_session(self) -> TableauSession:
+        return TableauSession(FakeServer(self.total), SimpleNamespace(site_id=self.site_id))
+
+
+@pytest.mark.parametrize("max_size, workers", [(4, 3), (2, 1), (1, 0)])
+def test_concurrent_pager_reads_pages_on_lent_sessions(monkeypatch, max_size, workers):
+    pool = FakePool(95, max_size)
+    monkeypatch.setitem(session_pool._pools, "site-1", pool)
+
+    with pool.acquire() as server:
+        assert sorted(concurrent_pager(server.workbooks, page_size=10, max_workers=3)) == list(range(95))
+        lent = [session.server for session in pool._idle]
+
+    # Pages after the first go to the lent sessions only; with none free the caller's session reads them all
+    assert len(lent) == workers
+    assert [number for number, _, _ in server.workbooks.requests] == ([1] if workers else list(range(1, 11)))
+    assert sorted(number for other in lent for number, _, _ in other.workbooks.requests) == \
+        (list(range(2, 11)) if workers else [])
+    pool.close()
+
+
+@pytest.mark.parametrize("total", [0, 1, 2500])
+def test_count_items_uses_one_small_request(total):
+    endpoint = FakeEndpoint(total)
+
+    assert count_items(endpoint) == total
+    assert [(number, size) for number, size, _ in endpoint.requests] == [(1, 1)]
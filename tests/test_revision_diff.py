@@ -0,0 +1,117 @@
+# test_revision_diff.py
+
+from types import SimpleNamespace
+
+import scripts.revision_history.get_revision_history as revision_history
+from base_setup.utils.twb_analyzer import diff_summaries
+
+OLD_SUMMARY = {
+    "extensions": {"tabpy": False, "einstein": False, "viz_ext": True},
+    "connections": [{"class": "postgres", "server": "db-old.example.com", "dbname": "sales"},
+                    {"class": "excel-direct", "filename": "targets.xlsx"}],
+    "calculated_fields": [{"datasource": "Sales", "name": "Profit Ratio", "field": "[Calculation_1]",
+                           "formula": "SUM([Profit]) / SUM([Sales])"},
+                          {"datasource": "Sales", "name": "Margin", "field": "[Calculation_2]",
+                           "formula": "[Profit] / [Sales]"}],
+    "parameters": [{"name": "Top N", "datatype": "integer", "value": "10"}],
+    "worksheets": ["Overview", "Details"],
+    "dashboards": ["Summary"],
+    "counts": {"worksheets": 2},
+}
+
+NEW_SUMMARY = {
+    "extensions": {"tabpy": True, "einstein": False, "viz_ext": True},
+    "connections": [{"class": "postgres", "server": "db-new.example.com", "dbname": "sales"}],
+    "calculated_fields": [{"datasource": "Sales", "name": "Profit Ratio", "field": "[Calculation_1]",
+                           "formula": "ZN(SUM([Profit])) / SUM([Sales])"},
+                          {"datasource": "Sales", "name": "Discount Rate", "field": "[Calculation_3]",
+                           "formula": "AVG([Discount])"}],
+    "parameters": [{"name": "Top N", "datatype": "integer", "value": "10"}],
+    "worksheets": ["Overview", "Trend"],
+    "dashboards": ["Summary"],
+    "counts": {"worksheets": 2},
+}
+
+
+def test_diff_summaries_reports_added_removed_and_changed():
+    changes = diff_summaries(OLD_SUMMARY, NEW_SUMMARY)
+
+    assert set(changes) == {"extensions", "connections", "calculated_fields", "worksheets"}
+    assert changes["extensions"] == {"tabpy": {"old": False, "new": True}}
+    assert changes["worksheets"] == {"added": ["Trend"], "removed": ["Details"], "changed": []}
+    assert changes["connections"] == {
+        "added": [],
+        "removed": [{"class": "excel-direct", "filename": "targets.xlsx"}],
+        "changed": [{"old": OLD_SUMMARY["connections"][0], "new": NEW_SUMMARY["connections"][0]}],
+    }
+    fields = changes["calculated_fields"]
+    assert [entry["name"] for entry in fields["added"]] == ["Discount Rate"]
+    assert [entry["name"] for entry in fields["removed"]] == ["Margin"]
+    assert [(entry["old"]["formula"], entry["new"]["formula"]) for entry in fields["changed"]] == \
+        [("SUM([Profit]) / SUM([Sales])", "ZN(SUM([Profit])) / SUM([Sales])")]
+
+
+def test_diff_summaries_identical_and_missing_sections():
+    assert diff_summaries(OLD_SUMMARY, OLD_SUMMARY) == {}
+    # Sections only one side has, and the counts, are not compared
+    assert diff_summaries({"worksheets": ["A"]}, {"worksheets": ["A"], "fonts": ["Arial"],
+                                                  "counts": {"worksheets": 1}}) == {}
+
+
+class FakeWorkbooks:
+    def __init__(self, revisions):
+        self.item = SimpleNamespace(id="wb-1", name="Superstore", revisions=[])
+        self._revisions = revisions
+
+    def get_by_id(self, item_id):
+        return self.item
+
+    def populate_revisions(self, item):
+        item.revisions = self._revisions
+
+
+def _revision(number: str, current: bool = False, deleted: bool = False):
+    return SimpleNamespace(revision_number=number, current=current, deleted=deleted)
+
+
+def _fake_server(monkeypatch, revisions):
+    server = SimpleNamespace(workbooks=FakeWorkbooks(revisions))
+    summaries = {"rev-1": OLD_SUMMARY, "rev-2": OLD_SUMMARY, "rev-3": NEW_SUMMARY}
+    monkeypatch.setattr(revision_history, "_find_content_item",
+                        lambda server, content_type, name, project: (server.workbooks.item, ""))
+    monkeypatch.setattr(revision_history, "_revision_file",
+                        lambda server, content_type, item, revision, current: f"rev-{revision}")
+    monkeypatch.setattr(revision_history, "analyze_twb", lambda path, sections: summaries[path])
+    return server
+
+
+def test_diff_revisions_compares_latest_with_previous(monkeypatch):
+    server = _fake_server(monkeypatch, [_revision("1"), _revision("3", current=True), _revision("2")])
+
+    result = revision_history.diff_revisions("workbook", "Superstore", server=server)
+
+    assert result["success"]
+    assert (result["old_revision"], result["new_revision"]) == ("2", "3")
+    assert result["changes"] == diff_summaries(OLD_SUMMARY, NEW_SUMMARY)
+    assert "worksheets 1 added / 1 removed" in result["message"]
+    assert "extension usage tabpy" in result["message"]
+
+
+def test_diff_revisions_without_changes(monkeypatch):
+    server = _fake_server(monkeypatch, [_revision("1"), _revision("2", current=True)])
+
+    result = revision_history.diff_revisions("workbook", "Superstore", old_revision="1", new_revision="2",
+                                             server=server)
+
+    assert result["success"]
+    assert result["changes"] == {}
+    assert result["message"].endswith("no structural changes")
+
+
+def test_diff_revisions_needs_two_revisions(monkeypatch):
+    server = _fake_server(monkeypatch, [_revision("1", current=True), _revision("2", deleted=True)])
+
+    result = revision_history.diff_revisions("workbook", "Superstore", server=server)
+
+    assert not result["success"]
+    assert "only 1 revision(s)" in result["message"]
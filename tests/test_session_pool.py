@@ -0,0 +1,210 @@
+# test_session_pool.py
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from tableauserverclient.server.endpoint.exceptions import ServerResponseError
+
+import base_setup.utils.session_pool as session_pool
+from base_setup.utils.session_pool import (SessionPoolTimeoutError, TableauSession, TableauSessionPool,
+                                           mark_session_stale, worker_sessions)
+
+CONFIG = {"tableau": {"site_id": "site-1"}}
+
+
+class FakeAuth:
+    """Stands in for `server.auth`, counting sign-ins instead of calling Tableau."""
+
+    def __init__(self, server):
+        self.server = server
+        self.sign_ins = 0
+
+    def sign_in(self, auth):
+        self.sign_ins += 1
+        self.server.signed_in = True
+
+    def sign_out(self):
+        self.server.signed_in = False
+
+
+class FakeServer:
+    def __init__(self):
+        self.signed_in = False
+        self.auth = FakeAuth(self)
+
+    def is_signed_in(self):
+        return self.signed_in
+
+
+class FakePool(TableauSessionPool):
+    def _new_session(self) -> TableauSession:
+        return TableauSession(FakeServer(), SimpleNamespace(site_id=self.site_id))
+
+
+def _unauthorized() -> ServerResponseError:
+    return ServerResponseError("401002", "Unauthorized Access", "Invalid authentication credentials")
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A two-session pool registered like the shared ones, so `pool_for` and friends find it."""
+    pool = FakePool(CONFIG, max_size=2, checkout_timeout=0.2)
+    monkeypatch.setitem(session_pool._pools, "site-1", pool)
+    yield pool
+    pool.close()
+
+
+def test_sessions_are_signed_in_once_and_reused(pool):
+    with pool.acquire() as first:
+        assert first.is_signed_in()
+    with pool.acquire() as second:
+        assert second is first
+
+    assert first.auth.sign_ins == 1
+
+
+def test_checkout_times_out_when_every_session_is_leased(pool):
+    with pool.acquire(), pool.acquire():
+        started = time.monotonic()
+        with pytest.raises(SessionPoolTimeoutError, match="All 2 Tableau sessions"):
+            with pool.acquire():
+                pass
+        assert time.monotonic() - started >= 0.2
+        with pytest.raises(SessionPoolTimeoutError):
+            with pool.acquire(timeout=0):
+                pass
+
+
+def test_checkout_waits_for_a_released_session(pool):
+    pool.checkout_timeout = 5
+    release = threading.Event()
+
+    def hold():
+        with pool.acquire():
+            release.wait()
+
+    holders = [threading.Thread(target=hold) for _ in range(pool.max_size)]
+    for holder in holders:
+        holder.start()
+    while pool._created < pool.max_size:
+        time.sleep(0.01)
+    threading.Timer(0.1, release.set).start()
+
+    with pool.acquire() as server:
+        assert server.is_signed_in()
+    for holder in holders:
+        holder.join(timeout=5)
+
+
+def test_expired_session_signs_in_again(pool):
+    with pool.acquire() as server:
+        pass
+    pool._idle[0].signed_in_at -= pool.ttl_seconds
+
+    with pool.acquire() as again:
+        assert again is server
+    assert server.auth.sign_ins == 2
+
+
+def test_stale_session_signs_in_again(pool):
+    with pool.acquire() as server:
+        mark_session_stale(server)
+        assert pool.is_stale(server)
+    with pool.acquire():
+        assert not pool.is_stale(server)
+    assert server.auth.sign_ins == 2
+
+    # A 401 raised inside the block marks the session too
+    with pytest.raises(ServerResponseError):
+        with pool.acquire():
+            raise _unauthorized()
+    with pool.acquire():
+        pass
+    assert server.auth.sign_ins == 3
+
+
+def test_run_retries_once_after_an_auth_error(pool):
+    calls = []
+
+    def flaky(server=None):
+        calls.append(server.auth.sign_ins)
+        if len(calls) == 1:
+            raise _unauthorized()
+        return {"success": True}
+
+    assert pool.run(flaky) == {"success": True}
+    assert calls == [1, 2]
+
+
+def test_run_retries_once_when_the_session_went_stale(pool):
+    calls = []
+
+    def reports_failure(server=None):
+        # Script functions catch the 401 and mark the session instead of raising
+        calls.append(server)
+        mark_session_stale(server)
+        return {"success": False, "message": "401002: Unauthorized Access"}
+
+    assert pool.run(reports_failure)["success"] is False
+    assert len(calls) == 2
+
+
+def test_run_does_not_retry_twice(pool):
+    calls = []
+
+    def always_unauthorized(server=None):
+        calls.append(server)
+        raise _unauthorized()
+
+    with pytest.raises(ServerResponseError):
+        pool.run(always_unauthorized)
+    assert len(calls) == 2
+
+    with pytest.raises(ValueError):
+        pool.run(lambda server=None: calls.append(server) or int("x"))
+    assert len(calls) == 3
+
+
+def test_worker_sessions_lend_only_free_sessions(pool):
+    pool.max_size = 3
+    with pool.acquire() as server:
+        with worker_sessions(server, wanted=5) as workers:
+            assert workers.count == 2
+            with workers.session() as first, workers.session() as second:
+                assert len({id(server), id(first), id(second)}) == 3
+                assert pool.owns(first) and pool.owns(second)
+            # Nothing is left to lend while the first lender holds the rest of the pool
+            with worker_sessions(server, wanted=1) as more:
+                assert more.count == 0
+                with more.session() as own:
+                    assert own is server
+        assert not pool.owns(first)
+
+
+def test_worker_sessions_invalidate_on_auth_error(pool):
+    with pool.acquire() as server, worker_sessions(server, wanted=1) as workers:
+        with pytest.raises(ServerResponseError):
+            with workers.session() as worker:
+                raise _unauthorized()
+        assert pool.is_stale(worker)
+
+
+def test_worker_sessions_lend_nothing_for_a_server_outside_the_pools(pool):
+    outside = FakeServer()
+    with worker_sessions(outside, wanted=2) as workers:
+        assert workers.count == 0
+        with workers.session() as worker:
+            assert worker is outside
+
+
+@pytest.mark.asyncio
+async def test_acquire_async_leases_and_releases(pool):
+    async with pool.acquire_async() as server:
+        assert server.is_signed_in()
+        assert pool.owns(server)
+    assert not pool.owns(server)
+
+    async with session_pool.async_tableau_session(site_id="site-1") as pooled:
+        assert pooled is server
@@ -0,0 +1,50 @@
+# test_slack_connectivity.py
+
+from types import SimpleNamespace
+
+import pytest
+
+import scripts.site_monitoring.slack_connectivity as slack_connectivity
+
+
+class FakeHttpClient:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.posts = []
+
+    def post(self, url, **kwargs):
+        self.posts.append((url, kwargs))
+        return SimpleNamespace(status_code=self.status_code, is_success=200 <= self.status_code < 300,
+                               text="no_service" if self.status_code >= 400 else "ok")
+
+
+@pytest.fixture
+def slack(monkeypatch):
+    def answer(status_code: int) -> FakeHttpClient:
+        client = FakeHttpClient(status_code)
+        monkeypatch.setattr(slack_connectivity, "get_http_client", lambda: client)
+        monkeypatch.setattr(slack_connectivity, "_slack_webhook_url", lambda: "https://hooks.slack.com/services/T/B/X")
+        return client
+    return answer
+
+
+@pytest.mark.asyncio
+async def test_slack_connection_posts_to_slack_only(async_client, slack):
+    client = slack(200)
+
+    resp = await async_client.get("/tableau/slack_connection")
+
+    assert resp.status_code == 200
+    assert resp.json()["success"]
+    assert [url for url, _ in client.posts] == ["https://hooks.slack.com/services/T/B/X"]
+    assert "server" not in client.posts[0][1]
+
+
+@pytest.mark.asyncio
+async def test_failed_slack_post_is_an_http_error(async_client, slack):
+    slack(404)
+
+    resp = await async_client.get("/tableau/slack_connection")
+
+    assert resp.status_code == 502
+    assert "HTTP 404: no_service" in resp.json()["detail"]
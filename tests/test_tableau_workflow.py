@@ -1,5 +1,6 @@
 # test_tableau_workflow.py
 
+import asyncio
 import os
 import time
 import pytest
@@ -157,6 +158,35 @@ async def test_download_content(async_client, test_projects):
     assert os.path.exists(data.get("download_path"))
 
 
+@pytest.mark.asyncio
+async def test_download_content_background(async_client, test_projects):
+    project = test_projects["download"]
+    await copy_workbook(async_client, project)
+    resp = await async_client.post("/tableau/download_content", params={"background": True}, json={
+        "content_type": "workbook",
+        "content_name": TEST_WORKBOOK,
+        "project_name": project
+    })
+    assert resp.status_code == 202
+    job_id = resp.json()["job_id"]
+
+    # Sleep without blocking the event loop the app and its job updates run on
+    deadline = time.monotonic() + 60
+    job = (await async_client.get(f"/tableau/jobs/{job_id}")).json()
+    while job["status"] not in ("succeeded", "failed") and time.monotonic() < deadline:
+        await asyncio.sleep(1)
+        job = (await async_client.get(f"/tableau/jobs/{job_id}")).json()
+    log_section("Download Workbook Job", {
+        "🆔 Job": job_id,
+        "📡 Status": job.get("status"),
+        "📦 Bytes": job.get("bytes_transferred"),
+        "📎 Path": (job.get("result") or {}).get("download_path", "")
+    })
+    assert job["status"] == "succeeded"
+    assert job["bytes_transferred"] > 0
+    assert os.path.exists(job["result"]["download_path"])
+
+
 @pytest.mark.asyncio
 async def test_delete_content(async_client, test_projects):
     project = test_projects["delete"]
@@ -0,0 +1,180 @@
+# test_transfer.py
+
+import io
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+import requests
+from tableauserverclient.server.endpoint.exceptions import InternalServerError, NonXMLResponseError, ServerResponseError
+
+import base_setup.utils.transfer as transfer
+from base_setup.utils.transfer import DownloadIncompleteError, PARTIAL_SUFFIX, file_sha256, resumable_download
+
+SETTINGS = {"download_chunk_bytes": 64, "download_retries": 2, "verify_downloads": True}
+
+
+def _packaged_workbook() -> bytes:
+    buffer = io.BytesIO()
+    # Stored uncompressed so a flipped byte corrupts the member, not the archive structure
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr("Superstore.twb", "<workbook>" + "x" * 500 + "</workbook>")
+    return buffer.getvalue()
+
+
+CONTENT = _packaged_workbook()
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, status_code: int = 200, headers: dict = None, fail_after: int = None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {"Content-Disposition": 'attachment; filename="Superstore.twbx"', **(headers or {})}
+        self.fail_after = fail_after
+
+    def iter_content(self, chunk_size: int):
+        for start in range(0, len(self.body), chunk_size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise requests.ConnectionError("connection reset")
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def full_response(body: bytes = CONTENT, **kwargs) -> FakeResponse:
+    return FakeResponse(body, headers={"Content-Length": str(len(body))}, **kwargs)
+
+
+def range_response(offset: int, body: bytes = CONTENT) -> FakeResponse:
+    return FakeResponse(body[offset:], status_code=206,
+                        headers={"Content-Range": f"bytes {offset}-{len(body) - 1}/{len(body)}"})
+
+
+class FakeWorkbooks:
+    """Answers `get_request` with the next scripted response and records the Range headers sent."""
+
+    baseurl = "https://tableau.example.com/api/3.26/sites/site-id/workbooks"
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.ranges = []
+
+    def get_request(self, url, parameters=None):
+        self.ranges.append((parameters.get("headers") or {}).get("Range"))
+        response = self.responses.pop(0)
+        if callable(response):
+            response = response(self.ranges[-1])
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(transfer.time, "sleep", lambda seconds: None)
+
+
+def _download(tmp_path, workbooks: FakeWorkbooks) -> dict:
+    server = SimpleNamespace(workbooks=workbooks)
+    return resumable_download(server, "workbook", "wb-1", str(tmp_path / "Superstore"), settings=SETTINGS)
+
+
+def test_download_completes_and_verifies(tmp_path):
+    result = _download(tmp_path, FakeWorkbooks(full_response()))
+
+    assert result["path"] == str(tmp_path / "Superstore.twbx")
+    assert result["bytes"] == result["transferred_bytes"] == len(CONTENT)
+    assert result["sha256"] == file_sha256(result["path"])
+    assert not os.path.exists(str(tmp_path / "Superstore") + PARTIAL_SUFFIX)
+
+
+def test_interrupted_download_resumes_with_range(tmp_path):
+    workbooks = FakeWorkbooks(full_response(fail_after=128), lambda _range: range_response(128))
+
+    result = _download(tmp_path, workbooks)
+
+    assert workbooks.ranges == [None, "bytes=128-"]
+    assert result["bytes"] == len(CONTENT)
+    assert result["transferred_bytes"] == len(CONTENT)
+    with open(result["path"], "rb") as downloaded:
+        assert downloaded.read() == CONTENT
+
+
+def test_partial_file_from_earlier_call_is_resumed(tmp_path):
+    (tmp_path / ("Superstore" + PARTIAL_SUFFIX)).write_bytes(CONTENT[:200])
+    workbooks = FakeWorkbooks(range_response(200))
+
+    result = _download(tmp_path, workbooks)
+
+    assert workbooks.ranges == ["bytes=200-"]
+    assert result["transferred_bytes"] == len(CONTENT) - 200
+    assert result["bytes"] == len(CONTENT)
+
+
+def test_ignored_range_restarts_from_zero(tmp_path):
+    (tmp_path / ("Superstore" + PARTIAL_SUFFIX)).write_bytes(b"stale bytes")
+
+    result = _download(tmp_path, FakeWorkbooks(full_response()))
+
+    with open(result["path"], "rb") as downloaded:
+        assert downloaded.read() == CONTENT
+
+
+def test_416_discards_partial_and_starts_over(tmp_path):
+    (tmp_path / ("Superstore" + PARTIAL_SUFFIX)).write_bytes(b"x" * (len(CONTENT) + 10))
+    workbooks = FakeWorkbooks(ServerResponseError("416000", "Range Not Satisfiable", "bad range"), full_response())
+
+    result = _download(tmp_path, workbooks)
+
+    assert workbooks.ranges == [f"bytes={len(CONTENT) + 10}-", None]
+    with open(result["path"], "rb") as downloaded:
+        assert downloaded.read() == CONTENT
+
+
+def test_server_error_is_retried_and_resumes(tmp_path):
+    unavailable = InternalServerError(SimpleNamespace(status_code=503, content=b"Service Unavailable"))
+    workbooks = FakeWorkbooks(full_response(fail_after=128), unavailable, lambda _range: range_response(128))
+
+    result = _download(tmp_path, workbooks)
+
+    # The 503 keeps the partial file, so the next attempt still resumes
+    assert workbooks.ranges == [None, "bytes=128-", "bytes=128-"]
+    with open(result["path"], "rb") as downloaded:
+        assert downloaded.read() == CONTENT
+
+
+def test_non_xml_416_from_a_proxy_starts_over(tmp_path):
+    (tmp_path / ("Superstore" + PARTIAL_SUFFIX)).write_bytes(b"x" * (len(CONTENT) + 10))
+    refused = NonXMLResponseError(b"<html><body>416 Requested Range Not Satisfiable</body></html>")
+    workbooks = FakeWorkbooks(refused, full_response())
+
+    result = _download(tmp_path, workbooks)
+
+    assert workbooks.ranges == [f"bytes={len(CONTENT) + 10}-", None]
+    with open(result["path"], "rb") as downloaded:
+        assert downloaded.read() == CONTENT
+
+
+def test_crc_mismatch_is_downloaded_again(tmp_path):
+    corrupt = bytearray(CONTENT)
+    corrupt[CONTENT.index(b"xxxx")] ^= 0xFF
+    workbooks = FakeWorkbooks(full_response(bytes(corrupt)), full_response())
+
+    result = _download(tmp_path, workbooks)
+
+    # The corrupt copy is discarded, not resumed
+    assert workbooks.ranges == [None, None]
+    with open(result["path"], "rb") as downloaded:
+        assert downloaded.read() == CONTENT
+
+
+def test_crc_mismatch_on_every_attempt_fails(tmp_path):
+    corrupt = bytearray(CONTENT)
+    corrupt[CONTENT.index(b"xxxx")] ^= 0xFF
+    workbooks = FakeWorkbooks(*(full_response(bytes(corrupt)) for _ in range(SETTINGS["download_retries"] + 1)))
+
+    with pytest.raises(DownloadIncompleteError, match="CRC check failed"):
+        _download(tmp_path, workbooks)
+    assert not os.path.exists(str(tmp_path / "Superstore") + PARTIAL_SUFFIX)
@@ -0,0 +1,149 @@
+# test_twb_analyzer.py
+
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from base_setup.utils.twb_analyzer import analyze_twb
+
+WORKBOOK_XML = """<?xml version='1.0' encoding='utf-8' ?>
+<workbook xmlns:user="http://www.tableausoftware.com/xml/user">
+  <datasources>
+    <datasource name="Parameters">
+      <column caption="Top N" name="[Parameter 1]" datatype="integer" param-domain-type="range" value="10">
+        <calculation class="tableau" formula="10" />
+      </column>
+    </datasource>
+    <datasource caption="Sales" name="federated.sales">
+      <connection class="federated">
+        <named-connections>
+          <named-connection name="postgres.1">
+            <connection class="postgres" server="db.example.com" dbname="sales" />
+          </named-connection>
+        </named-connections>
+        <relation name="Custom SQL Query" type="text">SELECT * FROM orders</relation>
+      </connection>
+      <column caption="Profit Ratio" name="[Calculation_1]" datatype="real">
+        <calculation class="tableau" formula="SUM([Profit]) / SUM([Sales])" />
+      </column>
+      <column name="[Region]" datatype="string" />
+    </datasource>
+  </datasources>
+  <worksheets>
+    <worksheet name="Overview">
+      <table>
+        <view>
+          <datasources>
+            <datasource caption="Sales" name="federated.sales" />
+          </datasources>
+        </view>
+        <style>
+          <style-rule element="title">
+            <format attr="font-family" value="Tableau Book" />
+          </style-rule>
+        </style>
+      </table>
+      <script url="http://tabpy.example.com:9004" />
+    </worksheet>
+  </worksheets>
+  <dashboards>
+    <dashboard name="Summary">
+      <zones>
+        <zone name="logo" type-v2="bitmap" param="Image/logo.png" />
+        <zone name="extension" type-v2="dashboard-object">
+          <dashboard-extension url="https://example.com/ext.trex" />
+        </zone>
+      </zones>
+    </dashboard>
+    <dashboard name="Story" type="storyboard" />
+  </dashboards>
+</workbook>
+"""
+
+# Extensions come first, followed by XML that fails to parse
+EARLY_EXTENSIONS_XML = """<?xml version='1.0' encoding='utf-8' ?>
+<workbook>
+  <worksheets>
+    <worksheet name="Forecast">
+      <script url="http://tabpy.example.com:9004" />
+      <extension url="https://einstein.example.com/discovery" />
+    </worksheet>
+  </worksheets>
+  <broken attr="unterminated>
+</workbook>
+"""
+
+
+@pytest.fixture
+def twb_path(tmp_path):
+    path = tmp_path / "Superstore.twb"
+    path.write_text(WORKBOOK_XML, encoding="utf-8")
+    return str(path)
+
+
+def test_analyze_twb_summary(twb_path):
+    summary = analyze_twb(twb_path)
+
+    assert summary["extensions"] == {"tabpy": True, "einstein": False, "viz_ext": True}
+    assert summary["datasources"] == ["Sales"]
+    assert summary["connections"] == [{"class": "postgres", "server": "db.example.com", "dbname": "sales"}]
+    assert summary["custom_sql"] == [{"datasource": "Sales", "name": "Custom SQL Query",
+                                      "query": "SELECT * FROM orders"}]
+    assert summary["calculated_fields"] == [{"datasource": "Sales", "name": "Profit Ratio",
+                                             "field": "[Calculation_1]",
+                                             "formula": "SUM([Profit]) / SUM([Sales])"}]
+    assert summary["parameters"] == [{"name": "Top N", "datatype": "integer", "value": "10"}]
+    assert summary["worksheets"] == ["Overview"]
+    assert summary["dashboards"] == ["Summary"]
+    assert summary["stories"] == ["Story"]
+    assert summary["fonts"] == ["Tableau Book"]
+    assert summary["images"] == ["Image/logo.png"]
+    assert summary["counts"]["worksheets"] == 1
+
+
+def test_analyze_twbx_reads_top_level_workbook(tmp_path):
+    packaged = tmp_path / "Superstore.twbx"
+    with zipfile.ZipFile(packaged, "w") as archive:
+        archive.writestr("Data/Nested/Other.twb", "<workbook />")
+        archive.writestr("Superstore.twb", WORKBOOK_XML)
+        archive.writestr("Data/extract.hyper", b"\x00" * 16)
+
+    summary = analyze_twb(str(packaged), sections=("sheets",))
+
+    assert summary["worksheets"] == ["Overview"]
+    assert set(summary) == {"worksheets", "dashboards", "stories", "counts"}
+
+
+def test_analyze_twbx_without_workbook(tmp_path):
+    packaged = tmp_path / "empty.twbx"
+    with zipfile.ZipFile(packaged, "w") as archive:
+        archive.writestr("Data/extract.hyper", b"\x00" * 16)
+
+    with pytest.raises(FileNotFoundError):
+        analyze_twb(str(packaged))
+
+
+def test_extension_scan_stops_once_everything_is_found(tmp_path):
+    path = tmp_path / "early.twb"
+    path.write_text(EARLY_EXTENSIONS_XML, encoding="utf-8")
+
+    # Parsing ends before the malformed element is reached
+    assert analyze_twb(str(path), sections=("extensions",))["extensions"] == \
+        {"tabpy": True, "einstein": True, "viz_ext": True}
+    # A full summary has to read on and hits it
+    with pytest.raises(ET.ParseError):
+        analyze_twb(str(path))
+
+
+def test_malformed_xml_raises(tmp_path):
+    path = tmp_path / "broken.twb"
+    path.write_text("<workbook><worksheets><worksheet name='A'></workbook>", encoding="utf-8")
+
+    with pytest.raises(ET.ParseError):
+        analyze_twb(str(path), sections=("extensions",))
+
+
+def test_unknown_section_is_rejected(twb_path):
+    with pytest.raises(ValueError, match="Unknown analysis section"):
+        analyze_twb(twb_path, sections=("sheets", "colors"))